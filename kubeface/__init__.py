@@ -1,4 +1,5 @@
 from .client import Client
+from .executor import KubefaceExecutor
 from .local_process_backend import LocalProcessBackend
 from .local_process_docker_backend import LocalProcessDockerBackend
 from .kubernetes_backend import KubernetesBackend
@@ -7,6 +8,7 @@ from .worker_configuration import WorkerConfiguration
 
 __all__ = [
     "Client",
+    "KubefaceExecutor",
     "LocalProcessBackend",
     "LocalProcessDockerBackend",
     "KubernetesBackend",
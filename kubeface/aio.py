@@ -0,0 +1,57 @@
+"""
+Helpers for driving jobs from an asyncio event loop.
+
+Local storage calls are fast and are run directly on the event loop. Calls to
+storage that may block, like bucket storage, and scheduling work that may
+block (waiting on task input uploads, submitting to the backend), are run in
+a shared thread pool, so one event loop can drive many jobs without a thread
+per job.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from . import storage
+from .result import Result
+
+EXECUTOR_THREADS = 8
+_EXECUTOR = None
+
+
+def executor():
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(EXECUTOR_THREADS)
+    return _EXECUTOR
+
+
+async def run_blocking(function, *args, **kwargs):
+    """
+    Run function in the shared thread pool and return its result.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        executor(), functools.partial(function, *args, **kwargs))
+
+
+async def run_storage(path, function, *args, **kwargs):
+    """
+    Run a function that accesses storage at path: in the thread pool for
+    storage whose calls may block (e.g. bucket storage), directly otherwise.
+    """
+    if storage.storage_backend(path).blocking:
+        return await run_blocking(function, *args, **kwargs)
+    return function(*args, **kwargs)
+
+
+async def new_contents(listing, prefix, start_offset=None):
+    """
+    Async version of IncrementalListing.new_contents.
+    """
+    return await run_storage(
+        prefix, listing.new_contents, prefix, start_offset=start_offset)
+
+
+async def load_result(storage_path):
+    return await run_storage(
+        storage_path, Result.from_storage, storage_path)
@@ -0,0 +1,96 @@
+import itertools
+import math
+
+
+def choose_items_per_task(
+        seconds_per_item,
+        overhead_seconds,
+        target_task_seconds,
+        num_items=None,
+        max_parallel_tasks=None):
+    """
+    Number of items to run per task so that each task takes about
+    target_task_seconds, counting overhead_seconds of per-task overhead
+    (scheduling, startup, transferring inputs and results).
+
+    If the overhead alone exceeds the target, tasks are sized to run about as
+    long as the overhead. If num_items and max_parallel_tasks are given, tasks
+    are never made so large that there would be fewer than max_parallel_tasks
+    of them.
+    """
+    run_budget = max(
+        target_task_seconds - overhead_seconds, overhead_seconds)
+    items_per_task = int(run_budget / max(seconds_per_item, 1e-6))
+    if num_items is not None and max_parallel_tasks:
+        items_per_task = min(
+            items_per_task,
+            int(math.ceil(float(num_items) / max_parallel_tasks)))
+    return max(1, items_per_task)
+
+
+def grouped(iterable, items_per_task):
+    """
+    Generator of lists of up to items_per_task consecutive items.
+    """
+    iterator = iter(iterable)
+    while True:
+        items = []
+        try:
+            while len(items) < items_per_task:
+                items.append(next(iterator))
+        except StopIteration:
+            pass
+        if items:
+            yield items
+        else:
+            break
+
+
+class LongestFirstOrder(object):
+    """
+    Runs the most expensive tasks first, and puts their results back in the
+    original order.
+
+    Groups of items (one group per task) are buffered window at a time, and
+    each window is submitted in decreasing order of estimated cost, the sum of
+    cost(item) over the group's items. Expensive tasks then start early
+    instead of making a long tail at the end of the job. Reordering within a
+    window bounds how far ahead of the iterable we read, and how many results
+    restore has to hold to yield them in order.
+    """
+    def __init__(self, cost, window=100):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.cost = cost
+        self.window = window
+        self.original_task_nums = []  # task_num -> original task num
+
+    def reorder(self, groups):
+        groups = iter(groups)
+        while True:
+            window = list(itertools.islice(groups, self.window))
+            if not window:
+                return
+            offset = len(self.original_task_nums)
+            costs = [
+                sum(self.cost(item) for item in group) for group in window
+            ]
+            order = sorted(
+                range(len(window)), key=lambda i: costs[i], reverse=True)
+            for i in order:
+                self.original_task_nums.append(offset + i)
+                yield window[i]
+
+    def restore(self, results):
+        """
+        Given a job's Results in task order, yield them in original order.
+        """
+        waiting = {}
+        next_original_task_num = 0
+        for result in results:
+            task_num = result.serialization_info["task_num"]
+            waiting[self.original_task_nums[task_num]] = result
+            while next_original_task_num in waiting:
+                yield waiting.pop(next_original_task_num)
+                next_original_task_num += 1
+        assert not waiting
@@ -1,12 +1,22 @@
 import logging
+import os
 import tempfile
+import threading
 import time
+from concurrent import futures
+from contextlib import contextmanager
 
 from googleapiclient import discovery
+from googleapiclient.discovery_cache.base import Cache
+from googleapiclient import errors
 from googleapiclient import http
+from six import BytesIO
 
 from oauth2client.client import GoogleCredentials
 
+from . import naming, storage_backend
+from .storage_backend import StorageBackend
+
 # Some of this is copied from:
 # https://github.com/GoogleCloudPlatform/python-docs-samples/blob/master/storage/api/crud_object.py
 # and:
@@ -14,27 +24,123 @@ from oauth2client.client import GoogleCredentials
 
 RETRIES_BEFORE_FAILURE = 12
 FIRST_RETRY_SLEEP = 2.0
-_SERVICE = None
-
-
-def get_service():
-    global _SERVICE
-    if _SERVICE is None:
-        _SERVICE = create_service()
-    return _SERVICE
-
-
-def create_service():
-    # Get the application default credentials. When running locally, these are
-    # available after running `gcloud init`. When running on compute
-    # engine, these are available from the environment.
-    credentials = GoogleCredentials.get_application_default()
-
-    # Construct the service object for interacting with the Cloud Storage API -
-    # the 'storage' service, at version 'v1'.
-    # You can browse other available api services and versions here:
-    #     http://g.co/dev/api-client-library/python/apis/
-    return discovery.build('storage', 'v1', credentials=credentials)
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+# Maximum number of services (each with its own HTTP connection) in the
+# pool, i.e. of storage calls in flight at once in this process.
+MAX_SERVICES = int(os.environ.get("KUBEFACE_STORAGE_MAX_CONNECTIONS", 32))
+
+# Maximum number of source objects in one compose request.
+MAX_COMPOSE_SOURCES = 32
+
+# Maximum number of requests in one batch request.
+MAX_BATCH_REQUESTS = 100
+
+# HTTP statuses of errors worth retrying.
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+
+class MemoryCache(Cache):
+    """
+    Discovery document cache, so that creating a service after the first
+    does not fetch the document again.
+    """
+    def __init__(self):
+        self.documents = {}
+
+    def get(self, url):
+        return self.documents.get(url)
+
+    def set(self, url, content):
+        self.documents[url] = content
+
+
+class ServicePool(object):
+    """
+    Bounded pool of storage API services.
+
+    A service's HTTP transport is not thread-safe, so each service is used
+    by one thread at a time: checked out with `service()`, and returned to
+    the pool, connection still open, when the block exits. Services are
+    created as needed, up to max_services; beyond that, callers wait for one
+    to be returned. All services share one set of credentials, so tokens are
+    not fetched again for each service.
+
+    Code holding a service must not check out another (e.g. by calling
+    another function in this module), or it could wait forever.
+    """
+    def __init__(self, max_services=MAX_SERVICES):
+        if max_services < 1:
+            raise ValueError("max_services must be at least 1")
+        self.max_services = max_services
+        self.condition = threading.Condition()
+        self.idle = []
+        self.num_services = 0
+        self.credentials = None
+        self.discovery_cache = MemoryCache()
+
+    def create_service(self):
+        with self.condition:
+            if self.credentials is None:
+                # Get the application default credentials. When running
+                # locally, these are available after running `gcloud init`.
+                # When running on compute engine, these are available from
+                # the environment.
+                self.credentials = (
+                    GoogleCredentials.get_application_default())
+            credentials = self.credentials
+
+        # Construct the service object for interacting with the Cloud Storage
+        # API - the 'storage' service, at version 'v1'.
+        # You can browse other available api services and versions here:
+        #     http://g.co/dev/api-client-library/python/apis/
+        return discovery.build(
+            'storage',
+            'v1',
+            credentials=credentials,
+            cache=self.discovery_cache)
+
+    @contextmanager
+    def service(self):
+        with self.condition:
+            while not self.idle and self.num_services >= self.max_services:
+                self.condition.wait()
+            if self.idle:
+                service = self.idle.pop()
+            else:
+                service = None
+                self.num_services += 1
+        if service is None:
+            try:
+                service = self.create_service()
+            except Exception:
+                with self.condition:
+                    self.num_services -= 1
+                    self.condition.notify()
+                raise
+        try:
+            yield service
+        finally:
+            with self.condition:
+                self.idle.append(service)
+                self.condition.notify()
+
+
+def service_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ServicePool()
+        return _POOL
+
+
+def checkout_service():
+    """
+    Context manager giving a service from the pool, for use by this thread
+    until the block exits.
+    """
+    return service_pool().service()
 
 
 def robustify(function):
@@ -63,6 +169,79 @@ def robustify(function):
     return robust_function
 
 
+def is_retryable(exception):
+    if isinstance(exception, errors.HttpError):
+        return exception.resp.status in RETRYABLE_STATUSES
+    return True
+
+
+def execute_batched(keys, make_request, on_response=None):
+    """
+    Execute make_request(service, key) for each key, in batch requests of up
+    to MAX_BATCH_REQUESTS requests. If on_response is given, it is called as
+    on_response(key, response) for each request that succeeds.
+
+    Requests failing with a transient error are retried, in later batches,
+    up to RETRIES_BEFORE_FAILURE times. Requests that succeeded are not
+    rerun. Returns a dict of key -> exception for the requests that failed.
+    """
+    failures = {}
+    pending = list(keys)
+    error_num = 0
+    while pending:
+        errors_by_key = {}
+        for i in range(0, len(pending), MAX_BATCH_REQUESTS):
+            batch_keys = pending[i: i + MAX_BATCH_REQUESTS]
+            succeeded = set()
+
+            def callback(request_id, response, exception, keys=batch_keys):
+                key = keys[int(request_id)]
+                if exception is not None:
+                    errors_by_key[key] = exception
+                else:
+                    succeeded.add(key)
+                    if on_response is not None:
+                        on_response(key, response)
+
+            with checkout_service() as service:
+                batch = service.new_batch_http_request(callback=callback)
+                for (request_num, key) in enumerate(batch_keys):
+                    batch.add(
+                        make_request(service, key),
+                        request_id=str(request_num))
+                try:
+                    batch.execute()
+                except Exception as e:
+                    # The batch request itself failed. Anything without a
+                    # response is retried.
+                    for key in batch_keys:
+                        if key not in succeeded:
+                            errors_by_key.setdefault(key, e)
+
+        pending = []
+        for (key, exception) in errors_by_key.items():
+            if is_retryable(exception):
+                pending.append(key)
+            else:
+                failures[key] = exception
+        if pending:
+            error_num += 1
+            logging.warning(
+                "%d requests in batch failed, e.g. '%s'. Will retry up to "
+                "%d times." % (
+                    len(pending),
+                    errors_by_key[pending[0]],
+                    RETRIES_BEFORE_FAILURE))
+            if error_num > RETRIES_BEFORE_FAILURE:
+                for key in pending:
+                    failures[key] = errors_by_key[key]
+                break
+            sleep_time = FIRST_RETRY_SLEEP**error_num
+            logging.warn("Sleeping for %0.2f seconds." % sleep_time)
+            time.sleep(sleep_time)
+    return failures
+
+
 def split_bucket_and_name(url):
     if not url.startswith("gs://"):
         raise ValueError("Not a gs:// url: %s" % url)
@@ -70,55 +249,73 @@ def split_bucket_and_name(url):
 
 
 @robustify
-def list_contents(prefix):
+def list_contents(prefix, start_offset=None):
     splitted = split_bucket_and_name(prefix)
     if len(splitted) == 1:
         (bucket_name, file_name_prefix) = (splitted[0], "")
     else:
         (bucket_name, file_name_prefix) = splitted
 
+    extra_args = {}
+    if start_offset is not None:
+        # Objects are listed in lexicographic order, so this lets the server
+        # skip everything before start_offset.
+        (start_bucket_name, extra_args['startOffset']) = (
+            split_bucket_and_name(start_offset))
+        assert start_bucket_name == bucket_name
+
     # Create a request to objects.list to retrieve a list of objects.
     fields_to_return = \
         'nextPageToken,items(name)'
-    req = get_service().objects().list(
-        bucket=bucket_name,
-        prefix=file_name_prefix,
-        maxResults=100000,
-        fields=fields_to_return)
-
     all_objects = []
-    # If you have too many items to list in one request, list_next() will
-    # automatically handle paging with the pageToken.
-    while req:
-        resp = req.execute()
-        all_objects.extend(resp.get('items', []))
-        req = get_service().objects().list_next(req, resp)
+    with checkout_service() as service:
+        req = service.objects().list(
+            bucket=bucket_name,
+            prefix=file_name_prefix,
+            maxResults=100000,
+            fields=fields_to_return,
+            **extra_args)
+
+        # If you have too many items to list in one request, list_next()
+        # will automatically handle paging with the pageToken.
+        while req:
+            resp = req.execute()
+            all_objects.extend(resp.get('items', []))
+            req = service.objects().list_next(req, resp)
     return [item['name'] for item in all_objects]
 
 
 @robustify
-def move(source, dest):
+def copy(source, dest):
     # From https://cloud.google.com/storage/docs/json_api/v1/objects/rewrite
     (bucket_name, source_object) = split_bucket_and_name(source)
-    (bucket_name2, dest_object) = split_bucket_and_name(dest)
-    service = get_service()
+    (dest_bucket_name, dest_object) = split_bucket_and_name(dest)
+
+    rewrite_token = None
+    with checkout_service() as service:
+        while True:
+            extra_args = {}
+            if rewrite_token is not None:
+                extra_args['rewriteToken'] = rewrite_token
+            request = service.objects().rewrite(
+                sourceBucket=bucket_name,
+                sourceObject=source_object,
+                destinationBucket=dest_bucket_name,
+                destinationObject=dest_object,
+                body={},
+                **extra_args)
+            response = request.execute()
+            # Large objects may take several rewrite calls.
+            if response.get('done', True):
+                return
+            rewrite_token = response['rewriteToken']
 
-    request = service.objects().rewrite(
-        sourceBucket=bucket_name,
-        sourceObject=source_object,
-        destinationBucket=bucket_name,
-        destinationObject=dest_object,
-        body={})
-    request.execute()
 
-    # Delete source.
-    request = service.objects().delete(
-        bucket=bucket_name,
-        object=source_object)
-    request.execute()
+def move(source, dest):
+    copy(source, dest)
+    delete(source)
 
 
-@robustify
 def put(
         name,
         input_handle,
@@ -127,7 +324,15 @@ def put(
         mime_type='application/octet-stream'):
     input_handle.seek(0)
     (bucket_name, file_name) = split_bucket_and_name(name)
+    body = object_body(file_name, readers, owners)
+    size = storage_backend.remaining_bytes(input_handle)
+    if storage_backend.is_chunked(size):
+        return put_composite(
+            bucket_name, body, input_handle, size, mime_type)
+    return put_object(bucket_name, body, input_handle, mime_type)
 
+
+def object_body(file_name, readers=[], owners=[]):
     # This is the request body as specified:
     # http://g.co/cloud/storage/docs/json_api/v1/objects/insert#request
     body = {
@@ -151,48 +356,363 @@ def put(
             'role': 'OWNER',
             'email': o
         })
+    return body
+
 
-    # Now insert them into the specified bucket as a media insertion.
-    req = get_service().objects().insert(
-        bucket=bucket_name,
-        body=body,
-        # You can also just set media_body=filename, but # for the sake of
-        # demonstration, pass in the more generic file handle, which could
-        # very well be a StringIO or similar.
-        media_body=http.MediaIoBaseUpload(input_handle, mime_type))
-    resp = req.execute()
+@robustify
+def put_object(bucket_name, body, input_handle, mime_type):
+    input_handle.seek(0)
+    with checkout_service() as service:
+        # Now insert them into the specified bucket as a media insertion.
+        req = service.objects().insert(
+            bucket=bucket_name,
+            body=body,
+            # You can also just set media_body=filename, but # for the sake
+            # of demonstration, pass in the more generic file handle, which
+            # could very well be a StringIO or similar.
+            media_body=http.MediaIoBaseUpload(input_handle, mime_type))
+        resp = req.execute()
 
     return resp
 
 
+class CompositeUpload(object):
+    """
+    Parts of an object being uploaded, which are then composed into the
+    object on the server and deleted.
+
+    Parts are named by naming.UPLOAD_PART in the destination's directory,
+    so a part left behind by a crash is removed along with that directory,
+    and listings of other directories or of job prefixes never see it.
+    upload_part may be called from several threads at once.
+    """
+    def __init__(self, bucket_name, body, mime_type):
+        self.bucket_name = bucket_name
+        self.body = body
+        self.mime_type = mime_type
+        self.upload_id = naming.hash_value(
+            (
+                body['name'],
+                time.time(),
+                os.getpid(),
+                threading.current_thread()),
+            characters=16)
+        self.directory = body['name'][:body['name'].rfind("/") + 1]
+        self.part_names = []  # everything uploaded or composed, to delete
+        self.lock = threading.Lock()
+
+    def part_name(self, part_num):
+        return self.directory + naming.UPLOAD_PART.make_string(
+            upload_id=self.upload_id, part_num=part_num)
+
+    def upload_part(self, part_num, data):
+        part_name = self.part_name(part_num)
+        put_object(
+            self.bucket_name,
+            {'name': part_name},
+            BytesIO(data),
+            self.mime_type)
+        with self.lock:
+            self.part_names.append(part_name)
+        return part_name
+
+    def compose(self, sources):
+        """
+        Compose the parts named by sources, in order, into the object.
+        """
+        logging.debug("Uploaded %d parts of %s" % (
+            len(sources), self.body['name']))
+
+        # Compose at most MAX_COMPOSE_SOURCES objects at a time, into
+        # intermediate objects if there are more parts than that.
+        next_part_num = len(sources)
+        while len(sources) > MAX_COMPOSE_SOURCES:
+            composed = []
+            for i in range(0, len(sources), MAX_COMPOSE_SOURCES):
+                composed_name = self.part_name(next_part_num)
+                next_part_num += 1
+                compose(
+                    self.bucket_name,
+                    sources[i: i + MAX_COMPOSE_SOURCES],
+                    {'name': composed_name})
+                with self.lock:
+                    self.part_names.append(composed_name)
+                composed.append(composed_name)
+            sources = composed
+        return compose(
+            self.bucket_name,
+            sources,
+            dict(self.body, contentType=self.mime_type))
+
+    def delete_parts(self):
+        with self.lock:
+            (part_names, self.part_names) = (self.part_names, [])
+        for part_name in part_names:
+            try:
+                delete("gs://%s/%s" % (self.bucket_name, part_name))
+            except Exception as e:
+                logging.warning("Couldn't delete upload part %s: %s" % (
+                    part_name, e))
+
+
+def put_composite(bucket_name, body, input_handle, size, mime_type):
+    """
+    Upload a large object as parts, concurrently, then compose the parts
+    into the object on the server and delete them.
+    """
+    upload = CompositeUpload(bucket_name, body, mime_type)
+    try:
+        sources = storage_backend.transfer_chunks(
+            input_handle,
+            size,
+            lambda part_num, offset, data: upload.upload_part(part_num, data))
+        return upload.compose(sources)
+    finally:
+        upload.delete_parts()
+
+
+class BucketWriter(storage_backend.ObjectWriter):
+    """
+    Uploads written bytes to a bucket object.
+
+    Objects up to storage_backend.CHUNK_BYTES are uploaded in one request on
+    close. Larger objects are uploaded like put_composite does: each
+    CHUNK_BYTES written is uploaded as a part in the background, up to
+    TRANSFER_THREADS parts at once, and the parts are composed into the
+    object on close. If chunked transfers are off (TRANSFER_THREADS is 1),
+    larger objects are instead spooled to a temporary file and uploaded on
+    close. Either way, the object does not exist until close, and abort()
+    deletes any uploaded parts.
+    """
+    def __init__(
+            self,
+            name,
+            readers=[],
+            owners=[],
+            mime_type='application/octet-stream'):
+        (self.bucket_name, file_name) = split_bucket_and_name(name)
+        self.name = name
+        self.body = object_body(file_name, readers, owners)
+        self.mime_type = mime_type
+        self.chunk_bytes = storage_backend.CHUNK_BYTES
+        self.transfer_threads = storage_backend.TRANSFER_THREADS
+        self.buffer = bytearray()
+        self.num_bytes = 0
+        self.spool = None
+        self.upload = None
+        self.pool = None
+        self.parts = []  # futures of the part names, in order
+
+    def write(self, data):
+        self.num_bytes += len(data)
+        if self.spool is not None:
+            self.spool.write(data)
+            return len(data)
+        self.buffer.extend(data)
+        # Keep at least one byte back, so that close always has a last part
+        # to send.
+        while len(self.buffer) > self.chunk_bytes:
+            if self.transfer_threads > 1:
+                self.send_part()
+            else:
+                self.spool = tempfile.TemporaryFile(prefix="kubeface-write-")
+                self.spool.write(self.buffer)
+                self.buffer = None
+                break
+        return len(data)
+
+    def tell(self):
+        return self.num_bytes
+
+    def send_part(self):
+        if self.upload is None:
+            self.upload = CompositeUpload(
+                self.bucket_name, self.body, self.mime_type)
+            self.pool = futures.ThreadPoolExecutor(self.transfer_threads)
+
+        # Wait for a free thread, so that at most about transfer_threads
+        # parts are held in memory, and stop early if a part failed.
+        uploading = [part for part in self.parts if not part.done()]
+        if len(uploading) >= self.transfer_threads:
+            futures.wait(uploading, return_when=futures.FIRST_COMPLETED)
+        for part in self.parts:
+            if part.done():
+                part.result()
+
+        data = bytes(self.buffer[:self.chunk_bytes])
+        del self.buffer[:self.chunk_bytes]
+        self.parts.append(self.pool.submit(
+            self.upload.upload_part, len(self.parts), data))
+
+    def finish_parts(self):
+        """
+        Stop any part uploads not yet started, wait for the rest, and delete
+        the uploaded parts.
+        """
+        for part in self.parts:
+            part.cancel()
+        self.pool.shutdown(wait=True)
+        self.upload.delete_parts()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.spool is not None:
+            try:
+                put_object(
+                    self.bucket_name, self.body, self.spool, self.mime_type)
+            finally:
+                self.spool.close()
+        elif self.upload is None:
+            put_object(
+                self.bucket_name,
+                self.body,
+                BytesIO(bytes(self.buffer)),
+                self.mime_type)
+        else:
+            try:
+                if self.buffer:
+                    self.send_part()
+                self.upload.compose([part.result() for part in self.parts])
+            finally:
+                self.finish_parts()
+        self.buffer = None
+
+    def abort(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.buffer = None
+        if self.spool is not None:
+            self.spool.close()
+        if self.upload is not None:
+            self.finish_parts()
+
+
 @robustify
-def get(name, output_handle=None):
-    (bucket_name, file_name) = split_bucket_and_name(name)
+def compose(bucket_name, source_names, destination):
+    with checkout_service() as service:
+        req = service.objects().compose(
+            destinationBucket=bucket_name,
+            destinationObject=destination['name'],
+            body={
+                'sourceObjects': [{'name': name} for name in source_names],
+                'destination': destination,
+            })
+        return req.execute()
 
+
+def get(name, output_handle=None):
     if output_handle is None:
         output_handle = tempfile.TemporaryFile(
             prefix="kubeface-bucket-storage-",
             suffix=".data")
 
-    # Use get_media instead of get to get the actual contents of the object
-    req = get_service().objects().get_media(
-        bucket=bucket_name,
-        object=file_name)
-    downloader = http.MediaIoBaseDownload(output_handle, req)
-
-    done = False
-    while done is False:
-        (status, done) = downloader.next_chunk()
-        logging.debug("Download {}%.".format(int(status.progress() * 100)))
+    # The first chunk's response also gives the object's size. Any other
+    # chunks are then downloaded concurrently.
+    (data, size) = get_range_and_size(name, 0, storage_backend.CHUNK_BYTES)
+    output_handle.write(data)
+    if size > len(data):
+        logging.debug("Downloading %s in chunks: %d bytes" % (name, size))
+        storage_backend.get_chunks(
+            output_handle,
+            len(data),
+            size,
+            lambda start, end: get_range_and_size(name, start, end)[0])
     output_handle.seek(0)
     return output_handle
 
 
+def get_range(name, start, end):
+    return get_range_and_size(name, start, end)[0]
+
+
+@robustify
+def get_range_and_size(name, start, end):
+    """
+    Bytes start (inclusive) to end (exclusive) of an object, which may run
+    past the end of the object, and the object's size.
+    """
+    (bucket_name, file_name) = split_bucket_and_name(name)
+    with checkout_service() as service:
+        # Use get_media instead of get to get the actual contents of the
+        # object
+        req = service.objects().get_media(
+            bucket=bucket_name,
+            object=file_name)
+        (response, content) = req.http.request(
+            req.uri,
+            method="GET",
+            headers={'range': 'bytes=%d-%d' % (start, end - 1)})
+    if response.status == 200:
+        # Whole object.
+        return (content[start:end], len(content))
+    if response.status == 416:
+        # Range starts past the end, e.g. of an empty object.
+        content_range = response.get('content-range', '*/0')
+        return (b"", int(content_range.rsplit("/", 1)[1]))
+    if response.status != 206:
+        raise errors.HttpError(response, content, uri=req.uri)
+    return (content, int(response['content-range'].rsplit("/", 1)[1]))
+
+
 @robustify
 def delete(name):
     (bucket_name, file_name) = split_bucket_and_name(name)
-    req = get_service().objects().delete(bucket=bucket_name, object=file_name)
-    return req.execute()
+    with checkout_service() as service:
+        req = service.objects().delete(bucket=bucket_name, object=file_name)
+        return req.execute()
+
+
+def delete_many(names):
+    """
+    Delete objects using batch requests. Returns a dict of name ->
+    exception for the objects that could not be deleted.
+    """
+    def delete_request(service, name):
+        (bucket_name, file_name) = split_bucket_and_name(name)
+        return service.objects().delete(bucket=bucket_name, object=file_name)
+
+    return execute_batched(names, delete_request)
+
+
+def move_many(pairs):
+    """
+    Move each (source, dest) in pairs, by copying them all and then deleting
+    the copied sources, using batch requests. Returns a dict of source ->
+    exception for the objects that could not be moved.
+    """
+    def rewrite_request(service, pair):
+        (source, dest) = pair
+        (bucket_name, source_object) = split_bucket_and_name(source)
+        (dest_bucket_name, dest_object) = split_bucket_and_name(dest)
+        return service.objects().rewrite(
+            sourceBucket=bucket_name,
+            sourceObject=source_object,
+            destinationBucket=dest_bucket_name,
+            destinationObject=dest_object,
+            body={})
+
+    pairs = list(pairs)
+    unfinished = []
+
+    def check_done(pair, response):
+        # Large objects may take several rewrite calls.
+        if not response.get('done', True):
+            unfinished.append(pair)
+
+    failures = execute_batched(pairs, rewrite_request, check_done)
+    for pair in unfinished:
+        try:
+            copy(*pair)
+        except Exception as e:
+            failures[pair] = e
+
+    failures = dict((source, e) for ((source, _), e) in failures.items())
+    copied = [source for (source, _) in pairs if source not in failures]
+    failures.update(delete_many(copied))
+    return failures
 
 
 def access_info(name):
@@ -203,3 +723,63 @@ def access_info(name):
             bucket_name=bucket_name,
             file_name=file_name,
             name=name))
+
+
+def exists(name):
+    (_, object_name) = split_bucket_and_name(name)
+    return object_name in list_contents(name)
+
+
+@robustify
+def size(name):
+    (bucket_name, file_name) = split_bucket_and_name(name)
+    with checkout_service() as service:
+        req = service.objects().get(
+            bucket=bucket_name, object=file_name, fields='size')
+        return int(req.execute()['size'])
+
+
+class BucketStorage(StorageBackend):
+    """
+    Google Cloud Storage, named by gs://bucket/object URLs.
+    """
+    blocking = True
+
+    def list_contents(self, prefix, start_offset=None):
+        return list_contents(prefix, start_offset=start_offset)
+
+    def put(self, name, input_handle, **kwargs):
+        return put(name, input_handle, **kwargs)
+
+    def open_write(self, name, **kwargs):
+        return BucketWriter(name, **kwargs)
+
+    def get(self, name, output_handle=None):
+        return get(name, output_handle)
+
+    def get_range(self, name, start, end):
+        return get_range(name, start, end)
+
+    def delete(self, name):
+        return delete(name)
+
+    def delete_many(self, names):
+        return delete_many(names)
+
+    def move_many(self, pairs):
+        return move_many(pairs)
+
+    def exists(self, name):
+        return exists(name)
+
+    def size(self, name):
+        return size(name)
+
+    def copy(self, source, dest):
+        return copy(source, dest)
+
+    def move(self, source, dest):
+        return move(source, dest)
+
+    def access_info(self, name):
+        return access_info(name)
@@ -1,22 +1,54 @@
+import functools
+import itertools
 import math
 import logging
 import os
+import threading
 
-from .remote_object import RemoteObject
+import numpy
+
+from .remote_object import RemoteObject, RemoteResult
 from .job import Job
+from .manifest import JobManifest
+from .polling import AdaptivePoller
+from .batching import choose_items_per_task, grouped, LongestFirstOrder
+from .scheduler import FairShareScheduler
+from .pipeline import Pipeline
+from .shuffle import shuffle_map, shuffle_reduce
 from .task import Task
+from .result import Result
 from . import (
     backends,
     worker_configuration,
     naming,
     context,
-    storage)
+    storage,
+    storage_backend,
+    aio)
 
 
 def run_multiple(function, values):
     return [function(v) for v in values]
 
 
+def map_and_reduce(map_function, reduce_function, values):
+    return functools.reduce(
+        reduce_function, (map_function(v) for v in values))
+
+
+def reduce_results(reduce_function, result_paths):
+    """
+    Reduce the return values of the Results stored at result_paths. Run on a
+    worker; results are loaded one at a time.
+    """
+    def values():
+        for result_path in result_paths:
+            result = Result.from_storage(result_path)
+            result.raise_if_exception()
+            yield result.return_value
+    return functools.reduce(reduce_function, values())
+
+
 class Client(object):
     """
     User interface to Kubeface.
@@ -40,6 +72,40 @@ class Client(object):
             "--kubeface-poll-seconds",
             type=float,
             default=30.0)
+        group.add_argument(
+            "--kubeface-adaptive-polling",
+            action="store_true",
+            default=False,
+            help="Choose the time between polls from the runtimes of "
+            "completed tasks instead of using --kubeface-poll-seconds.")
+        group.add_argument(
+            "--kubeface-min-poll-seconds",
+            type=float,
+            default=1.0,
+            help="With adaptive polling, minimum time between polls. "
+            "Default: %(default)s")
+        group.add_argument(
+            "--kubeface-max-poll-seconds",
+            type=float,
+            default=300.0,
+            help="With adaptive polling, maximum time between polls. "
+            "Default: %(default)s")
+        group.add_argument(
+            "--kubeface-max-polls-per-hour",
+            type=float,
+            help="With adaptive polling, poll (list storage) at most this "
+            "many times per hour per job.")
+        group.add_argument(
+            "--kubeface-target-task-seconds",
+            type=float,
+            default=300.0,
+            help="Target task duration when choosing items per task "
+            "automatically. Default: %(default)s")
+        group.add_argument(
+            "--kubeface-calibration-tasks",
+            type=int,
+            help="Number of single-item tasks to run before choosing items "
+            "per task automatically. Default: max simultaneous tasks.")
         group.add_argument(
             "--kubeface-storage",
             default=os.environ.get("KUBEFACE_STORAGE", "gs://kubeface"),
@@ -50,6 +116,12 @@ class Client(object):
             "--kubeface-never-cleanup",
             action="store_true",
             default=False)
+        group.add_argument(
+            "--kubeface-memoize",
+            action="store_true",
+            default=False,
+            help="Reuse results of identical tasks (same serialized function "
+            "and arguments) run by earlier jobs.")
         group.add_argument(
             "--kubeface-wait-to-raise-task-exception",
             action="store_true",
@@ -66,6 +138,64 @@ class Client(object):
             "--kubeface-speculation-max-reruns",
             type=int,
             default=3)
+        group.add_argument(
+            "--kubeface-upload-threads",
+            type=int,
+            default=4,
+            help="Threads for serializing and uploading task inputs. "
+            "Default: %(default)s")
+        group.add_argument(
+            "--kubeface-upload-prefetch-tasks",
+            type=int,
+            default=10,
+            help="Max task inputs to upload ahead of submission. "
+            "Default: %(default)s")
+        group.add_argument(
+            "--kubeface-upload-prefetch-bytes",
+            type=int,
+            default=2**31,
+            help="Stop uploading ahead of submission once this many bytes "
+            "of task inputs are waiting to be submitted. Default: %(default)s")
+        group.add_argument(
+            "--kubeface-status-interval-seconds",
+            type=float,
+            default=10.0,
+            help="Write job status pages at most this often. "
+            "Default: %(default)s")
+        group.add_argument(
+            "--kubeface-result-prefetch-results",
+            type=int,
+            default=4,
+            help="Max results to download ahead of the one being consumed. "
+            "Default: %(default)s")
+        group.add_argument(
+            "--kubeface-result-prefetch-bytes",
+            type=int,
+            default=2**30,
+            help="Stop downloading results ahead once this many bytes are "
+            "being downloaded or waiting to be consumed. Default: "
+            "%(default)s")
+        group.add_argument(
+            "--kubeface-result-download-threads",
+            type=int,
+            default=4,
+            help="Threads for downloading results. Default: %(default)s")
+        group.add_argument(
+            "--kubeface-result-deserialize-processes",
+            type=int,
+            default=0,
+            help="If nonzero, deserialize results in a pool of this many "
+            "processes. Default: %(default)s")
+        group.add_argument(
+            "--kubeface-storage-chunk-bytes",
+            type=int,
+            help="Transfer objects larger than this in chunks of this size, "
+            "concurrently. Default: %d" % storage_backend.CHUNK_BYTES)
+        group.add_argument(
+            "--kubeface-storage-transfer-threads",
+            type=int,
+            help="Threads transferring the chunks of one large object. "
+            "Default: %d" % storage_backend.TRANSFER_THREADS)
 
         worker_configuration.WorkerConfiguration.add_args(group)
         backends.add_args(group)
@@ -93,6 +223,12 @@ class Client(object):
             backend,
             max_simultaneous_tasks=args.kubeface_max_simultaneous_tasks,
             poll_seconds=args.kubeface_poll_seconds,
+            adaptive_polling=args.kubeface_adaptive_polling,
+            min_poll_seconds=args.kubeface_min_poll_seconds,
+            max_poll_seconds=args.kubeface_max_poll_seconds,
+            max_polls_per_hour=args.kubeface_max_polls_per_hour,
+            target_task_seconds=args.kubeface_target_task_seconds,
+            calibration_tasks=args.kubeface_calibration_tasks,
             storage=args.kubeface_storage,
             cache_key_prefix=args.kubeface_cache_key_prefix,
             never_cleanup=args.kubeface_never_cleanup,
@@ -101,20 +237,49 @@ class Client(object):
             speculation_percent=args.kubeface_speculation_percent,
             speculation_runtime_percentile=(
                 args.kubeface_speculation_runtime_percentile),
-            speculation_max_reruns=args.kubeface_speculation_max_reruns)
+            speculation_max_reruns=args.kubeface_speculation_max_reruns,
+            upload_threads=args.kubeface_upload_threads,
+            upload_prefetch_tasks=args.kubeface_upload_prefetch_tasks,
+            upload_prefetch_bytes=args.kubeface_upload_prefetch_bytes,
+            result_prefetch_results=args.kubeface_result_prefetch_results,
+            result_prefetch_bytes=args.kubeface_result_prefetch_bytes,
+            result_download_threads=args.kubeface_result_download_threads,
+            result_deserialize_processes=(
+                args.kubeface_result_deserialize_processes),
+            storage_chunk_bytes=args.kubeface_storage_chunk_bytes,
+            storage_transfer_threads=args.kubeface_storage_transfer_threads,
+            status_interval_seconds=args.kubeface_status_interval_seconds,
+            memoize=args.kubeface_memoize)
 
     def __init__(
             self,
             backend,
             max_simultaneous_tasks=10,
             poll_seconds=30.0,
+            adaptive_polling=False,
+            min_poll_seconds=1.0,
+            max_poll_seconds=300.0,
+            max_polls_per_hour=None,
+            target_task_seconds=300.0,
+            calibration_tasks=None,
             storage="gs://kubeface",
             cache_key_prefix=None,
             never_cleanup=False,
             wait_to_raise_task_exception=False,
             speculation_percent=0,
             speculation_runtime_percentile=99,
-            speculation_max_reruns=1):
+            speculation_max_reruns=1,
+            upload_threads=4,
+            upload_prefetch_tasks=10,
+            upload_prefetch_bytes=2**31,
+            result_prefetch_results=4,
+            result_prefetch_bytes=2**30,
+            result_download_threads=4,
+            result_deserialize_processes=0,
+            storage_chunk_bytes=None,
+            storage_transfer_threads=None,
+            status_interval_seconds=10.0,
+            memoize=False):
         """
         Parameters
         ----------
@@ -125,6 +290,31 @@ class Client(object):
             
         poll_seconds : float
             How often to poll for task results
+
+        adaptive_polling : boolean
+            If True, ignore poll_seconds and instead choose each wait before
+            polling again from the runtimes of the tasks completed so far and
+            how long the running tasks have been running. See
+            kubeface.polling.AdaptivePoller.
+
+        min_poll_seconds : float
+            With adaptive polling, minimum seconds between polls.
+
+        max_poll_seconds : float
+            With adaptive polling, maximum seconds between polls.
+
+        max_polls_per_hour : float
+            With adaptive polling, each job polls (and lists storage) at most
+            this many times per hour. None for no limit.
+
+        target_task_seconds : float
+            With map(..., items_per_task="auto"), the target task duration,
+            including per-task overhead.
+
+        calibration_tasks : int
+            With map(..., items_per_task="auto"), number of single-item tasks
+            to run to calibrate items_per_task. Defaults to
+            max_simultaneous_tasks.
         
         storage : str
             Bucket or (for local file process backend) local filesystem path to
@@ -155,11 +345,69 @@ class Client(object):
         
         speculation_max_reruns : int
             Tasks can be rerun up to speculation_max_reruns times.
+
+        upload_threads : int
+            Number of background threads serializing and uploading task
+            inputs ahead of submission. Each storage call uses its own
+            connection from a shared pool (see
+            `kubeface.bucket_storage.ServicePool`), so threads upload
+            concurrently.
+
+        upload_prefetch_tasks : int
+            Maximum number of task inputs uploaded (or uploading) ahead of
+            submission.
+
+        upload_prefetch_bytes : int
+            Task inputs stop being uploaded ahead of submission once the ones
+            waiting to be submitted add up to this many bytes.
+
+        result_prefetch_results : int
+            Maximum number of results downloaded ahead of the one being
+            consumed.
+
+        result_prefetch_bytes : int
+            Results stop being downloaded ahead once the ones being
+            downloaded or waiting to be consumed add up to this many
+            (serialized) bytes.
+
+        result_download_threads : int
+            Number of threads downloading results, concurrently like the
+            upload threads.
+
+        result_deserialize_processes : int
+            If nonzero, results are deserialized in a pool of this many
+            processes rather than in the download threads.
+
+        storage_chunk_bytes : int
+            Objects larger than this are uploaded in chunks of this size,
+            concurrently, by this process. Workers are configured separately,
+            see `kubeface.WorkerConfiguration`. None to keep the current
+            setting. See `kubeface.storage_backend.configure_transfers`.
+
+        storage_transfer_threads : int
+            Number of threads transferring the chunks of one object.
+
+        status_interval_seconds : float
+            Job status pages are written in the background at most this
+            often.
+
+        memoize : boolean
+            If True, each task is fingerprinted by a hash of its serialized
+            function and arguments, and successful results are also stored
+            under that fingerprint. Later tasks with the same fingerprint, in
+            any job using the same storage, reuse the stored result instead of
+            running. Memoized results are not removed by cleanup.
         """
 
         self.backend = backend
         self.max_simultaneous_tasks = max_simultaneous_tasks
         self.poll_seconds = poll_seconds
+        self.adaptive_polling = adaptive_polling
+        self.min_poll_seconds = min_poll_seconds
+        self.max_poll_seconds = max_poll_seconds
+        self.max_polls_per_hour = max_polls_per_hour
+        self.target_task_seconds = target_task_seconds
+        self.calibration_tasks = calibration_tasks
         self.storage = storage
         self.cache_key_prefix = (
             cache_key_prefix if cache_key_prefix
@@ -169,24 +417,89 @@ class Client(object):
         self.speculation_percent = speculation_percent
         self.speculation_runtime_percentile = speculation_runtime_percentile
         self.speculation_max_reruns = speculation_max_reruns
+        self.upload_threads = upload_threads
+        self.upload_prefetch_tasks = upload_prefetch_tasks
+        self.upload_prefetch_bytes = upload_prefetch_bytes
+        self.result_prefetch_results = result_prefetch_results
+        self.result_prefetch_bytes = result_prefetch_bytes
+        self.result_download_threads = result_download_threads
+        self.result_deserialize_processes = result_deserialize_processes
+        self.storage_chunk_bytes = storage_chunk_bytes
+        self.storage_transfer_threads = storage_transfer_threads
+        storage_backend.configure_transfers(
+            chunk_bytes=storage_chunk_bytes,
+            transfer_threads=storage_transfer_threads)
+        self.status_interval_seconds = status_interval_seconds
+        self.memoize = memoize
 
         self.submitted_jobs = []
         self.next_object_num = 1
+        self.scheduler = FairShareScheduler(max_simultaneous_tasks)
+        self.submit_lock = threading.Lock()
 
     def __getstate__(self):
-        # Don't serialize jobs
+        # Don't serialize jobs or the scheduler, which is local to this
+        # process.
         d = dict(self.__dict__)
         d['submitted_jobs'] = []
+        del d['scheduler']
+        del d['submit_lock']
         return d
 
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self.scheduler = FairShareScheduler(self.max_simultaneous_tasks)
+        self.submit_lock = threading.Lock()
+
     def next_cache_key(self):
         return "%s-%03d" % (
             self.cache_key_prefix,
             len(self.submitted_jobs))
 
-    def submit(self, tasks, num_tasks=None, cache_key=None):
+    def make_poller(self):
+        if not self.adaptive_polling:
+            return None
+        return AdaptivePoller(
+            min_seconds=self.min_poll_seconds,
+            max_seconds=self.max_poll_seconds,
+            max_polls_per_hour=self.max_polls_per_hour)
+
+    def job_kwargs(self):
+        return dict(
+            max_simultaneous_tasks=self.max_simultaneous_tasks,
+            storage=self.storage,
+            wait_to_raise_task_exception=self.wait_to_raise_task_exception,
+            speculation_percent=self.speculation_percent,
+            speculation_runtime_percentile=self.speculation_runtime_percentile,
+            speculation_max_reruns=self.speculation_max_reruns,
+            upload_threads=self.upload_threads,
+            upload_prefetch_tasks=self.upload_prefetch_tasks,
+            upload_prefetch_bytes=self.upload_prefetch_bytes,
+            result_prefetch_results=self.result_prefetch_results,
+            result_prefetch_bytes=self.result_prefetch_bytes,
+            result_download_threads=self.result_download_threads,
+            result_deserialize_processes=self.result_deserialize_processes,
+            status_interval_seconds=self.status_interval_seconds,
+            memoize=self.memoize,
+            poller=self.make_poller(),
+            scheduler=self.scheduler)
+
+    def submit(
+            self,
+            tasks,
+            num_tasks=None,
+            cache_key=None,
+            weight=1.0,
+            priority=0,
+            wait_to_raise_task_exception=None,
+            blocking_submission=True):
         """
         Run a Job.
+
+        All jobs of a Client share its max_simultaneous_tasks. Jobs running at
+        the same time, e.g. maps run from different threads, are given slots
+        by priority and then in proportion to weight. See
+        `kubeface.scheduler.FairShareScheduler`.
         
         Parameters
         ----------
@@ -200,6 +513,20 @@ class Client(object):
         cache_key : str
             Advanced use only for reusing pre-existing results.
 
+        weight : float
+            Relative share of task slots when competing with other jobs of
+            the same priority.
+
+        priority : int
+            Jobs with higher priority are given task slots first.
+
+        wait_to_raise_task_exception : boolean
+            Overrides the client's setting for this job.
+
+        blocking_submission : boolean
+            If False, polling the job does not wait for tasks that are not yet
+            available from tasks (see `kubeface.job.Job.submit_next_task`).
+
         Returns
         -------
         kubeface.Job
@@ -210,18 +537,84 @@ class Client(object):
                 num_tasks = len(tasks)
             except TypeError:
                 pass
-        job = Job(
-            self.backend,
-            tasks,
-            num_tasks=num_tasks,
-            cache_key=cache_key if cache_key else self.next_cache_key(),
-            max_simultaneous_tasks=self.max_simultaneous_tasks,
-            storage=self.storage,
-            wait_to_raise_task_exception=self.wait_to_raise_task_exception,
-            speculation_percent=self.speculation_percent,
-            speculation_runtime_percentile=self.speculation_runtime_percentile,
-            speculation_max_reruns=self.speculation_max_reruns)
-        self.submitted_jobs.append(job)
+        kwargs = self.job_kwargs()
+        if wait_to_raise_task_exception is not None:
+            kwargs['wait_to_raise_task_exception'] = (
+                wait_to_raise_task_exception)
+        with self.submit_lock:
+            job = Job(
+                self.backend,
+                tasks,
+                num_tasks=num_tasks,
+                cache_key=cache_key if cache_key else self.next_cache_key(),
+                scheduler_weight=weight,
+                scheduler_priority=priority,
+                blocking_submission=blocking_submission,
+                **kwargs)
+            self.submitted_jobs.append(job)
+        return job
+
+    def resume(self, job_name, tasks=None, resubmit_running=False):
+        """
+        Resume a job started by another master, for example one that
+        crashed.
+
+        Scheduler state is rebuilt from the job's manifest in storage plus one
+        listing of its results. Tasks that were running are assumed to still
+        be running, unless resubmit_running is True.
+
+        Parameters
+        ----------
+        job_name : str
+
+        tasks : iterable of kubeface.Task
+            The job's full task iterable, as originally submitted. Tasks that
+            were already submitted are skipped. If not specified, only tasks
+            that were already submitted are run.
+
+        resubmit_running : boolean
+            Submit another attempt of every task that was running.
+
+        Returns
+        -------
+        kubeface.Job
+
+        """
+        (records, num_chunks) = JobManifest.read(self.storage, job_name)
+        if not records:
+            raise ValueError("No manifest found for job: %s" % job_name)
+        header = records[0]
+        assert header['event'] == 'job', header
+
+        if tasks is None:
+            if not any(r['event'] == 'all_tasks_submitted' for r in records):
+                logging.warning(
+                    "Not all tasks of job %s were submitted, and no tasks "
+                    "were given, so only submitted tasks will be run." % (
+                        job_name))
+            tasks_iter = iter([])
+        else:
+            num_previously_submitted = len(set(
+                r['task_num'] for r in records
+                if r['event'] in ('submitted', 'reused')))
+            tasks_iter = itertools.islice(
+                tasks, num_previously_submitted, None)
+
+        kwargs = self.job_kwargs()
+        kwargs['memoize'] = header['memoize']
+        with self.submit_lock:
+            job = Job(
+                self.backend,
+                tasks_iter,
+                num_tasks=header['num_tasks'],
+                cache_key=header['cache_key'],
+                job_name=job_name,
+                manifest_records=records,
+                num_manifest_chunks=num_chunks,
+                **kwargs)
+            self.submitted_jobs.append(job)
+        if resubmit_running:
+            job.resubmit_running()
         return job
 
     def map(
@@ -230,9 +623,18 @@ class Client(object):
             iterable,
             items_per_task=1,
             num_items=None,
-            cache_key=None):
+            cache_key=None,
+            ordered=True,
+            weight=1.0,
+            priority=0,
+            cost=None,
+            cost_window=100,
+            return_remote=False):
         """
         Parallel map. This is the primary user-facing API.
+
+        Results are yielded while the job runs, as soon as they are
+        available.
         
         Parameters
         ----------
@@ -242,65 +644,555 @@ class Client(object):
         iterable : iterable of object
             items to pass to function
         
-        items_per_task : int
+        items_per_task : int or "auto"
             If items_per_task is 1 then each item to map over gets its own task.
             If it's 10 then the first 10 items are one task, the next 10 are
             another, etc.
+
+            If "auto", a calibration job first runs calibration_tasks items
+            one per task. The remaining items are then run in a second job,
+            with items_per_task chosen from the calibration tasks' run times
+            and overhead so that tasks take about target_task_seconds (see
+            `kubeface.batching.choose_items_per_task`).
         
         num_items : int
             If the iterable provided has no len(...) then setting num_items
             will give better progress output. Not required in any case though.
         
         cache_key : str
-            Advanced use only for reusing pre-existing results.
+            Advanced use only for reusing pre-existing results. Not supported
+            with items_per_task="auto".
+
+        ordered : boolean
+            If True, results are yielded in the order of iterable. Each task's
+            results are yielded once it and all tasks before it have
+            completed. If False, see `imap_unordered`.
+
+        weight : float
+            Relative share of task slots when other jobs of this client with
+            the same priority are running. See `submit`.
+
+        priority : int
+            Jobs with higher priority are given task slots first.
+
+        cost : callable
+            Optional function giving an item's estimated relative cost (e.g.
+            its size). If specified, tasks are read cost_window at a time and
+            each window is submitted most expensive task first, so that
+            expensive tasks near the end of iterable don't leave a long tail.
+            Results are still yielded in the order of iterable. See
+            `kubeface.batching.LongestFirstOrder`.
+
+        cost_window : int
+            Number of tasks to reorder at a time when cost is specified.
+
+        return_remote : boolean
+            If True, results are not downloaded. Instead, a
+            `kubeface.remote_object.RemoteResult` handle is yielded for each
+            item, pointing into its task's stored result. Handles can be
+            passed to another map without the values going through this
+            machine. They are valid until the job is cleaned up. Not
+            supported with cost or items_per_task="auto".
 
         Returns
         -------
         generator of task results, in order
 
         """
-        def grouped():
-            iterator = iter(iterable)
-            while True:
-                items = []
-                try:
-                    while len(items) < items_per_task:
-                        items.append(next(iterator))
-                except StopIteration:
-                    pass
-                if items:
-                    yield items
-                else:
-                    break
+        if num_items is None:
+            try:
+                num_items = len(iterable)
+            except TypeError:
+                pass
 
-        num_tasks = None
+        if return_remote:
+            if cost is not None or items_per_task == "auto":
+                raise ValueError(
+                    "return_remote is not supported with cost or "
+                    "items_per_task='auto'")
+            group_sizes = []
+            job = self.submit_map(
+                function,
+                iterable,
+                items_per_task=items_per_task,
+                num_items=num_items,
+                cache_key=cache_key,
+                weight=weight,
+                priority=priority,
+                group_sizes=group_sizes)
+            for handle in self.job_remote_results(
+                    job, group_sizes, ordered=ordered):
+                yield handle
+            return
+
+        if items_per_task == "auto":
+            if cache_key is not None:
+                raise ValueError(
+                    "cache_key is not supported with items_per_task='auto'")
+            results = self.auto_batched_map_results(
+                function,
+                iterable,
+                num_items=num_items,
+                ordered=ordered,
+                weight=weight,
+                priority=priority,
+                cost=cost,
+                cost_window=cost_window)
+        else:
+            order = None
+            if cost is not None:
+                order = LongestFirstOrder(cost, window=cost_window)
+            job = self.submit_map(
+                function,
+                iterable,
+                items_per_task=items_per_task,
+                num_items=num_items,
+                cache_key=cache_key,
+                weight=weight,
+                priority=priority,
+                order=order)
+            results = self.job_results(job, ordered=ordered)
+            if order is not None and ordered:
+                results = order.restore(results)
+
+        for result in results:
+            for result_item in result.return_value:
+                yield result_item
+
+    async def map_async(
+            self,
+            function,
+            iterable,
+            items_per_task=1,
+            num_items=None,
+            cache_key=None,
+            ordered=True,
+            weight=1.0,
+            priority=0):
+        """
+        Parallel map for use from an asyncio event loop.
+
+        Storage access and scheduling are done without blocking the event
+        loop, so many maps can run concurrently from one loop. Parameters are
+        as in `map`, except that items_per_task="auto" is not supported.
+
+        Returns
+        -------
+        async generator of task results
+        """
+        if items_per_task == "auto":
+            raise ValueError(
+                "items_per_task='auto' is not supported by map_async")
         if num_items is None:
             try:
                 num_items = len(iterable)
-                num_tasks = int(math.ceil(float(num_items) / items_per_task))
             except TypeError:
                 pass
 
-        tasks = (
-            Task(run_multiple, (function, values)) for values in grouped())
-        job = self.submit(tasks, num_tasks=num_tasks, cache_key=cache_key)
+        job = self.submit_map(
+            function,
+            iterable,
+            items_per_task=items_per_task,
+            num_items=num_items,
+            cache_key=cache_key,
+            weight=weight,
+            priority=priority)
         try:
-            job.wait(poll_seconds=self.poll_seconds)
-            for result in job.results():
+            results = job.results_as_available_async(
+                poll_seconds=self.poll_seconds,
+                ordered=ordered)
+            async for result in results:
                 result.log()
                 result.raise_if_exception()
                 for result_item in result.return_value:
                     yield result_item
         finally:
+            await aio.run_blocking(job.close)
+            await aio.run_storage(
+                self.storage, self.mark_jobs_done, job_names=[job.job_name])
+
+    def submit_map(
+            self,
+            function,
+            iterable,
+            items_per_task=1,
+            num_items=None,
+            cache_key=None,
+            weight=1.0,
+            priority=0,
+            order=None,
+            group_sizes=None):
+        """
+        Submit a Job running function over the items of iterable, in tasks of
+        items_per_task items each. If order (a LongestFirstOrder) is given,
+        tasks are submitted in the order it chooses. If group_sizes is a
+        list, the number of items in each task is appended to it as tasks
+        are generated.
+        """
+        groups = grouped(iterable, items_per_task)
+        if order is not None:
+            groups = order.reorder(groups)
+        if group_sizes is not None:
+            def record_sizes(groups):
+                for group in groups:
+                    group_sizes.append(len(group))
+                    yield group
+            groups = record_sizes(groups)
+
+        num_tasks = None
+        if num_items is not None:
+            num_tasks = int(math.ceil(float(num_items) / items_per_task))
+
+        tasks = (
+            Task(run_multiple, (function, values)) for values in groups)
+        return self.submit(
+            tasks,
+            num_tasks=num_tasks,
+            cache_key=cache_key,
+            weight=weight,
+            priority=priority)
+
+    def job_results(self, job, ordered=True):
+        """
+        Generator of a job's task Results as they become available. Raises
+        the first task exception encountered. The job is closed and marked
+        done when the generator finishes or is closed.
+        """
+        try:
+            results = job.results_as_available(
+                poll_seconds=self.poll_seconds,
+                ordered=ordered)
+            for result in results:
+                result.log()
+                result.raise_if_exception()
+                yield result
+        finally:
+            job.close()
             self.mark_jobs_done(job_names=[job.job_name])
 
+    def job_remote_results(self, job, group_sizes, ordered=True):
+        """
+        Generator of a RemoteResult handle for each item of a map job, as its
+        task completes. group_sizes gives the number of items in each task.
+        """
+        try:
+            for task_num in job.completed_task_nums(
+                    poll_seconds=self.poll_seconds, ordered=ordered):
+                result_path = job.result_path(task_num)
+                for index in range(group_sizes[task_num]):
+                    yield RemoteResult(result_path, index)
+        finally:
+            job.close()
+            self.mark_jobs_done(job_names=[job.job_name])
+
+    def auto_batched_map_results(
+            self,
+            function,
+            iterable,
+            num_items=None,
+            ordered=True,
+            weight=1.0,
+            priority=0,
+            cost=None,
+            cost_window=100):
+        """
+        Task Results for map with items_per_task="auto": a calibration job
+        with one item per task, followed by a job over the remaining items
+        with items_per_task chosen from the calibration job. If cost is
+        given, it is used to order the tasks of the second job.
+        """
+        iterator = iter(iterable)
+        num_calibration_items = (
+            self.calibration_tasks or self.max_simultaneous_tasks)
+        calibration_items = list(
+            itertools.islice(iterator, num_calibration_items))
+        calibration_job = self.submit_map(
+            function,
+            calibration_items,
+            num_items=len(calibration_items),
+            weight=weight,
+            priority=priority)
+        run_seconds = []
+        for result in self.job_results(calibration_job, ordered=ordered):
+            run_seconds.append(result.run_seconds())
+            yield result
+        if len(calibration_items) < num_calibration_items:
+            return
+
+        seconds_per_item = numpy.median(run_seconds)
+        elapsed_seconds = calibration_job.tasks.completed_elapsed_times()
+        overhead_seconds = 0.0
+        if len(elapsed_seconds) > 0:
+            overhead_seconds = max(
+                0.0, numpy.median(elapsed_seconds) - seconds_per_item)
+        num_remaining_items = None
+        if num_items is not None:
+            num_remaining_items = num_items - len(calibration_items)
+        items_per_task = choose_items_per_task(
+            seconds_per_item,
+            overhead_seconds,
+            self.target_task_seconds,
+            num_items=num_remaining_items,
+            max_parallel_tasks=self.max_simultaneous_tasks)
+        logging.info(
+            "Calibration: %0.3f sec per item, %0.1f sec overhead per task. "
+            "Running remaining items with %d items per task." % (
+                seconds_per_item, overhead_seconds, items_per_task))
+
+        order = None
+        if cost is not None:
+            order = LongestFirstOrder(cost, window=cost_window)
+        job = self.submit_map(
+            function,
+            iterator,
+            items_per_task=items_per_task,
+            num_items=num_remaining_items,
+            weight=weight,
+            priority=priority,
+            order=order)
+        results = self.job_results(job, ordered=ordered)
+        if order is not None and ordered:
+            results = order.restore(results)
+        for result in results:
+            yield result
+
+    def map_reduce(
+            self,
+            map_function,
+            reduce_function,
+            iterable,
+            fan_in=10,
+            items_per_task=1,
+            num_items=None):
+        """
+        Map over iterable and reduce the results, without downloading
+        intermediate results to this machine.
+
+        Each map task maps over its items and reduces them. Reduce tasks
+        then run on the backend, each reducing up to fan_in results of the
+        previous job, until a single result is left. Only that final value is
+        downloaded.
+
+        Results are reduced in the order of iterable, as with
+        functools.reduce, so reduce_function need only be associative.
+
+        Parameters
+        ----------
+        map_function : callable
+            Python function to run over each item
+
+        reduce_function : callable
+            Function of two mapped (or reduced) values returning one
+
+        iterable : iterable of object
+            items to pass to map_function. Must not be empty.
+
+        fan_in : int
+            Number of results each reduce task combines
+
+        items_per_task : int
+            Number of items per map task, as in `map`.
+
+        num_items : int
+            As in `map`.
+
+        Returns
+        -------
+        the reduced value
+        """
+        if fan_in < 2:
+            raise ValueError("fan_in must be at least 2")
+        if num_items is None:
+            try:
+                num_items = len(iterable)
+            except TypeError:
+                pass
+        num_tasks = None
+        if num_items is not None:
+            num_tasks = int(math.ceil(float(num_items) / items_per_task))
+
+        tasks = (
+            Task(map_and_reduce, (map_function, reduce_function, values))
+            for values in grouped(iterable, items_per_task))
+        job = self.submit(tasks, num_tasks=num_tasks)
+        while True:
+            try:
+                job.wait(poll_seconds=self.poll_seconds)
+                for task_num in job.tasks.exception_task_nums():
+                    Result.from_storage(
+                        job.result_path(task_num)).raise_if_exception()
+                result_paths = [
+                    job.result_path(task_num)
+                    for task_num in range(job.tasks.num_submitted)
+                ]
+            finally:
+                job.close()
+                self.mark_jobs_done(job_names=[job.job_name])
+
+            if not result_paths:
+                raise ValueError("Can't map_reduce an empty iterable")
+            if len(result_paths) == 1:
+                result = Result.from_storage(result_paths[0])
+                result.raise_if_exception()
+                return result.return_value
+
+            groups = list(grouped(result_paths, fan_in))
+            logging.info("Reducing %d results in %d tasks" % (
+                len(result_paths), len(groups)))
+            job = self.submit([
+                Task(reduce_results, (reduce_function, group))
+                for group in groups
+            ])
+
+    def group_by_key(
+            self,
+            function,
+            iterable,
+            num_partitions=10,
+            reduce_function=None,
+            items_per_task=1,
+            num_items=None):
+        """
+        Map over iterable and group the mapped values by key, without
+        downloading them to this machine.
+
+        Map tasks write their output partitioned by a hash of the key. One
+        reduce task per partition then reads only that partition and groups
+        its values. See `kubeface.shuffle`. Partition data is stored under
+        the map job's cache key and removed by `cleanup`.
+
+        Parameters
+        ----------
+        function : callable
+            Python function called on each item, returning an iterable of
+            (key, value) pairs. Keys may be None, numbers, strings, bytes,
+            and tuples and frozensets of these (see
+            `kubeface.shuffle.key_bytes`).
+
+        iterable : iterable of object
+            items to pass to function
+
+        num_partitions : int
+            Number of partitions, i.e. of reduce tasks.
+
+        reduce_function : callable
+            If given, called on the backend as reduce_function(key, values),
+            and its return value used in place of the list of values.
+
+        items_per_task : int
+            Number of items per map task, as in `map`.
+
+        num_items : int
+            As in `map`.
+
+        Returns
+        -------
+        generator of (key, values) pairs, grouped by partition. Within a
+        key, values are in the order of iterable.
+        """
+        if num_partitions < 1:
+            raise ValueError("num_partitions must be at least 1")
+        if num_items is None:
+            try:
+                num_items = len(iterable)
+            except TypeError:
+                pass
+        num_tasks = None
+        if num_items is not None:
+            num_tasks = int(math.ceil(float(num_items) / items_per_task))
+
+        cache_key = self.next_cache_key()
+        tasks = (
+            Task(shuffle_map, (
+                function,
+                values,
+                self.storage,
+                cache_key,
+                task_num,
+                num_partitions))
+            for (task_num, values) in enumerate(
+                grouped(iterable, items_per_task)))
+        map_job = self.submit(tasks, num_tasks=num_tasks, cache_key=cache_key)
+        partition_paths = [[] for _ in range(num_partitions)]
+        for result in self.job_results(map_job, ordered=True):
+            for (partition, path) in result.return_value.items():
+                partition_paths[partition].append(path)
+
+        reduce_job = self.submit([
+            Task(shuffle_reduce, (paths, reduce_function))
+            for paths in partition_paths if paths
+        ])
+        for result in self.job_results(reduce_job, ordered=True):
+            for pair in result.return_value:
+                yield pair
+
+    def pipeline(self, functions, iterable, num_items=None):
+        """
+        Run each item of iterable through a chain of functions, each stage
+        starting on an item as soon as the previous stage has finished it.
+
+        Values are passed between stages through storage, without going
+        through this machine. See `kubeface.pipeline.Pipeline`.
+
+        Parameters
+        ----------
+        functions : list of callable
+            Stages, in order. Each is called with the previous stage's return
+            value (or an item of iterable, for the first stage).
+
+        iterable : iterable of object
+
+        num_items : int
+            As in `map`.
+
+        Returns
+        -------
+        generator of the last stage's return values, in order
+        """
+        return Pipeline(self, functions).run(iterable, num_items=num_items)
+
+    def imap_unordered(
+            self,
+            function,
+            iterable,
+            items_per_task=1,
+            num_items=None,
+            cache_key=None,
+            weight=1.0,
+            priority=0,
+            cost=None,
+            cost_window=100):
+        """
+        Parallel map yielding results in the order tasks complete.
+
+        Each task's results are yielded as soon as its completion is
+        discovered. Results from the same task are yielded together, in order.
+        Parameters are as in `map`.
+
+        Returns
+        -------
+        generator of task results, in completion order
+        """
+        return self.map(
+            function,
+            iterable,
+            items_per_task=items_per_task,
+            num_items=num_items,
+            cache_key=cache_key,
+            ordered=False,
+            weight=weight,
+            priority=priority,
+            cost=cost,
+            cost_window=cost_window)
+
     def mark_jobs_done(self, job_names=None):
         status_pages = set()
         status_prefixes = naming.status_prefixes(job_names=job_names)
         for prefix in status_prefixes:
             status_pages.update(storage.list_contents(
                 self.storage + "/" + prefix))
-        for source_object in status_pages:
+        moves = []
+        for source_object in sorted(status_pages):
             parsed = naming.JOB_STATUS_PAGE.make_tuple(source_object)
             if parsed.status == 'active':
                 new_parsed = parsed._replace(status="done")
@@ -309,13 +1201,22 @@ class Client(object):
                     parsed.job_name,
                     source_object,
                     dest_object))
-                storage.move(
+                moves.append((
                     self.storage + "/" + source_object,
-                    self.storage + "/" + dest_object)
+                    self.storage + "/" + dest_object))
             else:
                 logging.info("Already marked done: %s" % source_object)
+        failures = storage.move_many(moves)
+        for (source, exception) in sorted(failures.items()):
+            logging.warning("Couldn't mark done: %s: %s" % (
+                source, exception))
 
     def cleanup_job(self, job_name):
+        """
+        Delete a job's inputs, results, manifest and shuffle partitions, and
+        mark it done. Returns a dict of name -> exception for the objects
+        that could not be deleted.
+        """
         cache_key = naming.JOB.make_tuple(job_name).cache_key
         results = storage.list_contents(
             self.storage +
@@ -325,13 +1226,32 @@ class Client(object):
             self.storage +
             "/" +
             naming.task_input_prefix(cache_key))
-        logging.info("Cleaning up cache key '%s': %d results, %d inputs." % (
-            cache_key, len(results), len(inputs)))
+        manifests = storage.list_contents(
+            self.storage +
+            "/" +
+            naming.job_manifest_prefix(cache_key))
+        shuffle_partitions = storage.list_contents(
+            self.storage +
+            "/" +
+            naming.shuffle_prefix(cache_key))
+        logging.info(
+            "Cleaning up cache key '%s': %d results, %d inputs, "
+            "%d manifest chunks, %d shuffle partitions." % (
+                cache_key,
+                len(results),
+                len(inputs),
+                len(manifests),
+                len(shuffle_partitions)))
 
-        for item in results + inputs:
-            storage.delete(self.storage + "/" + item)
+        failures = storage.delete_many([
+            self.storage + "/" + item
+            for item in results + inputs + manifests + shuffle_partitions
+        ])
+        for (name, exception) in sorted(failures.items()):
+            logging.warning("Couldn't delete %s: %s" % (name, exception))
 
         self.mark_jobs_done(job_names=[job_name])
+        return failures
 
     def job_summary(self, job_names=None, include_done=False):
         prefixes = naming.status_prefixes(
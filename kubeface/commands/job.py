@@ -16,11 +16,25 @@ parser.add_argument("jobs", nargs="*")
 parser.add_argument(
     "--cleanup",
     action="store_true",
-    default=False)
+    default=False,
+    help="Delete the inputs and results of the specified jobs, or if none "
+    "are specified, of all jobs marked done.")
 parser.add_argument(
     "--include-done",
     action="store_true",
     default=False)
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    default=False,
+    help="Resume the specified jobs from their manifests and wait for "
+    "their submitted tasks to complete.")
+parser.add_argument(
+    "--resubmit-running",
+    action="store_true",
+    default=False,
+    help="With --resume, submit another attempt of every task that was "
+    "running.")
 
 Client.add_args(parser)
 
@@ -43,6 +57,33 @@ def run(argv=sys.argv[1:]):
     configure_logging(args)
 
     client = Client.from_args(args)
+
+    if args.resume:
+        if not args.jobs:
+            parser.error("Specify the jobs to resume")
+        for job_name in args.jobs:
+            job = client.resume(
+                job_name, resubmit_running=args.resubmit_running)
+            try:
+                job.wait(poll_seconds=client.poll_seconds)
+            finally:
+                job.close()
+                client.mark_jobs_done(job_names=[job_name])
+            print("Resumed job completed: %s" % job_name)
+
+    if args.cleanup:
+        to_clean = client.job_summary(
+            job_names=args.jobs if args.jobs else None,
+            include_done=True)
+        for job_info in to_clean:
+            if not args.jobs and job_info.status != "done":
+                continue
+            failures = client.cleanup_job(job_info.job_name)
+            print("Cleaned up job: %s%s" % (
+                job_info.job_name,
+                (" (%d objects not deleted)" % len(failures))
+                if failures else ""))
+
     summary = client.job_summary(
         job_names=args.jobs if args.jobs else None,
         include_done=args.include_done)
@@ -5,13 +5,12 @@ Run a task. Used internally, not meant to be called by a user.
 import sys
 import argparse
 import logging
-import tempfile
 import math
 import signal
 import traceback
 import os
 
-from .. import storage, serialization
+from .. import storage, storage_backend, serialization
 from ..common import configure_logging
 from ..context import RUNTIME_CONTEXT
 
@@ -26,6 +25,16 @@ parser.add_argument(
     default=False,
     help="Delete input file on success.")
 
+parser.add_argument(
+    "--storage-chunk-bytes",
+    type=int,
+    help="Transfer objects larger than this in chunks, concurrently.")
+
+parser.add_argument(
+    "--storage-transfer-threads",
+    type=int,
+    help="Threads transferring the chunks of one large object.")
+
 parser.add_argument(
     "--quiet",
     action="store_true",
@@ -47,6 +56,9 @@ def run(argv=sys.argv[1:]):
     signal.signal(signal.SIGUSR1, lambda sig, frame: traceback.print_stack())
 
     configure_logging(args)
+    storage_backend.configure_transfers(
+        chunk_bytes=args.storage_chunk_bytes,
+        transfer_threads=args.storage_transfer_threads)
 
     RUNTIME_CONTEXT["node_type"] = "task"
     RUNTIME_CONTEXT["task_input_path"] = args.input_path
@@ -65,14 +77,10 @@ def run(argv=sys.argv[1:]):
         result_type=result.result_type,
         result_time=int(math.ceil(result.end_time)))
 
-    with tempfile.TemporaryFile(
-            prefix="kubeface-run-task-result-", suffix=".pkl") as fd:
-        logging.info("Serializing result.")
+    logging.info("Writing: %s" % result_path)
+    with storage.open_write(result_path) as fd:
         serialization.dump(result, fd)
         logging.info("Serialized result to %d bytes." % fd.tell())
-        fd.seek(0)
-        logging.info("Writing: %s" % result_path)
-        storage.put(result_path, fd)
 
     if args.delete_input:
         logging.info("Deleting: %s" % args.input_path)
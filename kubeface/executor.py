@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import Executor, Future
+
+from .task import Task
+
+
+def run_calls(calls):
+    """
+    Run (function, args, kwargs) calls on a worker. Returns a list of
+    (return value, exception, traceback string) for each call, so that one
+    call raising does not lose the results of the others.
+    """
+    results = []
+    for (function, args, kwargs) in calls:
+        try:
+            results.append((function(*args, **kwargs), None, None))
+        except Exception as e:
+            results.append((None, e, traceback.format_exc()))
+    return results
+
+
+class KubefaceExecutor(Executor):
+    """
+    concurrent.futures Executor running calls as Kubeface tasks.
+
+    Calls submitted within batch_seconds of the first pending call (or until
+    max_batch_size calls are pending) are run together as one Job, with
+    calls_per_task calls per task. Futures are resolved as each task's result
+    is discovered, in whatever order tasks finish. Jobs run concurrently, and
+    share the Client's max_simultaneous_tasks with its other jobs.
+    """
+    def __init__(
+            self,
+            client,
+            batch_seconds=0.5,
+            max_batch_size=1000,
+            calls_per_task=1):
+        self.client = client
+        self.batch_seconds = batch_seconds
+        self.max_batch_size = max_batch_size
+        self.calls_per_task = calls_per_task
+
+        self.condition = threading.Condition()
+        self.pending = []  # (future, function, args, kwargs)
+        self.shutting_down = False
+        self.batcher = None
+        self.job_threads = []
+
+    def submit(self, fn, *args, **kwargs):
+        with self.condition:
+            if self.shutting_down:
+                raise RuntimeError(
+                    "cannot schedule new futures after shutdown")
+            future = Future()
+            self.pending.append((future, fn, args, kwargs))
+            if self.batcher is None:
+                self.batcher = threading.Thread(target=self.run_batcher)
+                self.batcher.daemon = True
+                self.batcher.start()
+            self.condition.notify_all()
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self.condition:
+            self.shutting_down = True
+            if cancel_futures:
+                for (future, _, _, _) in self.pending:
+                    future.cancel()
+            self.condition.notify_all()
+            batcher = self.batcher
+        if wait:
+            if batcher is not None:
+                batcher.join()
+            for thread in list(self.job_threads):
+                thread.join()
+
+    def run_batcher(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.shutting_down:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                deadline = time.time() + self.batch_seconds
+                while (len(self.pending) < self.max_batch_size and
+                        not self.shutting_down and
+                        time.time() < deadline):
+                    self.condition.wait(deadline - time.time())
+                batch = self.pending[:self.max_batch_size]
+                del self.pending[:self.max_batch_size]
+
+            batch = [
+                call for call in batch
+                if call[0].set_running_or_notify_cancel()
+            ]
+            if batch:
+                thread = threading.Thread(target=self.run_job, args=(batch,))
+                thread.daemon = True
+                with self.condition:
+                    self.job_threads.append(thread)
+                thread.start()
+
+    def run_job(self, batch):
+        groups = [
+            batch[i: i + self.calls_per_task]
+            for i in range(0, len(batch), self.calls_per_task)
+        ]
+        unresolved = dict(enumerate(groups))
+        try:
+            tasks = [
+                Task(run_calls, ([call[1:] for call in group],))
+                for group in groups
+            ]
+            job = self.client.submit(tasks, wait_to_raise_task_exception=True)
+            logging.info("Running %d calls in job %s" % (
+                len(batch), job.job_name))
+            try:
+                results = job.results_as_available(
+                    poll_seconds=self.client.poll_seconds,
+                    ordered=False)
+                for result in results:
+                    group = unresolved.pop(
+                        result.serialization_info["task_num"])
+                    if result.exception is not None:
+                        for (future, _, _, _) in group:
+                            future.set_exception(result.exception)
+                        continue
+                    for ((future, _, _, _), call_result) in zip(
+                            group, result.return_value):
+                        (value, exception, traceback_string) = call_result
+                        if exception is None:
+                            future.set_result(value)
+                        else:
+                            logging.debug("Call raised: %s" % (
+                                traceback_string))
+                            future.set_exception(exception)
+            finally:
+                job.close()
+                self.client.mark_jobs_done(job_names=[job.job_name])
+        except Exception as e:
+            logging.error("Job failed: %s" % e)
+            for group in unresolved.values():
+                for (future, _, _, _) in group:
+                    future.set_exception(e)
+        finally:
+            with self.condition:
+                self.job_threads.remove(threading.current_thread())
@@ -1,15 +1,55 @@
+import asyncio
+import collections
 import logging
-import time
 import tempfile
-import collections
+import time
 
 from numpy import percentile, mean
 
 from .serialization import dump
 from . import storage, naming, context
+from .storage import IncrementalListing
 from .status_writer import DefaultStatusWriter
 from .common import human_readable_memory_size
 from .result import Result
+from .upload_pipeline import UploadPipeline
+from .result_prefetcher import ResultPrefetcher
+from .task_table import TaskTable
+from .manifest import JobManifest
+from . import aio
+
+
+class CompletionCursor(object):
+    """
+    Progress of a Job method that runs the job while yielding tasks as they
+    complete: which tasks to yield next, when to poll, and when to stop.
+    """
+    def __init__(self, job, poll_seconds, ordered):
+        self.job = job
+        self.poll_seconds = poll_seconds
+        self.ordered = ordered
+        self.num_yielded = 0
+        self.finished = False
+        self.next_poll_time = 0
+
+    def polled(self, finished):
+        self.finished = finished
+        self.next_poll_time = (
+            time.time() + self.job.poll_interval(self.poll_seconds))
+
+    def poll_due(self):
+        return not self.finished and time.time() > self.next_poll_time
+
+    def seconds_until_poll(self):
+        return max(0, self.next_poll_time - time.time())
+
+    def available(self):
+        return self.job.available_task_nums(self.num_yielded, self.ordered)
+
+    def done(self):
+        return (
+            self.finished and
+            self.num_yielded == self.job.tasks.num_submitted)
 
 
 class Job(object):
@@ -24,7 +64,24 @@ class Job(object):
             wait_to_raise_task_exception=False,
             speculation_percent=0,
             speculation_runtime_percentile=99,
-            speculation_max_reruns=0):
+            speculation_max_reruns=0,
+            upload_threads=4,
+            upload_prefetch_tasks=10,
+            upload_prefetch_bytes=2**31,
+            result_prefetch_results=4,
+            result_prefetch_bytes=2**30,
+            result_download_threads=4,
+            result_deserialize_processes=0,
+            status_interval_seconds=10.0,
+            memoize=False,
+            job_name=None,
+            manifest_records=None,
+            num_manifest_chunks=0,
+            poller=None,
+            scheduler=None,
+            scheduler_weight=1.0,
+            scheduler_priority=0,
+            blocking_submission=True):
 
         self.backend = backend
         self.tasks_iter = tasks_iter
@@ -36,15 +93,65 @@ class Job(object):
         self.speculation_percent = speculation_percent
         self.speculation_runtime_percentile = speculation_runtime_percentile
         self.speculation_max_reruns = speculation_max_reruns
+        self.memoize = memoize
+        self.poller = poller
+        self.scheduler = scheduler
+        self.scheduler_weight = scheduler_weight
+        self.scheduler_priority = scheduler_priority
+        self.scheduler_registered = False
+        self.blocking_submission = blocking_submission
+
+        if job_name is None:
+            job_name = naming.make_job_name(
+                self.cache_key, node_id=context.node_id())
+        self.job_name = job_name
+        self.tasks = TaskTable(capacity=num_tasks if num_tasks else 1024)
+        self.all_tasks_submitted = False
+        self.speculation_runtime_threshold = None
+
+        # Only used when memoizing. Fingerprints are kept for submitted tasks
+        # until their result is memoized.
+        self.task_fingerprints = {}  # task_num -> fingerprint
+        self.memo_reused_tasks = {}  # task_num -> fingerprint
+
+        # Results of completed tasks are cheaply skipped by
+        # process_result_name, so the listing does not need to remember
+        # every result name.
+        self.result_listing = IncrementalListing(remember_seen=False)
+        self.status_writer = DefaultStatusWriter(
+            storage,
+            self.job_name,
+            min_interval_seconds=status_interval_seconds)
+        self.manifest = JobManifest(
+            storage,
+            self.job_name,
+            min_interval_seconds=status_interval_seconds,
+            first_sequence_num=num_manifest_chunks)
+        if manifest_records:
+            self.restore(manifest_records)
+        else:
+            self.manifest.append({
+                'event': 'job',
+                'cache_key': self.cache_key,
+                'num_tasks': self.num_tasks,
+                'memoize': self.memoize,
+            })
+
+        # When resuming, tasks_iter yields only the tasks not yet submitted.
+        self.upload_pipeline = UploadPipeline(
+            tasks_iter,
+            self.upload_task_input,
+            num_threads=upload_threads,
+            max_prefetch_tasks=upload_prefetch_tasks,
+            max_prefetch_bytes=upload_prefetch_bytes,
+            first_task_num=self.tasks.num_submitted)
+        self.result_prefetcher = ResultPrefetcher(
+            max_prefetch_results=result_prefetch_results,
+            max_prefetch_bytes=result_prefetch_bytes,
+            download_threads=result_download_threads,
+            deserialize_processes=result_deserialize_processes)
 
-        self.job_name = naming.make_job_name(
-            self.cache_key, node_id=context.node_id())
-        self.task_queue_times = collections.defaultdict(list)
-        self.submitted_tasks = []
-        self.reused_tasks = set()
-        self.completed_tasks = {}
-        self.running_tasks = set()
-        self.status_writer = DefaultStatusWriter(storage, self.job_name)
+        self.join_scheduler()
 
         self.status_writer.print_info()
 
@@ -59,21 +166,38 @@ class Job(object):
 
     def status_dict(self):
         result = dict(self.static_status_dict)
-        result["submitted_tasks"] = list(self.submitted_tasks)
-        result["completed_tasks"] = list(self.completed_tasks)
-        result["running_tasks"] = list(self.running_tasks)
-        result['reused_tasks'] = list(self.reused_tasks)
+        result.update(self.tasks.summary())
+        result["running_tasks"] = self.running_task_names()
         return result
 
+    def task_name(self, task_num):
+        return naming.TASK.make_string(
+            cache_key=self.cache_key,
+            task_num=task_num)
+
+    def running_task_names(self):
+        return [
+            self.task_name(task_num)
+            for task_num in self.tasks.running_task_nums()
+        ]
+
+    def update_status(self, force=False):
+        # Building the status dict is O(number of tasks), so skip it when the
+        # status writer would just coalesce it away.
+        if force or self.status_writer.due():
+            self.status_writer.update(self.status_dict())
+
     def storage_path(self, filename):
         return self.storage + "/" + filename
 
-    def submit_task(self, task_name):
+    def submit_task(self, task_num):
+        self.tasks.grow(task_num + 1)
+        task_name = self.task_name(task_num)
         queue_time = int(time.time())
         task_result_template = self.storage_path(
             naming.TASK_RESULT.template.format(
                 task_name=task_name,
-                attempt_num=len(self.task_queue_times[task_name]),
+                attempt_num=int(self.tasks.num_attempts[task_num]),
                 queue_time=queue_time,
                 result_type="{result_type}",   # filled in by worker
                 result_time="{result_time}"))  # filled in by worker
@@ -82,98 +206,463 @@ class Job(object):
             naming.TASK_INPUT.make_string(task_name=task_name))
 
         self.backend.submit_task(task_name, task_input, task_result_template)
-        self.status_writer.update(self.status_dict())
-        self.submitted_tasks.append(task_name)
-        self.task_queue_times[task_name].append(queue_time)
+        attempt_num = self.tasks.mark_submitted(task_num, queue_time)
+        self.manifest.append({
+            'event': 'submitted',
+            'task_num': int(task_num),
+            'attempt_num': attempt_num,
+            'queue_time': queue_time,
+            'task_input': task_input,
+            'fingerprint': self.task_fingerprints.get(task_num),
+        })
+        self.update_status()
+
+    def memo_path(self, fingerprint):
+        return self.storage_path(
+            naming.TASK_MEMO.make_string(fingerprint=fingerprint))
+
+    def upload_task_input(self, task_num, task):
+        """
+        Serialize and upload one task's input. Called from upload pipeline
+        threads.
+        """
+        if self.tasks.is_completed(task_num):
+            return {
+                'task_num': task_num,
+                'reused': True,
+                'input_bytes': 0,
+                'fingerprint': None,
+            }
+
+        task_name = self.task_name(task_num)
+        task_input = self.storage_path(
+            naming.TASK_INPUT.make_string(task_name=task_name))
+        fingerprint = None
+        if self.memoize:
+            # The input is fingerprinted as it is serialized, to a temporary
+            # file, and only uploaded if no memoized result exists.
+            with tempfile.TemporaryFile(prefix="kubeface-input-") as fd:
+                handle = naming.FingerprintingWriter(fd)
+                dump(task, handle)
+                input_bytes = fd.tell()
+                fingerprint = handle.fingerprint()
+                if storage.exists(self.memo_path(fingerprint)):
+                    return {
+                        'task_num': task_num,
+                        'reused': True,
+                        'input_bytes': 0,
+                        'fingerprint': fingerprint,
+                    }
+                logging.info("Uploading: %s [%s] for task %s" % (
+                    task_input,
+                    human_readable_memory_size(input_bytes),
+                    task_name))
+                fd.seek(0)
+                storage.put(task_input, fd)
+        else:
+            # Serialize straight into storage.
+            with storage.open_write(task_input) as fd:
+                dump(task, fd)
+                input_bytes = fd.tell()
+                logging.info("Uploading: %s [%s] for task %s" % (
+                    task_input,
+                    human_readable_memory_size(input_bytes),
+                    task_name))
+        return {
+            'task_num': task_num,
+            'reused': False,
+            'input_bytes': input_bytes,
+            'fingerprint': fingerprint,
+        }
 
     def submit_next_task(self):
-        task_name = None
-        while task_name is None:
+        """
+        Submit the next task. Returns True if a task was submitted and False
+        if there are no more tasks. If blocking_submission is False and the
+        next task's input is not uploaded yet (e.g. because tasks_iter is
+        waiting on something), returns None instead of waiting.
+        """
+        while True:
             try:
-                task = next(self.tasks_iter)
+                info = self.upload_pipeline.next_ready(
+                    block=self.blocking_submission)
             except StopIteration:
                 return False
+            if info is None:
+                return None
 
-            task_name = naming.TASK.make_string(
-                cache_key=self.cache_key,
-                task_num=len(self.submitted_tasks))
+            task_num = info['task_num']
+            if not info['reused']:
+                break
 
-            if task_name in self.completed_tasks:
-                completed_task_info = self.completed_tasks[task_name]
-                logging.info("Using existing result: %s" % (
-                    completed_task_info['task_result_name']))
-                self.reused_tasks.add(task_name)
-                self.submitted_tasks.append(task_name)
-                task_name = None
+            if info['fingerprint'] is not None:
+                self.memo_reused_tasks[task_num] = info['fingerprint']
+            self.tasks.mark_reused(task_num)
+            self.manifest.append({
+                'event': 'reused',
+                'task_num': task_num,
+                'fingerprint': info['fingerprint'],
+            })
+            logging.info("Using existing result: %s" % (
+                self.result_path(task_num)))
 
-        task_input = self.storage_path(
-            naming.TASK_INPUT.make_string(task_name=task_name))
-        with tempfile.TemporaryFile(prefix="kubeface-upload-") as fd:
-            dump(task, fd)
-            size_string = human_readable_memory_size(fd.tell())
-            logging.info("Uploading: %s [%s] for task %s" % (
-                task_input,
-                size_string,
-                task_name))
-            fd.seek(0)
-            storage.put(task_input, fd)
-
-        self.submit_task(task_name)
+        if info['fingerprint'] is not None:
+            self.task_fingerprints[task_num] = info['fingerprint']
+        self.submit_task(task_num)
         return True
 
+    def close(self):
+        """
+        Stop uploading task inputs and downloading results in the background,
+        and wait for the last status update to be written.
+        """
+        self.upload_pipeline.stop()
+        self.result_prefetcher.close()
+        self.leave_scheduler()
+        self.status_writer.close()
+        self.manifest.flush(force=True)
+
+    def restore(self, manifest_records):
+        """
+        Rebuild scheduler state from the manifest records written by an
+        earlier master running this job, plus one listing of the job's
+        results.
+        """
+        result_names = self.result_listing.new_contents(
+            self.storage_path(naming.task_result_prefix(self.cache_key)))
+        result_names_by_task_num = {}
+        for result_name in result_names:
+            task_info = naming.TASK.make_tuple(
+                naming.TASK_RESULT.make_tuple(result_name).task_name)
+            if task_info.cache_key == self.cache_key:
+                result_names_by_task_num.setdefault(
+                    task_info.task_num, result_name)
+
+        for record in manifest_records:
+            event = record['event']
+            if event == 'submitted':
+                task_num = record['task_num']
+                self.tasks.mark_submitted(task_num, record['queue_time'])
+                if record['fingerprint'] is not None:
+                    self.task_fingerprints[task_num] = record['fingerprint']
+            elif event == 'reused':
+                task_num = record['task_num']
+                if record['fingerprint'] is not None:
+                    self.memo_reused_tasks[task_num] = record['fingerprint']
+                else:
+                    if task_num not in result_names_by_task_num:
+                        raise RuntimeError(
+                            "Can't resume job %s: result for reused task %d "
+                            "is missing" % (self.job_name, task_num))
+                    self.tasks.mark_completed(
+                        task_num,
+                        naming.TASK_RESULT.make_tuple(
+                            result_names_by_task_num[task_num]))
+                self.tasks.mark_reused(task_num)
+            elif event == 'all_tasks_submitted':
+                self.all_tasks_submitted = True
+
+        for result_name in result_names:
+            self.process_result_name(result_name)
+
+        logging.info(
+            "Restored job %s: %d tasks submitted, %d completed, "
+            "%d running." % (
+                self.job_name,
+                self.tasks.num_submitted,
+                self.tasks.num_completed,
+                self.tasks.num_running))
+
+    def resubmit_running(self):
+        """
+        Submit another attempt of every running task. Useful when resuming a
+        job whose workers may have died along with the master.
+        """
+        for task_num in self.tasks.running_task_nums():
+            self.submit_task(task_num)
+
+    def result_listing_arguments(self):
+        """
+        (prefix, start_offset) to list new results of running tasks.
+        """
+        running_task_names = self.running_task_names()
+        start_offset = None
+        if running_task_names:
+            start_offset = self.storage_path(
+                naming.task_result_start_offset(running_task_names))
+        prefix = self.storage_path(
+            naming.task_result_prefix(self.cache_key, running_task_names))
+        return (prefix, start_offset)
+
     def update(self):
-        completed_task_result_names = storage.list_contents(
-            self.storage_path(
-                naming.task_result_prefix(self.cache_key, self.running_tasks)))
+        # Only results at or after the first running task are listed, and
+        # not at all if the listing's watermark is unchanged.
+        (prefix, start_offset) = self.result_listing_arguments()
+        self.process_new_result_names(
+            self.result_listing.new_contents(
+                prefix, start_offset=start_offset))
+
+    async def update_async(self):
+        (prefix, start_offset) = self.result_listing_arguments()
+        names = await aio.new_contents(
+            self.result_listing, prefix, start_offset=start_offset)
+        await aio.run_storage(
+            self.storage, self.process_new_result_names, names)
+
+    def process_new_result_names(self, completed_task_result_names):
+        detected_time = time.time()
         for completed_task_result_name in completed_task_result_names:
-            info = naming.TASK_RESULT.make_tuple(completed_task_result_name)
-            if info.task_name not in self.completed_tasks:
-                if info.result_type == 'exception':
-                    result = Result.from_storage(
-                        self.storage_path(completed_task_result_name))
-                    result.log()
-                    if self.wait_to_raise_task_exception:
-                        logging.warning(
-                            "Waiting for other tasks to run before raising "
-                            "exception.")
-                    else:
-                        result.raise_if_exception()
-                        assert False
-                self.completed_tasks[info.task_name] = {
-                    'parsed_result_name': info,
-                    'task_result_name': completed_task_result_name,
-                }
-
-        self.running_tasks = set(self.submitted_tasks).difference(
-            set(self.completed_tasks))
+            self.process_result_name(
+                completed_task_result_name, detected_time=detected_time)
+
+    def process_result_name(self, completed_task_result_name,
+                            detected_time=None):
+        # Every poll lists the results of tasks completed since the lowest
+        # running task, so skip those before parsing the whole name.
+        task_num = naming.task_result_task_num(
+            self.cache_key, completed_task_result_name)
+        if task_num is None or self.tasks.is_completed(task_num):
+            return
+        info = naming.TASK_RESULT.make_tuple(completed_task_result_name)
+        if info.result_type == 'exception':
+            result = Result.from_storage(
+                self.storage_path(completed_task_result_name))
+            result.log()
+            if self.wait_to_raise_task_exception:
+                logging.warning(
+                    "Waiting for other tasks to run before raising "
+                    "exception.")
+            else:
+                result.raise_if_exception()
+                assert False
+        self.tasks.mark_completed(task_num, info, detected_time=detected_time)
+
+        fingerprint = self.task_fingerprints.pop(task_num, None)
+        if fingerprint is not None and info.result_type == 'value':
+            memo_path = self.memo_path(fingerprint)
+            logging.info("Memoizing result of task %s: %s" % (
+                info.task_name, memo_path))
+            storage.copy(
+                self.storage_path(completed_task_result_name), memo_path)
 
     def tasks_elegible_for_speculation(self, speculation_runtime_threshold):
-        # Consider speculating.
-        elegible_tasks_by_runtime = [
-            task_name
-            for task_name in self.running_tasks
-            if (
-                time.time() - self.task_queue_times[task_name][-1] >
-                speculation_runtime_threshold)
-        ]
-        elegible_tasks = [
-            task_name
-            for task_name in elegible_tasks_by_runtime
-            if (
-                len(self.task_queue_times[task_name]) <
-                self.speculation_max_reruns)
-        ]
+        (elegible_tasks, num_over_threshold) = (
+            self.tasks.speculation_candidates(
+                speculation_runtime_threshold,
+                max_attempts=self.speculation_max_reruns,
+                now=time.time()))
         logging.info(
             "%d tasks could be speculatively rerun based "
             "on a queue time threshold of %0.2f sec; of "
             "these %d are elegible because they have not "
             "been run more than %d times." % (
-                len(elegible_tasks_by_runtime),
+                num_over_threshold,
                 speculation_runtime_threshold,
                 len(elegible_tasks),
                 self.speculation_max_reruns))
         return elegible_tasks
 
+    def enable_speculation_if_needed(self):
+        percent_tasks_running = (
+            self.tasks.num_running * 100.0 /
+            self.tasks.num_submitted)
+        if percent_tasks_running >= self.speculation_percent:
+            return
+        elapsed_times = self.tasks.completed_elapsed_times()
+        if len(elapsed_times) == 0:
+            return
+        self.speculation_runtime_threshold = percentile(
+            elapsed_times,
+            self.speculation_runtime_percentile)
+        logging.info(
+            "Enabling speculation: %0.2f%% of tasks "
+            "running. "
+            "Task queue times (sec): "
+            "min=%0.1f mean=%0.1f max=%0.1f. Queue time "
+            "threshold for resubmitting tasks will be "
+            "%0.0f percentile of these times, which is "
+            "%0.2f" % (
+                percent_tasks_running,
+                min(elapsed_times),
+                mean(elapsed_times),
+                max(elapsed_times),
+                self.speculation_runtime_percentile,
+                self.speculation_runtime_threshold))
+
+    def speculate(self):
+        elegible_tasks = self.tasks_elegible_for_speculation(
+            self.speculation_runtime_threshold)
+        if len(elegible_tasks) == 0:
+            return
+
+        capacity = max(
+            0,
+            self.max_simultaneous_tasks - self.tasks.num_running_attempts())
+        if self.scheduler is not None:
+            capacity = min(capacity, self.scheduler_allowance())
+        to_speculate = elegible_tasks[:capacity]
+        logging.info(
+            "Capacity for re-running up to %d tasks. "
+            "Will speculatively re-run %d tasks." % (
+                capacity,
+                len(to_speculate)))
+        for task_num in to_speculate:
+            self.submit_task(task_num)
+
+    def join_scheduler(self):
+        if self.scheduler is not None and not self.scheduler_registered:
+            self.scheduler.register(
+                self.job_name,
+                weight=self.scheduler_weight,
+                priority=self.scheduler_priority)
+            self.scheduler_registered = True
+
+    def leave_scheduler(self):
+        """
+        Give up this job's share of the client's task slots. Done when the
+        job finishes, fails or is closed; polling again joins again.
+        """
+        if self.scheduler is not None and self.scheduler_registered:
+            self.scheduler.unregister(self.job_name)
+            self.scheduler_registered = False
+
+    def scheduler_demand(self):
+        """
+        Number of task attempts this job could run at once right now.
+        """
+        demand = self.tasks.num_running_attempts()
+        if not self.all_tasks_submitted:
+            if not self.blocking_submission:
+                # Only count tasks that are ready to submit, plus one to find
+                # out that there are no more once tasks_iter is exhausted.
+                return (
+                    demand +
+                    self.upload_pipeline.num_ready() +
+                    int(self.upload_pipeline.exhausted))
+            if self.num_tasks is None:
+                return float('inf')
+            # At least one more, to find out if the tasks are exhausted.
+            demand += max(1, self.num_tasks - self.tasks.num_submitted)
+        elif self.speculation_runtime_threshold is not None:
+            demand += self.tasks.num_running
+        return demand
+
+    def scheduler_allowance(self):
+        """
+        Number of new task attempts the client's scheduler allows this job to
+        start now.
+        """
+        return self.scheduler.request(
+            self.job_name,
+            running=self.tasks.num_running_attempts(),
+            demand=self.scheduler_demand())
+
+    def poll(self):
+        """
+        Run one round of scheduling: discover completed tasks, submit new
+        tasks up to max_simultaneous_tasks, and once all tasks have been
+        submitted, consider speculatively rerunning stragglers.
+
+        Returns True once all tasks have completed.
+        """
+        try:
+            self.join_scheduler()
+            self.update()
+            return self.finish_poll()
+        except BaseException:
+            # E.g. a task raised. Otherwise our running tasks would count
+            # against the client's other jobs until this job is closed.
+            self.leave_scheduler()
+            raise
+
+    async def poll_async(self):
+        """
+        Like poll, for use from an asyncio event loop.
+        """
+        try:
+            self.join_scheduler()
+            await self.update_async()
+            return await aio.run_blocking(self.finish_poll)
+        except BaseException:
+            self.leave_scheduler()
+            raise
+
+    def finish_poll(self):
+        """
+        The part of a poll after discovering completed tasks.
+        """
+        finished = self.schedule()
+        self.manifest.flush(force=finished)
+        if finished:
+            # Write the final status now, and stop the writer's thread,
+            # rather than leaving that to close(), which callers that just
+            # wait on the job may never call.
+            self.status_writer.close()
+        if self.scheduler is not None:
+            if finished:
+                self.leave_scheduler()
+            else:
+                self.scheduler.update(
+                    self.job_name,
+                    running=self.tasks.num_running_attempts(),
+                    demand=self.scheduler_demand())
+        return finished
+
+    def schedule(self):
+        if not self.all_tasks_submitted:
+            # Start uploading even if we can't submit anything yet.
+            self.upload_pipeline.start()
+            num_to_submit = max(
+                0,
+                self.max_simultaneous_tasks -
+                self.tasks.num_running)
+            if self.scheduler is not None:
+                num_to_submit = min(num_to_submit, self.scheduler_allowance())
+            if num_to_submit == 0:
+                return False
+
+            logging.info("Submitting up to %d tasks" % num_to_submit)
+            for _ in range(num_to_submit):
+                submitted = self.submit_next_task()
+                if submitted is None:
+                    # The next task is not ready yet.
+                    return False
+                if not submitted:
+                    break
+            else:
+                return False
+
+            # We've submitted all our tasks.
+            self.all_tasks_submitted = True
+            self.manifest.append({'event': 'all_tasks_submitted'})
+
+        if self.tasks.num_running == 0:
+            self.update_status(force=True)
+            return True
+        self.update_status()
+
+        if self.speculation_runtime_threshold is None:
+            self.enable_speculation_if_needed()
+
+        if self.speculation_runtime_threshold is not None:
+            self.speculate()
+
+        logging.info("Waiting for %d tasks to complete: %s" % (
+            self.tasks.num_running,
+            " ".join(self.running_task_names())))
+        return False
+
+    def poll_interval(self, poll_seconds):
+        """
+        Seconds to sleep before the next poll: poll_seconds, unless the job
+        has an adaptive poller.
+        """
+        if self.poller is None:
+            return poll_seconds
+        interval = self.poller.next_interval(self.tasks, time.time())
+        logging.debug("Next poll in %0.2f sec" % interval)
+        return interval
+
     def wait(self, poll_seconds=5.0):
         """
         Run all tasks to completion.
@@ -191,85 +680,140 @@ class Job(object):
             - We are still limited by max_simultaneous_tasks. If more than this
               number of tasks fail, we won't be able to recover.
         """
+        while not self.poll():
+            time.sleep(self.poll_interval(poll_seconds))
 
-        while True:
-            self.update()
-            num_to_submit = max(
-                0,
-                self.max_simultaneous_tasks -
-                len(self.running_tasks))
-            if num_to_submit == 0:
-                time.sleep(poll_seconds)
-                continue
-
-            logging.info("Submitting %d tasks" % num_to_submit)
-            if not all(self.submit_next_task() for _ in range(num_to_submit)):
-                # We've submitted all our tasks.
-                speculation_runtime_threshold = None
-                while True:
-                    self.update()
-                    self.status_writer.update(self.status_dict())
-                    if not self.running_tasks:
-                        return
-
-                    if speculation_runtime_threshold is None:
-                        percent_tasks_running = (
-                            len(self.running_tasks) * 100.0 /
-                            len(self.submitted_tasks))
-                        if percent_tasks_running < self.speculation_percent:
-                            elapsed_times = [
-                                int(t["parsed_result_name"].result_time) -
-                                int(t["parsed_result_name"].queue_time)
-                                for t in self.completed_tasks.values()
-                            ]
-                            speculation_runtime_threshold = percentile(
-                                elapsed_times,
-                                self.speculation_runtime_percentile)
-                            logging.info(
-                                "Enabling speculation: %0.2f%% of tasks "
-                                "running. "
-                                "Task queue times (sec): "
-                                "min=%0.1f mean=%0.1f max=%0.1f. Queue time "
-                                "threshold for resubmitting tasks will be "
-                                "%0.0f percentile of these times, which is "
-                                "%0.2f" % (
-                                    percent_tasks_running,
-                                    min(elapsed_times),
-                                    mean(elapsed_times),
-                                    max(elapsed_times),
-                                    self.speculation_runtime_percentile,
-                                    speculation_runtime_threshold))
-
-                    if speculation_runtime_threshold is not None:
-                        elegible_tasks = self.tasks_elegible_for_speculation(
-                            speculation_runtime_threshold)
-
-                        if elegible_tasks:
-                            capacity = max(
-                                0,
-                                self.max_simultaneous_tasks - sum(
-                                    len(self.task_queue_times[task_name])
-                                    for task_name in self.running_tasks))
-                            to_speculate = elegible_tasks[:capacity]
-                            logging.info(
-                                "Capacity for re-running up to %d tasks. "
-                                "Will speculatively re-run %d tasks." % (
-                                    capacity,
-                                    len(to_speculate)))
-                            for task_name in to_speculate:
-                                self.submit_task(task_name)
-
-                    logging.info("Waiting for %d tasks to complete: %s" % (
-                        len(self.running_tasks),
-                        " ".join(self.running_tasks)))
-                    time.sleep(poll_seconds)
+    async def wait_async(self, poll_seconds=5.0):
+        """
+        Like wait, for use from an asyncio event loop.
+        """
+        while not await self.poll_async():
+            await asyncio.sleep(self.poll_interval(poll_seconds))
+
+    def result_name(self, task_num):
+        return naming.TASK_RESULT.make_string(
+            task_name=self.task_name(task_num),
+            **self.tasks.result_fields(task_num))
+
+    def result_path(self, task_num):
+        if task_num in self.memo_reused_tasks:
+            return self.memo_path(self.memo_reused_tasks[task_num])
+        return self.storage_path(self.result_name(task_num))
 
     def results(self):
         self.update()
-        if self.running_tasks:
+        if self.tasks.num_running:
             raise RuntimeError("Not all tasks have completed")
-        for task_name in self.submitted_tasks:
-            result_file = self.storage_path(
-                self.completed_tasks[task_name]['task_result_name'])
-            result = Result.from_storage(result_file)
+        return self.result_prefetcher.iterate(
+            self.result_path(task_num)
+            for task_num in range(self.tasks.num_submitted))
+
+    def available_task_nums(self, num_yielded, ordered):
+        """
+        Task nums of results that can be yielded after num_yielded results
+        have been, in the order they should be yielded.
+        """
+        if ordered:
+            end = num_yielded
+            while (end < self.tasks.num_submitted and
+                    self.tasks.is_completed(end)):
+                end += 1
+            return list(range(num_yielded, end))
+        return list(self.tasks.completion_order[
+            num_yielded:self.tasks.num_in_completion_order])
+
+    def iterate_completed(self, poll_seconds, ordered, load):
+        """
+        Run the job, yielding (task_num, value) for each task once it has
+        completed. Values come from the iterable load(task_nums), which is
+        called with each batch of task nums that became available together.
+        """
+        cursor = CompletionCursor(self, poll_seconds, ordered)
+        while not cursor.done():
+            if not cursor.finished:
+                cursor.polled(self.poll())
+
+            available = cursor.available()
+            for (task_num, value) in zip(available, load(available)):
+                cursor.num_yielded += 1
+                yield (task_num, value)
+                if cursor.poll_due():
+                    cursor.polled(self.poll())
+
+            if not cursor.finished and not available:
+                time.sleep(cursor.seconds_until_poll())
+
+    def completed_task_nums(self, poll_seconds=5.0, ordered=True):
+        """
+        Run the job, yielding each task's task_num once it has completed.
+        Like results_as_available, but results are not downloaded.
+        """
+        for (task_num, _) in self.iterate_completed(
+                poll_seconds, ordered, lambda task_nums: task_nums):
+            yield task_num
+
+    def record_result(self, task_num, result):
+        self.tasks.result_bytes[task_num] = (
+            result.serialization_info["result_bytes"])
+        result.serialization_info["task_num"] = task_num
+
+    def results_as_available(self, poll_seconds=5.0, ordered=True):
+        """
+        Run the job, yielding each task's Result while other tasks are still
+        running.
+
+        If ordered is True, results are yielded in task order: each is yielded
+        as soon as it and all tasks before it have completed. Otherwise each
+        result is yielded as soon as its completion is discovered.
+
+        Each Result's serialization_info["task_num"] gives its task.
+
+        Results are only downloaded a bounded number ahead of what the caller
+        has consumed. While the caller is busy, scheduling continues each time
+        a result is requested and the poll interval (see poll_interval) has
+        passed since the last poll.
+        """
+        def download(task_nums):
+            return self.result_prefetcher.iterate(
+                self.result_path(task_num) for task_num in task_nums)
+
+        for (task_num, result) in self.iterate_completed(
+                poll_seconds, ordered, download):
+            self.record_result(task_num, result)
             yield result
+
+    async def results_as_available_async(self, poll_seconds=5.0, ordered=True):
+        """
+        Async generator version of results_as_available, for use from an
+        asyncio event loop. Up to result_prefetch_results results are
+        downloaded concurrently.
+        """
+        max_loading = self.result_prefetcher.max_prefetch_results
+        cursor = CompletionCursor(self, poll_seconds, ordered)
+        loading = collections.deque()
+        try:
+            while not cursor.done():
+                if not cursor.finished:
+                    cursor.polled(await self.poll_async())
+
+                available = cursor.available()
+                to_load = iter(available)
+                for task_num in available:
+                    while len(loading) < max_loading:
+                        next_task_num = next(to_load, None)
+                        if next_task_num is None:
+                            break
+                        loading.append(asyncio.ensure_future(
+                            aio.load_result(self.result_path(next_task_num))))
+                    result = await loading.popleft()
+                    self.record_result(task_num, result)
+                    cursor.num_yielded += 1
+                    yield result
+                    if cursor.poll_due():
+                        cursor.polled(await self.poll_async())
+
+                if not cursor.finished and not available:
+                    await asyncio.sleep(cursor.seconds_until_poll())
+        finally:
+            for future in loading:
+                future.cancel()
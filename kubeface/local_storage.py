@@ -0,0 +1,264 @@
+import os
+import shutil
+import tempfile
+import time
+from urllib.parse import quote, unquote
+
+from . import storage_backend
+from .storage_backend import StorageBackend, ObjectWriter
+
+# A local directory's modification time is only trusted as a listing
+# watermark if the directory was last modified at least this long before we
+# listed it. Otherwise a file created within the same timestamp tick as the
+# watermark could be missed.
+LOCAL_WATERMARK_SLACK_SECONDS = 2.0
+
+COPY_BUFFER_BYTES = 2**20
+
+# Temporary files are created readable by the owner only. Written files get
+# the permissions open() would have given them.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# Separator of the components of naming.Stringable names.
+COMPONENT_SEPARATOR = "::"
+
+TEMPORARY_FILE_PREFIX = ".kubeface-tmp-"
+
+
+def shard_directory(name):
+    """
+    Directory, relative to the storage directory, holding the file for the
+    object with the given name.
+
+    Names with at least three components, such as
+    "result::{cache_key}::{task_num}...", go in "{kind}::/{cache_key}". Names
+    with two components, such as "memo::{fingerprint}", go in "{kind}::".
+    Other names are kept at the top level.
+    """
+    pieces = name.split(COMPONENT_SEPARATOR)
+    if len(pieces) < 2:
+        return ""
+    kind_directory = pieces[0] + COMPONENT_SEPARATOR
+    if len(pieces) == 2:
+        return kind_directory
+    return os.path.join(kind_directory, quote_component(pieces[1]))
+
+
+def quote_component(component):
+    quoted = quote(component, safe=":")
+    if quoted in ("", ".", ".."):
+        quoted = quoted.replace(".", "%2E") + "%"
+    return quoted
+
+
+def unquote_component(directory_name):
+    if directory_name.endswith("%"):
+        directory_name = directory_name[:-1]
+    return unquote(directory_name)
+
+
+def physical_path(path):
+    """
+    Path of the file for the object at path, i.e. with the object's shard
+    directory inserted before its name.
+    """
+    (directory, name) = os.path.split(path)
+    return os.path.join(directory, shard_directory(name), name)
+
+
+def scan_subdirectories(directory):
+    try:
+        with os.scandir(directory) as entries:
+            return [entry for entry in entries if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+
+
+def listing_directories(prefix):
+    """
+    Directories that may hold files for objects whose path starts with
+    prefix. Always includes the storage directory itself, which holds
+    unsharded names and files written before objects were sharded.
+    """
+    (directory, name_prefix) = os.path.split(prefix)
+    directory = directory or "."
+    result = [directory]
+    pieces = name_prefix.split(COMPONENT_SEPARATOR)
+    if len(pieces) == 1:
+        # The kind is not complete: look at every kind it may be a prefix of.
+        kind_directories = [
+            entry.path for entry in scan_subdirectories(directory)
+            if entry.name.endswith(COMPONENT_SEPARATOR) and
+            entry.name.startswith(pieces[0])
+        ]
+        result.extend(kind_directories)
+        for kind_directory in kind_directories:
+            result.extend(
+                entry.path
+                for entry in scan_subdirectories(kind_directory))
+    else:
+        kind_directory = os.path.join(
+            directory, pieces[0] + COMPONENT_SEPARATOR)
+        if len(pieces) == 2:
+            # The second component (e.g. the cache key) may be incomplete.
+            result.append(kind_directory)
+            result.extend(
+                entry.path
+                for entry in scan_subdirectories(kind_directory)
+                if unquote_component(entry.name).startswith(pieces[1]))
+        else:
+            result.append(
+                os.path.join(kind_directory, quote_component(pieces[1])))
+    return result
+
+
+class LocalWriter(ObjectWriter):
+    """
+    Writes to a temporary file in the destination's directory, which is
+    renamed into place on close, so readers listing the directory never see
+    a partially written file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.fd = tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path) or ".",
+            prefix=TEMPORARY_FILE_PREFIX,
+            delete=False)
+
+    def write(self, data):
+        return self.fd.write(data)
+
+    def tell(self):
+        return self.fd.tell()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.fd.close()
+        os.chmod(self.fd.name, 0o666 & ~UMASK)
+        os.rename(self.fd.name, self.path)
+
+    def abort(self):
+        if not self.closed:
+            self.closed = True
+            self.fd.close()
+            os.unlink(self.fd.name)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Files on the local filesystem (or a shared mount), named by path.
+
+    Objects are stored in subdirectories of their directory determined by
+    their names (see shard_directory), so that listing the results of one
+    job only reads the directory holding them. Paths passed in and names
+    returned by list_contents are the unsharded ones. Objects written in
+    the flat layout used previously are still found.
+    """
+    def list_contents(self, prefix, start_offset=None):
+        name_prefix = os.path.basename(prefix)
+        start_name = (
+            os.path.basename(start_offset)
+            if start_offset is not None else None)
+        result = set()
+        for directory in listing_directories(prefix):
+            try:
+                entries = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    name = entry.name
+                    if (name.startswith(name_prefix) and
+                            not name.startswith(TEMPORARY_FILE_PREFIX) and
+                            (start_name is None or name >= start_name) and
+                            entry.is_file()):
+                        result.add(name)
+        return sorted(result)
+
+    def listing_watermark(self, prefix):
+        mtimes = []
+        for directory in listing_directories(prefix):
+            try:
+                mtimes.append(os.stat(directory).st_mtime)
+            except FileNotFoundError:
+                # Created after the listing would not be noticed.
+                return None
+        if time.time() - max(mtimes) > LOCAL_WATERMARK_SLACK_SECONDS:
+            return tuple(mtimes)
+        return None
+
+    def existing_path(self, name):
+        """
+        File for the object at name: the sharded one, unless only a file in
+        the flat layout exists.
+        """
+        path = physical_path(name)
+        if path != name and not os.path.exists(path) and os.path.exists(name):
+            return name
+        return path
+
+    def writer(self, name):
+        path = physical_path(name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return LocalWriter(path)
+
+    def open_write(self, name, **kwargs):
+        return self.writer(name)
+
+    def put(self, name, input_handle, **kwargs):
+        size = storage_backend.remaining_bytes(input_handle)
+        with self.writer(name) as writer:
+            if storage_backend.is_chunked(size) and hasattr(os, "pwrite"):
+                # Large object: preallocate the file and write chunks into
+                # it concurrently.
+                writer.fd.truncate(size)
+                fileno = writer.fd.fileno()
+
+                def write_chunk(chunk_num, offset, data):
+                    storage_backend.pwrite_all(fileno, data, offset)
+
+                storage_backend.transfer_chunks(
+                    input_handle, size, write_chunk)
+            else:
+                shutil.copyfileobj(input_handle, writer, COPY_BUFFER_BYTES)
+
+    def get(self, name, output_handle=None):
+        path = self.existing_path(name)
+        if output_handle is None:
+            return open(path, "rb")
+
+        # Stream, rather than reading the whole file into memory.
+        with open(path, "rb") as fd:
+            shutil.copyfileobj(fd, output_handle, COPY_BUFFER_BYTES)
+
+        return output_handle
+
+    def get_range(self, name, start, end):
+        with open(self.existing_path(name), "rb") as fd:
+            fd.seek(start)
+            return fd.read(end - start)
+
+    def delete(self, name):
+        os.unlink(self.existing_path(name))
+
+    def exists(self, name):
+        return os.path.exists(self.existing_path(name))
+
+    def size(self, name):
+        return os.path.getsize(self.existing_path(name))
+
+    def copy(self, source, dest):
+        with open(self.existing_path(source), "rb") as source_fd:
+            with self.writer(dest) as writer:
+                shutil.copyfileobj(source_fd, writer, COPY_BUFFER_BYTES)
+
+    def move(self, source, dest):
+        dest_path = physical_path(dest)
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        os.rename(self.existing_path(source), dest_path)
+
+    def access_info(self, name):
+        return self.existing_path(name)
@@ -0,0 +1,74 @@
+from io import BytesIO
+import json
+import logging
+import time
+from contextlib import closing
+
+from . import naming, storage
+
+
+class JobManifest(object):
+    """
+    Append-only record of a job's scheduling decisions, kept in storage so a
+    new master can resume the job.
+
+    Records are JSON-serializable dicts with an "event" key. They are
+    buffered and written as numbered chunk objects, at most once every
+    min_interval_seconds unless a flush is forced. Storage objects cannot be
+    appended to, so each flush writes a new chunk.
+    """
+    def __init__(
+            self,
+            storage_path,
+            job_name,
+            min_interval_seconds=10.0,
+            first_sequence_num=0):
+        self.storage_path = storage_path
+        self.job_name = job_name
+        self.min_interval_seconds = min_interval_seconds
+        self.sequence_num = first_sequence_num
+        self.buffer = []
+        self.last_flush_time = None
+
+    def append(self, record):
+        assert "event" in record
+        self.buffer.append(record)
+
+    def flush(self, force=False):
+        if not self.buffer:
+            return
+        if not force and self.last_flush_time is not None and (
+                time.time() - self.last_flush_time <
+                self.min_interval_seconds):
+            return
+        path = self.storage_path + "/" + naming.JOB_MANIFEST.make_string(
+            job_name=self.job_name,
+            sequence_num=self.sequence_num)
+        data = "".join(
+            json.dumps(record) + "\n" for record in self.buffer)
+        storage.put(
+            path, BytesIO(data.encode()), mime_type="application/json")
+        logging.debug("Wrote %d manifest records: %s" % (
+            len(self.buffer), path))
+        self.sequence_num += 1
+        self.buffer = []
+        self.last_flush_time = time.time()
+
+    @staticmethod
+    def read(storage_path, job_name):
+        """
+        Return (records, number of chunks) for a job, in the order they
+        were written.
+        """
+        names = storage.list_contents(
+            storage_path + "/" + naming.job_manifest_prefix(job_name))
+        chunks = sorted(
+            (naming.JOB_MANIFEST.make_tuple(name).sequence_num, name)
+            for name in names)
+        records = []
+        for (_, name) in chunks:
+            with closing(storage.get(storage_path + "/" + name)) as fd:
+                for line in fd.read().decode().splitlines():
+                    if line:
+                        records.append(json.loads(line))
+        return (records, len(chunks))
@@ -34,6 +34,22 @@ JOB_STATUS_PAGE = Stringable(
         'status': ['active', 'done'],
     })
 
+JOB_MANIFEST = Stringable(
+    "JobManifest",
+    "manifest::{job_name}::{sequence_num:06d}")
+
+TASK_MEMO = Stringable(
+    "TaskMemo",
+    "memo::{fingerprint}")
+
+SHUFFLE_PARTITION = Stringable(
+    "ShufflePartition",
+    "shuffle::{cache_key}::{partition:06d}::{task_num:06d}")
+
+UPLOAD_PART = Stringable(
+    "UploadPart",
+    "part::{upload_id}::{part_num:06d}")
+
 REMOTE_OBJECT = Stringable(
     "RemoteObject",
     "object::{cache_key_prefix}::{node_id}::{object_num:d}-{randomness}")
@@ -43,6 +59,23 @@ def hash_value(s, characters=8):
     return hashlib.sha1(str(s).encode()).hexdigest()[:characters]
 
 
+class FingerprintingWriter(object):
+    """
+    Wraps a writable handle, hashing everything written to it, to get a
+    fingerprint of data, for content-addressed names, as it is written.
+    """
+    def __init__(self, handle):
+        self.handle = handle
+        self.digest = hashlib.sha1()
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.handle.write(data)
+
+    def fingerprint(self):
+        return self.digest.hexdigest()
+
+
 def make_cache_key_prefix():
     cache_key_prefix = "%s-%s-%s-%s" % (
         socket.gethostname()[:8],
@@ -76,10 +109,42 @@ def task_result_prefix(cache_key, task_names=[]):
     return prefix
 
 
+def task_result_start_offset(task_names):
+    """
+    Lexicographically smallest result name any of the given tasks could
+    write. Results sorting before this belong to other tasks.
+    """
+    return TASK_RESULT.prefix(task_name=[min(task_names)])
+
+
+def task_result_task_num(cache_key, result_name):
+    """
+    Number of the task a result name is for, found without parsing the
+    whole name, or None if it is not the name of a result of a task with
+    the given cache key.
+    """
+    prefix = task_result_prefix(cache_key) + "::"
+    if not result_name.startswith(prefix):
+        return None
+    (task_num, plus, _) = result_name[len(prefix):].partition("+")
+    if not plus or not task_num.isdigit():
+        return None
+    return int(task_num)
+
+
 def task_input_prefix(cache_key):
     return "input::" + cache_key
 
 
+def shuffle_prefix(cache_key):
+    return "shuffle::" + cache_key + "::"
+
+
+def job_manifest_prefix(job_name_or_cache_key):
+    # Job names start with the cache key, so this works for both.
+    return "manifest::" + job_name_or_cache_key + "::"
+
+
 def status_prefixes(job_names=None, formats=None, statuses=None):
     return JOB_STATUS_PAGE.prefixes(
         max_prefixes=4,
@@ -0,0 +1,139 @@
+import logging
+import queue
+import time
+
+from .remote_object import RemoteResult
+from .result import Result
+from .task import Task
+
+END_OF_STAGE = object()
+
+
+def run_stage(function, upstream):
+    """
+    Run on a worker: apply function to an upstream stage's return value,
+    loaded from storage.
+    """
+    return function(upstream.value)
+
+
+def first_stage_tasks(function, iterable):
+    for item in iterable:
+        yield Task(function, (item,))
+
+
+def later_stage_tasks(function, upstream_queue):
+    for remote_result in iter(upstream_queue.get, END_OF_STAGE):
+        yield Task(run_stage, (function, remote_result))
+
+
+class Stage(object):
+    def __init__(self, job, upstream_queue=None):
+        self.job = job
+        # RemoteResults of the previous stage, for stages after the first.
+        self.upstream_queue = upstream_queue
+        # task_num -> item num, for stages after the first.
+        self.item_nums = []
+        self.num_consumed = 0
+        self.finished = False
+
+    def item_num(self, task_num):
+        if self.upstream_queue is None:
+            return task_num
+        return self.item_nums[task_num]
+
+    def feed(self, item_num, remote_result):
+        self.item_nums.append(item_num)
+        self.upstream_queue.put(remote_result)
+
+    def end(self):
+        self.upstream_queue.put(END_OF_STAGE)
+
+
+class Pipeline(object):
+    """
+    Runs items through a chain of functions, one Job per stage, with stages
+    overlapping.
+
+    Each stage after the first is fed from a queue. As soon as a task of one
+    stage completes, a task for the same item is queued for the next stage,
+    taking a RemoteResult handle to the completed result, so values pass
+    between stages through storage. Stage jobs submit tasks without blocking
+    (blocking_submission=False) and are polled in turn from one loop. They
+    share the Client's task slots; since a stage only asks for slots for
+    tasks that are ready, earlier stages use what later stages can't.
+
+    Items are one per task in every stage. Results of the last stage are
+    downloaded and yielded in the order of the input.
+    """
+    def __init__(self, client, functions):
+        self.client = client
+        self.functions = list(functions)
+        if not self.functions:
+            raise ValueError("Pipeline needs at least one stage")
+
+    def run(self, iterable, num_items=None):
+        if num_items is None:
+            try:
+                num_items = len(iterable)
+            except TypeError:
+                pass
+
+        stages = []
+        for (stage_num, function) in enumerate(self.functions):
+            if stage_num == 0:
+                upstream_queue = None
+                tasks = first_stage_tasks(function, iterable)
+            else:
+                upstream_queue = queue.Queue()
+                tasks = later_stage_tasks(function, upstream_queue)
+            job = self.client.submit(
+                tasks, num_tasks=num_items, blocking_submission=False)
+            logging.info("Pipeline stage %d: job %s" % (
+                stage_num, job.job_name))
+            stages.append(Stage(job, upstream_queue=upstream_queue))
+
+        last_stage = stages[-1]
+        completed_result_paths = {}  # item num -> last stage result path
+        next_item_num = 0
+        try:
+            while True:
+                for (stage_num, stage) in enumerate(stages):
+                    if stage.finished:
+                        continue
+                    stage.finished = stage.job.poll()
+                    completed = stage.job.available_task_nums(
+                        stage.num_consumed, ordered=False)
+                    stage.num_consumed += len(completed)
+                    for task_num in completed:
+                        item_num = stage.item_num(task_num)
+                        result_path = stage.job.result_path(task_num)
+                        if stage is last_stage:
+                            completed_result_paths[item_num] = result_path
+                        else:
+                            stages[stage_num + 1].feed(
+                                item_num, RemoteResult(result_path, None))
+                    if stage.finished and stage is not last_stage:
+                        stages[stage_num + 1].end()
+
+                while next_item_num in completed_result_paths:
+                    result = Result.from_storage(
+                        completed_result_paths.pop(next_item_num))
+                    result.raise_if_exception()
+                    yield result.return_value
+                    next_item_num += 1
+
+                if last_stage.finished:
+                    assert not completed_result_paths
+                    return
+                time.sleep(min(
+                    stage.job.poll_interval(self.client.poll_seconds)
+                    for stage in stages if not stage.finished))
+        finally:
+            for stage in stages:
+                if stage.upstream_queue is not None:
+                    # Unblock upload threads waiting for upstream results.
+                    stage.end()
+                stage.job.close()
+            self.client.mark_jobs_done(
+                job_names=[stage.job.job_name for stage in stages])
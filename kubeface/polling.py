@@ -0,0 +1,73 @@
+import numpy
+
+
+class AdaptivePoller(object):
+    """
+    Chooses how long to sleep between polls based on the runtimes of the
+    tasks that have completed so far.
+
+    For each running task we estimate its expected remaining time as the
+    mean, over completed tasks that ran longer than it has been running so
+    far, of their extra runtime. Treating running tasks as independent, the
+    expected time until the next completion is then the harmonic combination
+    of these estimates. When some task is already running longer than every
+    completed task, we poll at wakeup_fraction of the median runtime instead.
+
+    Before any task has completed, the interval starts at min_seconds and
+    doubles on each poll. The interval is always kept within [min_seconds,
+    max_seconds], and never below 3600 / max_polls_per_hour if that is set.
+    """
+    def __init__(
+            self,
+            min_seconds=1.0,
+            max_seconds=300.0,
+            max_polls_per_hour=None,
+            wakeup_fraction=0.1):
+        if min_seconds > max_seconds:
+            raise ValueError("min_seconds must be at most max_seconds")
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.max_polls_per_hour = max_polls_per_hour
+        self.wakeup_fraction = wakeup_fraction
+        self.backoff_seconds = min_seconds
+
+    def lower_bound(self):
+        lower = self.min_seconds
+        if self.max_polls_per_hour:
+            lower = max(lower, 3600.0 / self.max_polls_per_hour)
+        return min(lower, self.max_seconds)
+
+    def clamp(self, seconds):
+        return float(min(max(seconds, self.lower_bound()), self.max_seconds))
+
+    def expected_seconds_until_completion(self, tasks, now):
+        """
+        Expected seconds until the next running task completes, or None if
+        there is nothing to base an estimate on.
+        """
+        running = tasks.running_task_nums()
+        runtimes = numpy.sort(tasks.completed_elapsed_times())
+        if len(running) == 0 or len(runtimes) == 0:
+            return None
+
+        ages = now - tasks.queue_time[running]
+        first_longer = numpy.searchsorted(runtimes, ages, side='right')
+        num_longer = len(runtimes) - first_longer
+        if (num_longer == 0).any():
+            return self.wakeup_fraction * numpy.median(runtimes)
+
+        suffix_sums = numpy.concatenate(
+            [numpy.cumsum(runtimes[::-1])[::-1], [0]])
+        remaining = suffix_sums[first_longer] / num_longer - ages
+        remaining = numpy.maximum(remaining, 1e-3)
+        return 1.0 / (1.0 / remaining).sum()
+
+    def next_interval(self, tasks, now):
+        expected = self.expected_seconds_until_completion(tasks, now)
+        if expected is None:
+            interval = self.backoff_seconds
+            self.backoff_seconds = min(
+                2 * self.backoff_seconds, self.max_seconds)
+        else:
+            interval = expected
+        return self.clamp(interval)
@@ -1,8 +1,8 @@
 import logging
-import tempfile
 from contextlib import closing
 
 from . import common, serialization, storage
+from .result import Result
 
 
 class RemoteObject(object):
@@ -30,13 +30,11 @@ class RemoteObject(object):
         """
         if not self.written:
             assert self.loaded
-            with tempfile.TemporaryFile(prefix="kubeface-object-") as fd:
+            with storage.open_write(self.file_path) as fd:
                 serialization.dump(self._value, fd)
                 logging.info("Writing object (%s): %s" % (
                     common.human_readable_memory_size(fd.tell()),
                     self.file_path))
-                fd.seek(0)
-                storage.put(self.file_path, fd)
             self.written = True
         return {"file_path": self.file_path}
 
@@ -46,3 +44,40 @@ class RemoteObject(object):
         self._value = None
         self.written = True
         self.loaded = False
+
+
+class RemoteResult(RemoteObject):
+    """
+    Handle to one return value of a task, left in the task's stored Result.
+
+    Returned by Client.map(..., return_remote=True). Pickling a handle (e.g.
+    passing it to another map) only sends the result path and index. The
+    value is loaded from storage when first accessed, raising the task's
+    exception if it failed.
+
+    If index is None, the value is the task's whole return value.
+    """
+    def __init__(self, result_path, index):
+        self.file_path = result_path
+        self.index = index
+        self._value = None
+        self.written = True
+        self.loaded = False
+
+    @property
+    def value(self):
+        if not self.loaded:
+            result = Result.from_storage(self.file_path)
+            result.raise_if_exception()
+            self._value = result.return_value
+            if self.index is not None:
+                self._value = self._value[self.index]
+            self.loaded = True
+        return self._value
+
+    def __getstate__(self):
+        return {"file_path": self.file_path, "index": self.index}
+
+    def __setstate__(self, state):
+        assert sorted(state) == ['file_path', 'index']
+        self.__init__(state['file_path'], state['index'])
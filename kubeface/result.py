@@ -25,10 +25,15 @@ class Result(object):
     @staticmethod
     def from_storage(storage_path):
         with closing(storage.get(storage_path)) as handle:
-            value = load(handle)
-            assert isinstance(value, Result), type(value)
+            value = Result.from_handle(handle)
             value.serialization_info["storage_path"] = storage_path
-            value.serialization_info["result_bytes"] = handle.tell()
+        return value
+
+    @staticmethod
+    def from_handle(handle):
+        value = load(handle)
+        assert isinstance(value, Result), type(value)
+        value.serialization_info["result_bytes"] = handle.tell()
         return value
 
     def __init__(
@@ -0,0 +1,192 @@
+import collections
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from . import storage
+from .result import Result
+
+
+def load_result_file(local_path):
+    """
+    Deserialize a Result from a local file. Run in a worker process.
+    """
+    with open(local_path, "rb") as fd:
+        return Result.from_handle(fd)
+
+
+class DownloadReservations(object):
+    """
+    Bytes reserved by the downloads of one ResultPrefetcher.iterate call.
+
+    Downloads reserve their result's size before starting, in the order
+    they were scheduled, and wait while the reservation would take the total
+    over max_bytes. A download is always let through when nothing is
+    reserved, so a result larger than max_bytes still gets downloaded. Since
+    results are consumed in the same order, the next result to be consumed
+    never waits on bytes reserved by later ones.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.condition = threading.Condition()
+        self.reserved = {}  # download number -> bytes
+        self.num_reserved = 0  # downloads that have reserved so far
+        self.closed = False
+
+    def total(self):
+        return sum(self.reserved.values())
+
+    def reserve(self, download_num, num_bytes):
+        """
+        Wait until download_num may reserve num_bytes, and reserve them.
+        Returns False, without reserving, if closed while waiting.
+        """
+        with self.condition:
+            while not self.closed and not (
+                    self.num_reserved == download_num and (
+                        not self.reserved or
+                        self.total() + num_bytes <= self.max_bytes)):
+                self.condition.wait()
+            if self.closed:
+                return False
+            self.reserved[download_num] = num_bytes
+            self.num_reserved += 1
+            self.condition.notify_all()
+            return True
+
+    def release(self, download_num):
+        with self.condition:
+            self.reserved.pop(download_num, None)
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class ResultPrefetcher(object):
+    """
+    Download and deserialize results concurrently, yielding them in the
+    order requested.
+
+    Up to max_prefetch_results results are downloaded ahead of the one being
+    consumed. Each download reserves its result's serialized size (looked up
+    in storage) before starting, and waits while the results being
+    downloaded or downloaded but not yet consumed would add up to more than
+    max_prefetch_bytes. The exception is a single result larger than that,
+    which is downloaded on its own.
+
+    Downloads run in a pool of download_threads threads. If
+    deserialize_processes is nonzero, results are deserialized in a process
+    pool instead of in the download threads. Deserialized results then have to
+    be pickled back to this process, so this only pays off when loading is
+    much more expensive than the standard pickle round trip. Results that
+    cannot be sent back this way are loaded in the download thread.
+    """
+    def __init__(
+            self,
+            max_prefetch_results=4,
+            max_prefetch_bytes=2**30,
+            download_threads=1,
+            deserialize_processes=0):
+        if max_prefetch_results < 1:
+            raise ValueError("max_prefetch_results must be at least 1")
+        self.max_prefetch_results = max_prefetch_results
+        self.max_prefetch_bytes = max_prefetch_bytes
+        self.download_threads = download_threads
+        self.deserialize_processes = deserialize_processes
+        self.thread_pool = None
+        self.process_pool = None
+
+    def start(self):
+        if self.thread_pool is None:
+            self.thread_pool = ThreadPoolExecutor(self.download_threads)
+        if self.deserialize_processes and self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(
+                self.deserialize_processes)
+
+    def close(self):
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(wait=False)
+            self.thread_pool = None
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False)
+            self.process_pool = None
+
+    def reserve_and_fetch(self, reservations, download_num, storage_path):
+        try:
+            num_bytes = storage.size(storage_path)
+        except Exception as e:
+            # Let fetch raise the real error, without holding up the
+            # downloads after this one.
+            logging.debug("Couldn't get size of %s: %s" % (storage_path, e))
+            num_bytes = 0
+        if not reservations.reserve(download_num, num_bytes):
+            return None
+        return self.fetch(storage_path)
+
+    def fetch(self, storage_path):
+        if self.process_pool is None:
+            return Result.from_storage(storage_path)
+
+        with tempfile.NamedTemporaryFile(
+                prefix="kubeface-result-", delete=False) as fd:
+            local_path = fd.name
+            storage.get(storage_path, output_handle=fd)
+        try:
+            try:
+                result = self.process_pool.submit(
+                    load_result_file, local_path).result()
+            except Exception as e:
+                logging.debug(
+                    "Loading %s in a worker process failed (%s), loading "
+                    "in this process instead." % (storage_path, e))
+                result = load_result_file(local_path)
+        finally:
+            os.unlink(local_path)
+        result.serialization_info["storage_path"] = storage_path
+        return result
+
+    def iterate(self, storage_paths):
+        """
+        Generator of Result objects for storage_paths, in order.
+        """
+        self.start()
+        storage_paths = iter(storage_paths)
+        reservations = DownloadReservations(self.max_prefetch_bytes)
+        pending = collections.deque()  # (download number, future)
+        num_scheduled = 0
+        exhausted = False
+        try:
+            while True:
+                while (not exhausted and
+                        len(pending) < self.max_prefetch_results):
+                    try:
+                        storage_path = next(storage_paths)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.append((
+                        num_scheduled,
+                        self.thread_pool.submit(
+                            self.reserve_and_fetch,
+                            reservations,
+                            num_scheduled,
+                            storage_path)))
+                    num_scheduled += 1
+                if not pending:
+                    return
+                (download_num, future) = pending.popleft()
+                try:
+                    result = future.result()
+                finally:
+                    reservations.release(download_num)
+                yield result
+        finally:
+            # Downloads waiting for a reservation give up.
+            reservations.close()
+            for (_, future) in pending:
+                future.cancel()
@@ -0,0 +1,99 @@
+import heapq
+import threading
+
+
+class FairShareScheduler(object):
+    """
+    Shares a budget of simultaneously running task attempts between the jobs
+    of one Client, which may be polled from different threads.
+
+    Jobs with higher priority are allocated slots first. Within a priority,
+    slots are divided in proportion to the jobs' weights, except that no job
+    is allocated more than it can use (its demand); whatever it can't use is
+    shared among the others.
+
+    Running tasks are never preempted. A job using more than its allocation
+    just isn't allowed to start new tasks until it is back under it, so when
+    a small job starts next to a large one it gets its share as the large
+    job's tasks finish.
+    """
+    def __init__(self, max_simultaneous_tasks):
+        self.max_simultaneous_tasks = max_simultaneous_tasks
+        self.lock = threading.Lock()
+        self.jobs = {}  # key -> dict of weight, priority, running, demand
+        self.next_registration_num = 0
+
+    def register(self, key, weight=1.0, priority=0):
+        if weight <= 0:
+            raise ValueError("Weight must be positive: %s" % weight)
+        with self.lock:
+            self.jobs[key] = {
+                'weight': float(weight),
+                'priority': priority,
+                'running': 0,
+                'demand': 0,
+                'registration_num': self.next_registration_num,
+            }
+            self.next_registration_num += 1
+
+    def unregister(self, key):
+        with self.lock:
+            self.jobs.pop(key, None)
+
+    def allocations(self):
+        """
+        Dict of key -> number of running task attempts each job is entitled
+        to, given the current demands. Call with the lock held.
+        """
+        result = dict((key, 0) for key in self.jobs)
+        budget = self.max_simultaneous_tasks
+        priorities = sorted(
+            set(info['priority'] for info in self.jobs.values()),
+            reverse=True)
+        for priority in priorities:
+            heap = [
+                (0.0, info['registration_num'], key)
+                for (key, info) in self.jobs.items()
+                if info['priority'] == priority and info['demand'] > 0
+            ]
+            heapq.heapify(heap)
+            while budget > 0 and heap:
+                (_, registration_num, key) = heapq.heappop(heap)
+                info = self.jobs[key]
+                result[key] += 1
+                budget -= 1
+                if result[key] < info['demand']:
+                    heapq.heappush(heap, (
+                        result[key] / info['weight'], registration_num, key))
+        return result
+
+    def update(self, key, running, demand):
+        """
+        Record that a job currently has `running` task attempts running and
+        could use up to `demand` (>= running) in total.
+        """
+        with self.lock:
+            self.jobs[key]['running'] = running
+            self.jobs[key]['demand'] = demand
+
+    def request(self, key, running, demand):
+        """
+        Record that a job currently has `running` task attempts running and
+        could use up to `demand` (>= running) in total, and return how many
+        new attempts it may start now.
+
+        The returned attempts are counted as running for this job until its
+        next update or request.
+        """
+        with self.lock:
+            info = self.jobs[key]
+            info['running'] = running
+            info['demand'] = demand
+            total_running = sum(
+                other['running'] for other in self.jobs.values())
+            allocation = self.allocations()[key]
+            granted = max(0, min(
+                allocation - running,
+                self.max_simultaneous_tasks - total_running))
+            info['running'] += granted
+            return granted
@@ -0,0 +1,121 @@
+"""
+Regrouping map output by key through storage, without downloading it to the
+master.
+
+Map tasks write their (key, value) pairs partitioned by a hash of the key,
+one object per (map task, partition) named by naming.SHUFFLE_PARTITION under
+the map job's cache key. Each reduce task then reads only the objects of one
+partition. Shuffle objects are deleted by Client.cleanup_job along with the
+map job's inputs and results.
+"""
+import collections
+import hashlib
+import logging
+import numbers
+from contextlib import closing
+
+from . import naming, serialization, storage
+
+
+def key_bytes(key):
+    """
+    Encoding of a key that is the same in every process, and the same for
+    keys that compare equal (e.g. 1, 1.0 and True).
+
+    Keys may be None, numbers, strings, bytes, and tuples and frozensets of
+    these. Other types could have representations that differ between
+    processes (e.g. the iteration order of a frozenset of strings depends on
+    the hash seed), so raise TypeError.
+    """
+    if key is None:
+        return b"N"
+    if isinstance(key, numbers.Integral):
+        return b"I" + str(int(key)).encode()
+    if isinstance(key, numbers.Real):
+        key = float(key)
+        if key.is_integer():
+            return b"I" + str(int(key)).encode()
+        return b"F" + repr(key).encode()
+    if isinstance(key, str):
+        return b"S" + key.encode("utf-8", "surrogatepass")
+    if isinstance(key, bytes):
+        return b"B" + key
+    if isinstance(key, tuple):
+        members = [key_bytes(member) for member in key]
+    elif isinstance(key, frozenset):
+        members = sorted(key_bytes(member) for member in key)
+    else:
+        raise TypeError(
+            "Unsupported key type for group_by_key: %s. Keys must be None, "
+            "numbers, strings, bytes, or tuples or frozensets of these." % (
+                type(key).__name__))
+    tag = b"T" if isinstance(key, tuple) else b"Z"
+    return tag + b"".join(
+        b"%d:%s" % (len(member), member) for member in members)
+
+
+def partition_of(key, num_partitions):
+    """
+    Partition for key. Unlike hash(), stable across processes, so that every
+    map task puts a key in the same partition.
+    """
+    digest = hashlib.sha1(key_bytes(key)).hexdigest()
+    return int(digest, 16) % num_partitions
+
+
+def shuffle_map(
+        function,
+        values,
+        storage_prefix,
+        cache_key,
+        task_num,
+        num_partitions):
+    """
+    Run on a worker: call function on each value, which should return an
+    iterable of (key, value) pairs, and write the pairs to one object per
+    non-empty partition.
+
+    Returns a dict of partition -> path of the object written.
+    """
+    partitions = collections.defaultdict(list)
+    for value in values:
+        for (key, mapped_value) in function(value):
+            partitions[partition_of(key, num_partitions)].append(
+                (key, mapped_value))
+
+    paths = {}
+    for (partition, pairs) in sorted(partitions.items()):
+        path = storage_prefix + "/" + naming.SHUFFLE_PARTITION.make_string(
+            cache_key=cache_key,
+            partition=partition,
+            task_num=task_num)
+        with storage.open_write(path) as fd:
+            serialization.dump(pairs, fd)
+        paths[partition] = path
+    logging.info("Wrote %d pairs to %d partitions" % (
+        sum(len(pairs) for pairs in partitions.values()), len(paths)))
+    return paths
+
+
+def shuffle_reduce(paths, reduce_function=None):
+    """
+    Run on a worker: group the pairs stored at paths (all objects of one
+    partition) by key.
+
+    Returns a list of (key, values) in the order keys were first seen, with
+    values in map task order. If reduce_function is given, it is called as
+    reduce_function(key, values) and its return value is used in place of
+    values.
+    """
+    groups = collections.OrderedDict()
+    for path in paths:
+        with closing(storage.get(path)) as fd:
+            pairs = serialization.load(fd)
+        for (key, value) in pairs:
+            groups.setdefault(key, []).append(value)
+    if reduce_function is not None:
+        return [
+            (key, reduce_function(key, values))
+            for (key, values) in groups.items()
+        ]
+    return list(groups.items())
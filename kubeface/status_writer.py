@@ -1,14 +1,24 @@
 from io import BytesIO
 import json
+import logging
+import threading
 import time
 
 from . import naming, storage
 
 
 class DefaultStatusWriter(object):
-    def __init__(self, storage_path, job_name):
+    """
+    Writes JSON and HTML status pages for a job.
+
+    Pages are written by a background thread, at most once every
+    min_interval_seconds. If several updates arrive in between, only the most
+    recent one is written.
+    """
+    def __init__(self, storage_path, job_name, min_interval_seconds=10.0):
         self.storage_path = storage_path
         self.job_name = job_name
+        self.min_interval_seconds = min_interval_seconds
         self.json_path = (
             storage_path +
             "/" +
@@ -24,6 +34,14 @@ class DefaultStatusWriter(object):
                 format="html",
                 status="active"))
 
+        self.condition = threading.Condition()
+        self.pending = None
+        self.writing = False
+        self.closed = False
+        self.last_update_time = None
+        self.last_write_time = None
+        self.thread = None
+
     def print_info(self):
         print("Job status available at:")
         print("\t%s" % storage.access_info(self.json_path))
@@ -31,10 +49,6 @@ class DefaultStatusWriter(object):
 
     def make_html(self, status_dict):
         d = dict(status_dict)
-        d["num_running_tasks"] = len(d["running_tasks"])
-        d["num_completed_tasks"] = len(d["completed_tasks"])
-        d["num_submitted_tasks"] = len(d["submitted_tasks"])
-        d["num_reused_tasks"] = len(d["reused_tasks"])
         if d["num_tasks"]:
             d["percent_complete"] = (
                 d["num_completed_tasks"] * 100.0 / d["num_tasks"])
@@ -74,7 +88,74 @@ class DefaultStatusWriter(object):
         </html>
         """.format(**d)
 
+    def due(self):
+        """
+        Whether an update would be written promptly. Callers can check this
+        to avoid building a status dict that would just be coalesced away.
+        """
+        return (
+            self.last_update_time is None or
+            time.time() - self.last_update_time >= self.min_interval_seconds)
+
     def update(self, status_dict):
+        """
+        Queue status_dict to be written. Does not block.
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.pending = status_dict
+            self.last_update_time = time.time()
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run,
+                    name="kubeface-status-writer")
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify_all()
+
+    def close(self):
+        """
+        Block until any queued update has been written, then stop the
+        background thread. Later updates are ignored.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            while self.pending is not None or self.writing:
+                self.condition.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.pending is None:
+                        if self.closed:
+                            return
+                        self.condition.wait()
+                        continue
+                    if self.closed or self.last_write_time is None:
+                        break
+                    remaining = self.min_interval_seconds - (
+                        time.time() - self.last_write_time)
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                status_dict = self.pending
+                self.pending = None
+                self.writing = True
+
+            try:
+                self.write(status_dict)
+            except Exception as e:
+                logging.warning("Error writing job status: %s" % e)
+
+            with self.condition:
+                self.writing = False
+                self.last_write_time = time.time()
+                self.condition.notify_all()
+
+    def write(self, status_dict):
         storage.put(
             self.json_path,
             BytesIO(json.dumps(status_dict).encode()),
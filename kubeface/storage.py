@@ -1,60 +1,199 @@
-import os
-import glob
+"""
+Storage access by name. Each function picks a StorageBackend by the URL
+scheme of the name ("gs" for gs://bucket/object URLs); names with no scheme
+are local paths. Other kinds of storage can be added with
+register_storage_backend.
+"""
+import collections
+
 from . import bucket_storage
+from .local_storage import LocalStorage
+from .storage_backend import copy_between
 
+STORAGE_BACKENDS = collections.OrderedDict([
+    ('', LocalStorage()),
+    ('gs', bucket_storage.BucketStorage()),
+])
+
+
+def register_storage_backend(scheme, backend):
+    """
+    Use backend (a kubeface.storage_backend.StorageBackend) for names
+    starting with "<scheme>://".
+    """
+    STORAGE_BACKENDS[scheme] = backend
 
-def is_google_storage_bucket(name):
-    return name.startswith("gs://")
 
+def url_scheme(name):
+    if "://" in name:
+        return name.split("://", 1)[0]
+    return ""
 
-def list_contents(prefix):
-    if is_google_storage_bucket(prefix):
-        return bucket_storage.list_contents(prefix)
-    else:
-        globbed = glob.glob(prefix + "*")
-        return [os.path.basename(x) for x in globbed]
+
+def storage_backend(name):
+    scheme = url_scheme(name)
+    try:
+        return STORAGE_BACKENDS[scheme]
+    except KeyError:
+        raise ValueError("No storage backend for scheme '%s': %s" % (
+            scheme, name))
+
+
+def is_google_storage_bucket(name):
+    return url_scheme(name) == "gs"
+
+
+def list_contents(prefix, start_offset=None):
+    """
+    List the names of objects starting with prefix.
+
+    If start_offset (a full path, like prefix) is given, only names that sort
+    lexicographically at or after it are returned.
+    """
+    return storage_backend(prefix).list_contents(
+        prefix, start_offset=start_offset)
+
+
+class IncrementalListing(object):
+    """
+    Repeatedly list storage prefixes, returning only names that were not
+    returned by a previous call.
+
+    For bucket storage, callers can pass a start_offset to let the server skip
+    the part of the keyspace known to hold only already-seen objects. For
+    storage with a listing watermark (for local storage, the modification
+    times of the directories holding it), a prefix is not re-listed if its
+    watermark has not changed since it was last listed.
+
+    If remember_seen is False, names returned before are not remembered, so
+    re-listing a prefix returns them again. Callers that can cheaply tell
+    which names they have handled use this to save the memory.
+    """
+    def __init__(self, remember_seen=True):
+        self.seen = set() if remember_seen else None
+        self.watermarks = {}
+
+    def new_contents(self, prefix, start_offset=None):
+        watermark = storage_backend(prefix).listing_watermark(prefix)
+        if (watermark is not None and
+                self.watermarks.get(prefix) == watermark):
+            return []
+
+        names = list_contents(prefix, start_offset=start_offset)
+        if watermark is not None:
+            self.watermarks[prefix] = watermark
+        else:
+            self.watermarks.pop(prefix, None)
+
+        if self.seen is None:
+            return names
+        result = [name for name in names if name not in self.seen]
+        self.seen.update(result)
+        return result
 
 
 def put(name, input_handle, readers=[], owners=[], **kwargs):
-    if is_google_storage_bucket(name):
-        return bucket_storage.put(
-            name, input_handle, readers, owners, **kwargs)
+    return storage_backend(name).put(
+        name, input_handle, readers=readers, owners=owners, **kwargs)
 
-    # Local file
-    with open(name, 'wb') as fd:
-        fd.write(input_handle.read())
 
+def open_write(name, **kwargs):
+    """
+    Writable file-like object (a kubeface.storage_backend.ObjectWriter)
+    whose contents are stored at name when it is closed, e.g.:
 
-def get(name, output_handle=None):
-    if is_google_storage_bucket(name):
-        return bucket_storage.get(name, output_handle)
+        with storage.open_write(name) as fd:
+            serialization.dump(value, fd)
+
+    If the with block raises, nothing is stored. kwargs are as for put.
+    """
+    return storage_backend(name).open_write(name, **kwargs)
 
-    # Local file
-    if output_handle is None:
-        return open(name, "rb")
 
-    with open(name, "rb") as fd:
-        output_handle.write(fd.read())
+def get(name, output_handle=None):
+    return storage_backend(name).get(name, output_handle)
 
-    return output_handle
 
+def get_range(name, start, end):
+    """
+    Bytes start (inclusive) to end (exclusive) of the object.
+    """
+    return storage_backend(name).get_range(name, start, end)
 
-def delete(name):
-    if is_google_storage_bucket(name):
-        return bucket_storage.delete(name)
 
-    os.unlink(name)
+def delete(name):
+    return storage_backend(name).delete(name)
+
+
+def delete_many(names):
+    """
+    Delete objects, in bulk where the storage supports it. Failures do not
+    stop the other deletes; returns a dict of name -> exception for the
+    objects that could not be deleted.
+    """
+    by_scheme = collections.defaultdict(list)
+    for name in names:
+        by_scheme[url_scheme(name)].append(name)
+    failures = {}
+    for scheme_names in by_scheme.values():
+        failures.update(
+            storage_backend(scheme_names[0]).delete_many(scheme_names))
+    return failures
+
+
+def move_many(pairs):
+    """
+    Move each (source, dest) in pairs, in bulk where the storage supports
+    it. Failures do not stop the other moves; returns a dict of source ->
+    exception for the objects that could not be moved.
+    """
+    by_scheme = collections.defaultdict(list)
+    between_backends = []
+    for (source, dest) in pairs:
+        scheme = url_scheme(source)
+        if url_scheme(dest) == scheme:
+            by_scheme[scheme].append((source, dest))
+        else:
+            between_backends.append((source, dest))
+    failures = {}
+    for scheme_pairs in by_scheme.values():
+        failures.update(
+            storage_backend(scheme_pairs[0][0]).move_many(scheme_pairs))
+    for (source, dest) in between_backends:
+        try:
+            move(source, dest)
+        except Exception as e:
+            failures[source] = e
+    return failures
+
+
+def exists(name):
+    return storage_backend(name).exists(name)
+
+
+def size(name):
+    """
+    Size of the object in bytes.
+    """
+    return storage_backend(name).size(name)
+
+
+def copy(source, dest):
+    source_backend = storage_backend(source)
+    dest_backend = storage_backend(dest)
+    if source_backend is dest_backend:
+        return source_backend.copy(source, dest)
+    copy_between(source_backend, source, dest_backend, dest)
 
 
 def move(source, dest):
-    if is_google_storage_bucket(source):
-        assert is_google_storage_bucket(dest)
-        return bucket_storage.move(source, dest)
-    assert not is_google_storage_bucket(dest)
-    os.rename(source, dest)
+    source_backend = storage_backend(source)
+    dest_backend = storage_backend(dest)
+    if source_backend is dest_backend:
+        return source_backend.move(source, dest)
+    copy_between(source_backend, source, dest_backend, dest)
+    source_backend.delete(source)
 
 
 def access_info(name):
-    if is_google_storage_bucket(name):
-        return bucket_storage.access_info(name)
-    return name
+    return storage_backend(name).access_info(name)
@@ -0,0 +1,330 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Objects larger than CHUNK_BYTES are transferred in chunks of that size, up
+# to TRANSFER_THREADS chunks at a time. See configure_transfers.
+CHUNK_BYTES = int(os.environ.get("KUBEFACE_STORAGE_CHUNK_BYTES", 2**26))
+TRANSFER_THREADS = int(
+    os.environ.get("KUBEFACE_STORAGE_TRANSFER_THREADS", 4))
+
+# Threads for the default delete_many and move_many.
+BULK_OPERATION_THREADS = 16
+
+
+def configure_transfers(chunk_bytes=None, transfer_threads=None):
+    """
+    Set the chunk size and number of threads used to transfer large objects,
+    for all storage in this process. Arguments that are None are unchanged.
+    """
+    global CHUNK_BYTES, TRANSFER_THREADS
+    if chunk_bytes is not None:
+        if chunk_bytes < 1:
+            raise ValueError("chunk_bytes must be at least 1")
+        CHUNK_BYTES = chunk_bytes
+    if transfer_threads is not None:
+        if transfer_threads < 1:
+            raise ValueError("transfer_threads must be at least 1")
+        TRANSFER_THREADS = transfer_threads
+
+
+def remaining_bytes(handle):
+    """
+    Number of bytes from the current position of handle to its end, or None
+    if handle is not seekable. The position is left unchanged.
+    """
+    try:
+        position = handle.tell()
+        end = handle.seek(0, os.SEEK_END)
+        handle.seek(position)
+    except (AttributeError, IOError, ValueError):
+        return None
+    return end - position
+
+
+def is_chunked(size):
+    return size is not None and size > CHUNK_BYTES and TRANSFER_THREADS > 1
+
+
+def transfer_chunks(input_handle, size, function):
+    """
+    Read size bytes from input_handle, starting at its current position, in
+    chunks of CHUNK_BYTES, and call function(chunk_num, offset, data) for
+    each chunk, in up to TRANSFER_THREADS threads at once. Offsets are
+    relative to the starting position. Chunks are read one at a time, so
+    at most TRANSFER_THREADS chunks are held in memory.
+
+    Returns the return values of function, in chunk order.
+    """
+    chunk_bytes = CHUNK_BYTES
+    start = input_handle.tell()
+    offsets = list(range(0, size, chunk_bytes))
+    read_lock = threading.Lock()
+
+    def transfer(chunk_num):
+        offset = offsets[chunk_num]
+        with read_lock:
+            input_handle.seek(start + offset)
+            data = input_handle.read(min(chunk_bytes, size - offset))
+        return function(chunk_num, offset, data)
+
+    with ThreadPoolExecutor(min(TRANSFER_THREADS, len(offsets))) as pool:
+        return list(pool.map(transfer, range(len(offsets))))
+
+
+def pwrite_all(fileno, data, offset):
+    data = memoryview(data)
+    while data:
+        written = os.pwrite(fileno, data, offset)
+        data = data[written:]
+        offset += written
+
+
+def get_chunks(output_handle, start, end, get_range):
+    """
+    Fetch bytes start (inclusive) to end (exclusive) of an object with
+    get_range(chunk_start, chunk_end), in chunks of CHUNK_BYTES, up to
+    TRANSFER_THREADS at a time, and write them to output_handle starting at
+    its current position.
+
+    If output_handle is a file, it is preallocated and chunks are written at
+    their offsets as they arrive. Otherwise chunks are written in order,
+    TRANSFER_THREADS at a time. Either way, about TRANSFER_THREADS chunks
+    are held in memory at once. output_handle is left positioned after the
+    data.
+    """
+    chunk_bytes = CHUNK_BYTES
+    ranges = [
+        (chunk_start, min(chunk_start + chunk_bytes, end))
+        for chunk_start in range(start, end, chunk_bytes)
+    ]
+    if not ranges:
+        return
+    position = output_handle.tell()
+    try:
+        fileno = output_handle.fileno()
+    except (AttributeError, IOError, ValueError):
+        fileno = None
+    num_threads = min(TRANSFER_THREADS, len(ranges))
+
+    with ThreadPoolExecutor(num_threads) as pool:
+        if fileno is not None and hasattr(os, "pwrite"):
+            output_handle.flush()
+            output_handle.truncate(position + end - start)
+
+            def fetch_and_write(chunk_range):
+                data = get_range(*chunk_range)
+                pwrite_all(fileno, data, position + chunk_range[0] - start)
+
+            list(pool.map(fetch_and_write, ranges))
+        else:
+            for i in range(0, len(ranges), num_threads):
+                window = ranges[i: i + num_threads]
+                for data in pool.map(lambda r: get_range(*r), window):
+                    output_handle.write(data)
+    output_handle.seek(position + end - start)
+
+
+class ObjectWriter(object):
+    """
+    Writable file-like object for a new stored object, returned by
+    StorageBackend.open_write. The object appears, all at once, when the
+    writer is closed. If abort() is called, or the with block raises,
+    nothing is written.
+    """
+    closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def tell(self):
+        """
+        Number of bytes written so far.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def abort(self):
+        raise NotImplementedError
+
+
+class TemporaryFileWriter(ObjectWriter):
+    """
+    Writes to a temporary file, which is then put to storage on close.
+    """
+    def __init__(self, backend, name, put_kwargs):
+        self.backend = backend
+        self.name = name
+        self.put_kwargs = put_kwargs
+        self.fd = tempfile.TemporaryFile(prefix="kubeface-write-")
+
+    def write(self, data):
+        return self.fd.write(data)
+
+    def tell(self):
+        return self.fd.tell()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.fd.seek(0)
+            self.backend.put(self.name, self.fd, **self.put_kwargs)
+        finally:
+            self.fd.close()
+
+    def abort(self):
+        if not self.closed:
+            self.closed = True
+            self.fd.close()
+
+
+class StorageBackend(object):
+    """
+    A kind of storage, selected in kubeface.storage by the URL scheme of
+    the names passed to it (see kubeface.storage.register_storage_backend).
+
+    Names are full paths or URLs, including the scheme. Subclasses must
+    implement list_contents, put, get, delete and copy. The other methods
+    have default implementations in terms of those, which subclasses may
+    override with faster ones.
+    """
+
+    # True if calls may block on the network, so should be run in a thread
+    # pool rather than directly on an asyncio event loop.
+    blocking = False
+
+    def list_contents(self, prefix, start_offset=None):
+        """
+        List the names (without directory or bucket) of objects starting
+        with prefix. If start_offset (a full path, like prefix) is given,
+        only names that sort lexicographically at or after it are returned.
+        """
+        raise NotImplementedError
+
+    def put(self, name, input_handle, **kwargs):
+        raise NotImplementedError
+
+    def get(self, name, output_handle=None):
+        """
+        Write the object to output_handle, or if None to a new file handle,
+        positioned at the start. Returns the handle.
+        """
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    def copy(self, source, dest):
+        raise NotImplementedError
+
+    def exists(self, name):
+        return name.rsplit("/", 1)[-1] in self.list_contents(name)
+
+    def size(self, name):
+        """
+        Size of the object in bytes.
+        """
+        handle = self.get(name)
+        try:
+            return remaining_bytes(handle)
+        finally:
+            handle.close()
+
+    def move(self, source, dest):
+        self.copy(source, dest)
+        self.delete(source)
+
+    def open_write(self, name, **kwargs):
+        """
+        ObjectWriter for a new object at name. kwargs are as for put.
+        """
+        return TemporaryFileWriter(self, name, kwargs)
+
+    def delete_many(self, names):
+        """
+        Delete objects, continuing past failures. Returns a dict of name ->
+        exception for the objects that could not be deleted.
+        """
+        return self.run_many(self.delete, [(name,) for name in names])
+
+    def move_many(self, pairs):
+        """
+        Move each (source, dest) in pairs, continuing past failures. Returns
+        a dict of source -> exception for the objects that could not be
+        moved.
+        """
+        return self.run_many(self.move, pairs)
+
+    @staticmethod
+    def run_many(function, args_list):
+        """
+        Call function(*args) for each args in args_list, in a thread pool.
+        Returns a dict of args[0] -> exception for the calls that raised.
+        """
+        def run(args):
+            try:
+                function(*args)
+            except Exception as e:
+                return e
+            return None
+
+        args_list = list(args_list)
+        if not args_list:
+            return {}
+        num_threads = min(BULK_OPERATION_THREADS, len(args_list))
+        with ThreadPoolExecutor(num_threads) as pool:
+            exceptions = list(pool.map(run, args_list))
+        return dict(
+            (args[0], exception)
+            for (args, exception) in zip(args_list, exceptions)
+            if exception is not None)
+
+    def get_range(self, name, start, end):
+        """
+        Bytes start (inclusive) to end (exclusive) of the object.
+        """
+        handle = self.get(name)
+        try:
+            handle.seek(start)
+            return handle.read(end - start)
+        finally:
+            handle.close()
+
+    def listing_watermark(self, prefix):
+        """
+        Token that changes whenever the listing of prefix may have changed,
+        or None if there is no such cheap check. Used by
+        kubeface.storage.IncrementalListing to skip listings.
+        """
+        return None
+
+    def access_info(self, name):
+        return name
+
+
+def copy_between(source_backend, source, dest_backend, dest):
+    """
+    Copy an object between two kinds of storage, through a temporary file.
+    """
+    with tempfile.TemporaryFile(prefix="kubeface-copy-") as fd:
+        source_backend.get(source, fd)
+        fd.seek(0)
+        dest_backend.put(dest, fd)
+
@@ -0,0 +1,233 @@
+import numpy
+
+# Task states.
+NOT_SUBMITTED = 0
+RUNNING = 1
+COMPLETED = 2
+
+# Indices into this list are stored in the result_type column.
+RESULT_TYPES = ["value", "exception"]
+
+
+class TaskTable(object):
+    """
+    Scheduler state for the tasks of one job, kept in NumPy arrays indexed by
+    task_num.
+
+    Task names are never stored: they can be rebuilt from the job's cache key
+    and the task_num, and result names from the result columns. This keeps
+    memory per task to a few dozen bytes and lets per-poll bookkeeping,
+    speculation and status summaries run as vectorized operations.
+
+    Tasks are submitted for the first time in task_num order, so the
+    submitted tasks are always task_nums 0 .. num_submitted - 1.
+    """
+    COLUMNS = [
+        ('state', numpy.int8, NOT_SUBMITTED),
+        ('reused', numpy.bool_, False),
+        ('num_attempts', numpy.int16, 0),
+        ('queue_time', numpy.int64, -1),  # of the most recent attempt
+        ('result_attempt_num', numpy.int16, -1),
+        ('result_queue_time', numpy.int64, -1),
+        ('result_time', numpy.int64, -1),
+        ('result_type', numpy.int8, -1),
+        ('result_bytes', numpy.int64, -1),
+        ('detected_time', numpy.float64, -1),  # when we found the result
+    ]
+
+    def __init__(self, capacity=1024):
+        self.capacity = 0
+        for (name, dtype, default) in self.COLUMNS:
+            setattr(self, name, numpy.zeros(0, dtype=dtype))
+        self.completion_order = numpy.zeros(0, dtype=numpy.int64)
+
+        self.num_submitted = 0
+        self.num_completed = 0
+        self.num_running = 0
+        self.num_reused = 0
+        self.num_in_completion_order = 0
+        self.grow(capacity)
+
+    def grow(self, min_capacity):
+        if min_capacity <= self.capacity:
+            return
+        new_capacity = max(min_capacity, 2 * self.capacity)
+        for (name, dtype, default) in self.COLUMNS:
+            column = numpy.empty(new_capacity, dtype=dtype)
+            column.fill(default)
+            column[:self.capacity] = getattr(self, name)
+            setattr(self, name, column)
+        completion_order = numpy.empty(new_capacity, dtype=numpy.int64)
+        completion_order[:self.capacity] = self.completion_order
+        self.completion_order = completion_order
+        self.capacity = new_capacity
+
+    def is_completed(self, task_num):
+        return (
+            task_num < self.capacity and
+            self.state[task_num] == COMPLETED)
+
+    def mark_submitted(self, task_num, queue_time):
+        """
+        Record that a task was submitted to the backend. Returns the attempt
+        number.
+        """
+        self.grow(task_num + 1)
+        if self.num_attempts[task_num] == 0:
+            assert task_num == self.num_submitted, (
+                "Tasks must first be submitted in order")
+            self.num_submitted += 1
+            if self.state[task_num] == COMPLETED:
+                # Its result was found before it was submitted, e.g. when
+                # resuming a job.
+                self.append_completion(task_num)
+        if self.state[task_num] == NOT_SUBMITTED:
+            self.state[task_num] = RUNNING
+            self.num_running += 1
+        attempt_num = int(self.num_attempts[task_num])
+        self.num_attempts[task_num] += 1
+        self.queue_time[task_num] = queue_time
+        return attempt_num
+
+    def mark_reused(self, task_num):
+        """
+        Record that a task was not submitted because it already has a result,
+        either one found by mark_completed or one stored elsewhere (e.g. a
+        memoized result).
+        """
+        self.grow(task_num + 1)
+        assert task_num == self.num_submitted
+        if self.state[task_num] != COMPLETED:
+            self.state[task_num] = COMPLETED
+            self.num_completed += 1
+            self.result_type[task_num] = RESULT_TYPES.index("value")
+        self.num_submitted += 1
+        self.reused[task_num] = True
+        self.num_reused += 1
+        self.append_completion(task_num)
+
+    def mark_completed(self, task_num, parsed_result_name, detected_time=None):
+        """
+        Record a result for a task. Returns False if the task already had one.
+
+        detected_time is when the result was discovered, if known.
+        """
+        self.grow(task_num + 1)
+        state = self.state[task_num]
+        if state == COMPLETED:
+            return False
+        if state == RUNNING:
+            self.num_running -= 1
+            self.append_completion(task_num)
+        self.state[task_num] = COMPLETED
+        self.num_completed += 1
+        self.result_attempt_num[task_num] = parsed_result_name.attempt_num
+        self.result_queue_time[task_num] = int(parsed_result_name.queue_time)
+        self.result_time[task_num] = int(parsed_result_name.result_time)
+        self.result_type[task_num] = RESULT_TYPES.index(
+            parsed_result_name.result_type)
+        if detected_time is not None:
+            self.detected_time[task_num] = detected_time
+        return True
+
+    def append_completion(self, task_num):
+        self.completion_order[self.num_in_completion_order] = task_num
+        self.num_in_completion_order += 1
+
+    def running_task_nums(self):
+        return numpy.flatnonzero(
+            self.state[:self.num_submitted] == RUNNING)
+
+    def num_running_attempts(self):
+        running = self.state[:self.num_submitted] == RUNNING
+        return int(self.num_attempts[:self.num_submitted][running].sum())
+
+    def result_fields(self, task_num):
+        """
+        Fields of the task's result name, other than the task name.
+        """
+        assert self.state[task_num] == COMPLETED
+        return {
+            'attempt_num': int(self.result_attempt_num[task_num]),
+            'queue_time': int(self.result_queue_time[task_num]),
+            'result_time': int(self.result_time[task_num]),
+            'result_type': RESULT_TYPES[self.result_type[task_num]],
+        }
+
+    def exception_task_nums(self):
+        return numpy.flatnonzero(
+            self.result_type[:self.num_submitted] ==
+            RESULT_TYPES.index("exception"))
+
+    def completed_elapsed_times(self):
+        """
+        Seconds from queueing to result for each completed task that was not
+        reused.
+        """
+        completed = (
+            (self.state[:self.num_submitted] == COMPLETED) &
+            ~self.reused[:self.num_submitted] &
+            (self.num_attempts[:self.num_submitted] > 0))
+        return (
+            self.result_time[:self.num_submitted][completed] -
+            self.result_queue_time[:self.num_submitted][completed])
+
+    def detection_delays(self):
+        """
+        Seconds from each result being written to it being discovered, for
+        results discovered while the job was being polled.
+        """
+        detected = self.detected_time[:self.num_submitted] >= 0
+        return (
+            self.detected_time[:self.num_submitted][detected] -
+            self.result_time[:self.num_submitted][detected])
+
+    def speculation_candidates(self, runtime_threshold, max_attempts, now):
+        """
+        Running tasks queued more than runtime_threshold seconds ago and run
+        fewer than max_attempts times, oldest first.
+
+        Returns (candidate task_nums, number of tasks over the runtime
+        threshold regardless of attempts).
+        """
+        running = self.running_task_nums()
+        over_threshold = running[
+            now - self.queue_time[running] > runtime_threshold]
+        candidates = over_threshold[
+            self.num_attempts[over_threshold] < max_attempts]
+        candidates = candidates[
+            numpy.argsort(self.queue_time[candidates], kind="stable")]
+        return (candidates, len(over_threshold))
+
+    def summary(self):
+        """
+        Dict of summary statistics, for status pages.
+        """
+        result = {
+            'num_submitted_tasks': self.num_submitted,
+            'num_completed_tasks': self.num_completed,
+            'num_running_tasks': self.num_running,
+            'num_reused_tasks': self.num_reused,
+            'num_exception_tasks': len(self.exception_task_nums()),
+            'num_task_attempts': int(
+                self.num_attempts[:self.num_submitted].sum()),
+        }
+        elapsed = self.completed_elapsed_times()
+        if len(elapsed) > 0:
+            (low, median, high) = numpy.percentile(elapsed, [0, 50, 100])
+            result['task_elapsed_seconds'] = {
+                'min': float(low),
+                'median': float(median),
+                'max': float(high),
+            }
+        delays = self.detection_delays()
+        if len(delays) > 0:
+            (median, high) = numpy.percentile(delays, [50, 100])
+            result['detection_delay_seconds'] = {
+                'median': float(median),
+                'max': float(high),
+            }
+        result_bytes = self.result_bytes[:self.num_submitted]
+        result['downloaded_result_bytes'] = int(
+            result_bytes[result_bytes >= 0].sum())
+        return result
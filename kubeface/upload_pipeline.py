@@ -0,0 +1,155 @@
+import logging
+import threading
+
+
+class UploadPipeline(object):
+    """
+    Serialize and upload task inputs in background threads, ahead of when
+    the scheduler is ready to submit them.
+
+    Worker threads pull tasks from tasks_iter and call
+    upload_function(task_num, task), which should return a dict with at least
+    an "input_bytes" key. Results are handed back to the consumer strictly in
+    task_num order by next_ready(). The first task pulled gets first_task_num.
+
+    At most max_prefetch_tasks tasks are uploading or uploaded-but-not-yet-
+    consumed at once, and no new task is started while the uploaded-but-not-
+    yet-consumed inputs add up to max_prefetch_bytes or more.
+    """
+    def __init__(
+            self,
+            tasks_iter,
+            upload_function,
+            num_threads=1,
+            max_prefetch_tasks=10,
+            max_prefetch_bytes=2**31,
+            first_task_num=0):
+        if num_threads < 1:
+            raise ValueError("num_threads must be at least 1")
+        if max_prefetch_tasks < 1:
+            raise ValueError("max_prefetch_tasks must be at least 1")
+
+        self.tasks_iter = iter(tasks_iter)
+        self.upload_function = upload_function
+        self.num_threads = num_threads
+        self.max_prefetch_tasks = max_prefetch_tasks
+        self.max_prefetch_bytes = max_prefetch_bytes
+
+        # Protects tasks_iter and next_task_num.
+        self.iter_lock = threading.Lock()
+        self.next_task_num = first_task_num
+
+        # Protects everything below.
+        self.condition = threading.Condition()
+        self.ready = {}  # task_num -> (info, exception)
+        self.num_in_flight = 0
+        self.prefetched_bytes = 0
+        self.next_task_num_to_return = first_task_num
+        self.exhausted = False
+        self.stopped = False
+        self.threads = None
+
+    def start(self):
+        if self.threads is not None:
+            return
+        self.threads = [
+            threading.Thread(
+                target=self.work,
+                name="kubeface-upload-%d" % i)
+            for i in range(self.num_threads)
+        ]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def has_capacity(self):
+        return (
+            len(self.ready) + self.num_in_flight < self.max_prefetch_tasks and
+            self.prefetched_bytes < self.max_prefetch_bytes)
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not (
+                        self.stopped or
+                        self.exhausted or
+                        self.has_capacity()):
+                    self.condition.wait()
+                if self.stopped or self.exhausted:
+                    return
+                self.num_in_flight += 1
+
+            with self.iter_lock:
+                task_num = self.next_task_num
+                try:
+                    task = next(self.tasks_iter)
+                except StopIteration:
+                    with self.condition:
+                        self.num_in_flight -= 1
+                        self.exhausted = True
+                        self.condition.notify_all()
+                    return
+                except Exception as e:
+                    logging.error("Error generating task %d: %s" % (
+                        task_num, e))
+                    self.next_task_num += 1
+                    with self.condition:
+                        self.num_in_flight -= 1
+                        self.ready[task_num] = (None, e)
+                        self.exhausted = True
+                        self.condition.notify_all()
+                    return
+                self.next_task_num += 1
+
+            info = None
+            exception = None
+            try:
+                info = self.upload_function(task_num, task)
+            except Exception as e:
+                logging.error("Error uploading task %d: %s" % (task_num, e))
+                exception = e
+
+            with self.condition:
+                self.num_in_flight -= 1
+                self.ready[task_num] = (info, exception)
+                if info is not None:
+                    self.prefetched_bytes += info["input_bytes"]
+                self.condition.notify_all()
+
+    def num_ready(self):
+        """
+        Number of tasks uploaded and waiting to be returned by next_ready.
+        """
+        with self.condition:
+            return len(self.ready)
+
+    def next_ready(self, block=True):
+        """
+        Return the info dict for the next task in order.
+
+        Raises StopIteration when all tasks have been returned. If block is
+        False and the next task is not ready yet, returns None.
+        """
+        self.start()
+        with self.condition:
+            while True:
+                task_num = self.next_task_num_to_return
+                if task_num in self.ready:
+                    (info, exception) = self.ready.pop(task_num)
+                    self.next_task_num_to_return += 1
+                    if info is not None:
+                        self.prefetched_bytes -= info["input_bytes"]
+                    self.condition.notify_all()
+                    if exception is not None:
+                        raise exception
+                    return info
+                if self.exhausted and task_num >= self.next_task_num:
+                    raise StopIteration
+                if not block:
+                    return None
+                self.condition.wait()
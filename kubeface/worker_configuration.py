@@ -25,6 +25,18 @@ class WorkerConfiguration(object):
         parser.add_argument(
             "--kubeface-worker-kubeface-install-command",
             default=DEFAULT.kubeface_install_command)
+        parser.add_argument(
+            "--kubeface-worker-storage-chunk-bytes",
+            type=int,
+            default=DEFAULT.storage_chunk_bytes,
+            help="On workers, transfer objects larger than this in chunks "
+            "of this size, concurrently.")
+        parser.add_argument(
+            "--kubeface-worker-storage-transfer-threads",
+            type=int,
+            default=DEFAULT.storage_transfer_threads,
+            help="On workers, threads transferring the chunks of one large "
+            "object.")
 
     @staticmethod
     def from_args(args):
@@ -48,7 +60,9 @@ class WorkerConfiguration(object):
             kubeface_install_command=(
                 "{pip} install "
                 "https://github.com/hammerlab/kubeface/archive/master.zip"
-            )):
+            ),
+            storage_chunk_bytes=None,
+            storage_transfer_threads=None):
 
         if kubeface_install_policy not in (
                 'if-not-present', 'always', 'never'):
@@ -62,6 +76,8 @@ class WorkerConfiguration(object):
         self.pip_packages = pip_packages
         self.kubeface_install_policy = kubeface_install_policy
         self.kubeface_install_command = kubeface_install_command
+        self.storage_chunk_bytes = storage_chunk_bytes
+        self.storage_transfer_threads = storage_transfer_threads
 
     def non_default_fields(self):
         return set([
@@ -90,14 +106,18 @@ class WorkerConfiguration(object):
             pieces.append("%s install %s" % (
                 run_pip,
                 quote_and_join(self.pip_packages)))
+        task_args = [task_input, task_output, "--verbose"]
+        if self.storage_chunk_bytes is not None:
+            task_args.extend([
+                "--storage-chunk-bytes", str(self.storage_chunk_bytes)])
+        if self.storage_transfer_threads is not None:
+            task_args.extend([
+                "--storage-transfer-threads",
+                str(self.storage_transfer_threads)])
         pieces.append(
             run_task +
             " " +
-            quote_and_join([
-                task_input,
-                task_output,
-                "--verbose",
-            ] + extra_task_args))
+            quote_and_join(task_args + extra_task_args))
         result = " && ".join(pieces)
         return result
 
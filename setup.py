@@ -20,11 +20,10 @@ setup(
         "Development Status :: 1 - Planning",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
-        "Programming Language :: Python :: 2",
-        "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.4",
+        "Programming Language :: Python :: 3.6",
     ],
+    python_requires=">=3.6",
     entry_points={
         'console_scripts': [
             'kubeface-copy = kubeface.commands.copy:run',
@@ -0,0 +1,38 @@
+from numpy import testing
+
+from kubeface.batching import (
+    choose_items_per_task, grouped, LongestFirstOrder)
+
+
+def test_choose_items_per_task():
+    # 60 sec budget after overhead at 2 sec per item.
+    testing.assert_equal(choose_items_per_task(2.0, 40.0, 100.0), 30)
+
+    # Overhead exceeds the target: run about as long as the overhead.
+    testing.assert_equal(choose_items_per_task(1.0, 50.0, 20.0), 50)
+
+    # Items taking longer than the target still get one per task.
+    testing.assert_equal(choose_items_per_task(500.0, 10.0, 100.0), 1)
+
+    # Keep at least max_parallel_tasks tasks.
+    testing.assert_equal(
+        choose_items_per_task(
+            0.01, 1.0, 100.0, num_items=1000, max_parallel_tasks=10),
+        100)
+
+
+def test_longest_first_order():
+    order = LongestFirstOrder(cost=lambda x: x, window=3)
+    groups = list(order.reorder(grouped([1, 5, 2, 0, 9, 4, 3], 2)))
+    testing.assert_equal(groups, [[9, 4], [1, 5], [2, 0], [3]])
+    testing.assert_equal(order.original_task_nums, [2, 0, 1, 3])
+
+    class FakeResult(object):
+        def __init__(self, task_num):
+            self.serialization_info = {"task_num": task_num}
+
+    restored = order.restore(FakeResult(i) for i in range(4))
+    testing.assert_equal(
+        [order.original_task_nums[r.serialization_info["task_num"]]
+            for r in restored],
+        [0, 1, 2, 3])
@@ -1,14 +1,23 @@
+import asyncio
+import math
+import operator
+import threading
+import time
 import numpy
 import argparse
+import json
 
 from numpy import testing
 
+from kubeface.task import Task
 from kubeface import (
     client,
     local_process_backend,
     local_process_docker_backend,
     worker_configuration,
     serialization,
+    remote_object,
+    storage,
     common)
 
 from . import util
@@ -86,7 +95,9 @@ def test_worker_exception(bucket):
         "--kubeface-cache-key-prefix", "foo",
     ])
     mapper = c.map(lambda x: 2 / (x - 2), range(10))
-    testing.assert_raises(ZeroDivisionError, next, mapper)
+    # Results of tasks before the failing one may be yielded first if they
+    # are discovered before it.
+    testing.assert_raises(ZeroDivisionError, list, mapper)
 
     # TODO: in the future we may want reruns to not re-use excpetions.
     # Here is a test for that functionality, which is currently not
@@ -195,3 +206,328 @@ def test_return_remote_object(bucket):
     testing.assert_equal(obj.value, 4)
     testing.assert_equal(obj.loaded, True)
     testing.assert_equal(obj.value, 4)
+
+
+@util.with_local_storage
+def test_imap_unordered(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+    ])
+    results = list(c.imap_unordered(lambda x: x * 2, range(8)))
+    testing.assert_equal(sorted(results), numpy.arange(8) * 2)
+
+
+@util.with_local_storage
+def test_adaptive_polling(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-adaptive-polling",
+        "--kubeface-min-poll-seconds", "0.1",
+        "--kubeface-max-poll-seconds", "2",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+        "--kubeface-max-simultaneous-tasks", "4",
+    ])
+    results = list(c.map(lambda x: x * 2, range(8)))
+    testing.assert_equal(results, numpy.arange(8) * 2)
+
+
+@util.with_local_storage
+def test_auto_items_per_task(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+        "--kubeface-max-simultaneous-tasks", "3",
+        "--kubeface-calibration-tasks", "2",
+    ])
+    results = list(c.map(lambda x: x * 2, range(20), items_per_task="auto"))
+    testing.assert_equal(results, numpy.arange(20) * 2)
+
+    # Calibration job plus one job of 3 tasks for the remaining 18 items.
+    testing.assert_equal(len(c.submitted_jobs), 2)
+    testing.assert_equal(c.submitted_jobs[0].tasks.num_submitted, 2)
+    testing.assert_equal(c.submitted_jobs[1].tasks.num_submitted, 3)
+
+
+@util.with_local_storage
+def test_concurrent_maps(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+        "--kubeface-max-simultaneous-tasks", "3",
+    ])
+    results = {}
+
+    def run(name, num_items, priority):
+        results[name] = list(c.map(
+            lambda x: x + 1, range(num_items), priority=priority))
+
+    threads = [
+        threading.Thread(target=run, args=("big", 10, 0)),
+        threading.Thread(target=run, args=("small", 2, 1)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    testing.assert_equal(results["big"], numpy.arange(10) + 1)
+    testing.assert_equal(results["small"], [1, 2])
+    testing.assert_equal(
+        len(set(job.cache_key for job in c.submitted_jobs)), 2)
+    testing.assert_equal(c.scheduler.jobs, {})
+
+
+@util.with_local_storage
+def test_failed_job_leaves_scheduler(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+        "--kubeface-max-simultaneous-tasks", "2",
+    ])
+    job = c.submit([Task(lambda x: 1 / x, (x,)) for x in range(2)])
+    testing.assert_raises(ZeroDivisionError, job.wait, poll_seconds=0.5)
+    testing.assert_equal(c.scheduler.jobs, {})
+    testing.assert_equal(list(c.map(lambda x: x + 1, range(2))), [1, 2])
+    job.close()
+
+
+@util.with_local_storage
+def test_wait_writes_final_status(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+        "--kubeface-status-interval-seconds", "60",
+    ])
+    job = c.submit([Task(lambda x: x, (x,)) for x in range(3)])
+    job.wait(poll_seconds=0.5)
+    assert not job.status_writer.thread.is_alive()
+    with storage.get(job.status_writer.json_path) as fd:
+        status = json.loads(fd.read().decode())
+    testing.assert_equal(status["num_completed_tasks"], 3)
+
+
+@util.with_local_storage
+def test_map_async(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+    ])
+
+    async def collect(offset, num_items):
+        return [
+            x async for x in c.map_async(
+                lambda x: x + offset, range(num_items), items_per_task=2)
+        ]
+
+    async def run_both():
+        return await asyncio.gather(collect(100, 5), collect(200, 3))
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(run_both())
+    finally:
+        loop.close()
+    testing.assert_equal(results[0], numpy.arange(5) + 100)
+    testing.assert_equal(results[1], numpy.arange(3) + 200)
+    testing.assert_equal(len(c.job_summary(include_done=False)), 0)
+
+    job = c.submit([Task(lambda: 5, ())])
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(job.wait_async(poll_seconds=0.5))
+    finally:
+        loop.close()
+    testing.assert_equal([r.return_value for r in job.results()], [5])
+
+
+@util.with_local_storage
+def test_map_cost(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+    ])
+    results = list(c.map(
+        lambda x: x * 2, range(10), cost=lambda x: x, cost_window=4))
+    testing.assert_equal(results, numpy.arange(10) * 2)
+
+    # The most expensive task of the first window was submitted first.
+    first_task = next(c.submitted_jobs[0].results())
+    testing.assert_equal(first_task.return_value, [6])
+
+
+@util.with_local_storage
+def test_map_reduce(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+    ])
+    testing.assert_equal(
+        c.map_reduce(lambda x: [x], operator.add, range(12), fan_in=3),
+        list(range(12)))
+    # 12 map tasks, then reduce jobs of 4 tasks, 2 tasks and 1 task.
+    testing.assert_equal(
+        [job.tasks.num_submitted for job in c.submitted_jobs], [12, 4, 2, 1])
+    testing.assert_equal(
+        c.map_reduce(lambda x: x * 2, operator.add, [5]), 10)
+    testing.assert_raises(
+        ZeroDivisionError,
+        c.map_reduce, lambda x: 1 / x, operator.add, range(3))
+
+
+@util.with_local_storage
+def test_group_by_key(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+    ])
+    groups = c.group_by_key(
+        lambda x: [(x % 3, x), ("all", x)],
+        range(10),
+        num_partitions=2,
+        items_per_task=3)
+    testing.assert_equal(
+        dict(groups),
+        {
+            0: [0, 3, 6, 9],
+            1: [1, 4, 7],
+            2: [2, 5, 8],
+            "all": list(range(10)),
+        })
+    testing.assert_equal(
+        sorted(c.group_by_key(
+            lambda x: [(x % 2, x)],
+            range(10),
+            reduce_function=lambda key, values: sum(values))),
+        [(0, 20), (1, 25)])
+    assert storage.list_contents(bucket + "/shuffle::")
+    c.cleanup()
+    testing.assert_equal(storage.list_contents(bucket + "/shuffle::"), [])
+
+
+@util.with_local_storage
+def test_map_return_remote(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+    ])
+    handles = list(c.map(
+        lambda x: x * 2, range(5), items_per_task=2, return_remote=True))
+    testing.assert_equal(len(handles), 5)
+    assert all(isinstance(h, remote_object.RemoteResult) for h in handles)
+    testing.assert_equal(
+        list(c.map(lambda h: h.value + 1, handles)), [1, 3, 5, 7, 9])
+    testing.assert_equal(handles[3].value, 6)
+
+    unpickled = serialization.loads(serialization.dumps(handles[4]))
+    assert not unpickled.loaded
+    testing.assert_equal(unpickled.value, 8)
+
+
+@util.with_local_storage
+def test_pipeline(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+        "--kubeface-max-simultaneous-tasks", "4",
+    ])
+
+    def slow_for_last(x):
+        import time
+        if x == 5:
+            time.sleep(10)
+        return x + 1
+
+    results = c.pipeline([slow_for_last, lambda x: x * 10], range(6))
+    start = time.time()
+    # The second stage runs while the first is still running.
+    testing.assert_equal(next(results), 10)
+    assert time.time() - start < 10
+    testing.assert_equal(list(results), [20, 30, 40, 50, 60])
+    testing.assert_equal(len(c.job_summary(include_done=False)), 0)
+
+
+@util.with_local_storage
+def test_map_yields_before_job_finishes(bucket):
+    c = client_from_commandline_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+        "--kubeface-max-simultaneous-tasks", "2",
+    ])
+
+    def slow_for_last(x):
+        import time
+        if x == 3:
+            time.sleep(15)
+        return x
+
+    mapper = c.imap_unordered(slow_for_last, range(4))
+    start = time.time()
+    testing.assert_equal(sorted([next(mapper) for _ in range(3)]), [0, 1, 2])
+    assert time.time() - start < 15
+    mapper.close()
+
+
+@util.with_local_storage
+def test_memoize(bucket):
+    def make_client():
+        return client_from_commandline_args([
+            "--kubeface-poll-seconds", "0.5",
+            "--kubeface-backend", "local-process",
+            "--kubeface-storage", bucket,
+            "--kubeface-memoize",
+        ])
+
+    c = make_client()
+    testing.assert_equal(
+        list(c.map(math.exp, range(4))), numpy.exp(numpy.arange(4)))
+    testing.assert_equal(c.submitted_jobs[-1].tasks.num_reused, 0)
+
+    # A new client (e.g. after a restart) reuses the memoized results,
+    # and only runs the new tasks.
+    c = make_client()
+    testing.assert_equal(
+        list(c.map(math.exp, range(6))), numpy.exp(numpy.arange(6)))
+    testing.assert_equal(c.submitted_jobs[-1].tasks.num_reused, 4)
+
+
+@util.with_local_storage
+def test_resume(bucket):
+    def make_client():
+        return client_from_commandline_args([
+            "--kubeface-poll-seconds", "0.5",
+            "--kubeface-backend", "local-process",
+            "--kubeface-storage", bucket,
+            "--kubeface-max-simultaneous-tasks", "2",
+        ])
+
+    def make_tasks():
+        return (Task(math.exp, (i,)) for i in range(5))
+
+    c = make_client()
+    job = c.submit(make_tasks())
+    job.poll()  # submits the first two tasks
+    job.close()  # flushes the manifest; the master then "crashes"
+    testing.assert_equal(job.tasks.num_submitted, 2)
+
+    c = make_client()
+    resumed = c.resume(job.job_name, tasks=make_tasks())
+    testing.assert_equal(resumed.tasks.num_submitted, 2)
+    resumed.wait(poll_seconds=0.5)
+    testing.assert_equal(
+        [result.return_value for result in resumed.results()],
+        numpy.exp(numpy.arange(5)))
+    # The tasks submitted before the crash were not submitted again.
+    testing.assert_equal(list(resumed.tasks.num_attempts[:5]), [1] * 5)
+    resumed.close()
@@ -0,0 +1,37 @@
+import argparse
+import operator
+
+from numpy import testing
+
+from kubeface import Client, KubefaceExecutor
+
+from . import util
+
+
+def make_client(bucket):
+    parser = argparse.ArgumentParser()
+    Client.add_args(parser)
+    return Client.from_args(parser.parse_args([
+        "--kubeface-poll-seconds", "0.5",
+        "--kubeface-backend", "local-process",
+        "--kubeface-storage", bucket,
+    ]))
+
+
+@util.with_local_storage
+def test_executor(bucket):
+    client = make_client(bucket)
+    with KubefaceExecutor(client, batch_seconds=0.2, calls_per_task=2) as e:
+        futures = [e.submit(operator.mul, i, 3) for i in range(4)]
+        futures.append(e.submit(int, "11", base=2))
+        failing = e.submit(operator.truediv, 1, 0)
+        testing.assert_equal(
+            [future.result() for future in futures], [0, 3, 6, 9, 3])
+        testing.assert_raises(ZeroDivisionError, failing.result)
+        testing.assert_equal(list(e.map(abs, [-1, -2])), [1, 2])
+
+    # The first six calls were batched into one job.
+    testing.assert_equal(len(client.submitted_jobs), 2)
+    testing.assert_equal(client.submitted_jobs[0].tasks.num_submitted, 3)
+    testing.assert_equal(len(client.job_summary(include_done=False)), 0)
+    testing.assert_raises(RuntimeError, e.submit, abs, 1)
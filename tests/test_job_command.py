@@ -5,7 +5,8 @@ from numpy import testing
 
 from kubeface import (
     client,
-    common)
+    common,
+    storage)
 
 from . import util
 
@@ -50,3 +51,11 @@ def test_job_command(bucket):
             nth=1))
     list(mapper)
     assert 'FOOBARBAZ' not in run_job_command(bucket, [])
+    assert storage.list_contents(bucket + "/result::FOOBARBAZ")
+
+    assert 'Cleaned up job: FOOBARBAZ' in run_job_command(
+        bucket, ["--cleanup"])
+    testing.assert_equal(
+        storage.list_contents(bucket + "/result::FOOBARBAZ"), [])
+    testing.assert_equal(
+        storage.list_contents(bucket + "/input::FOOBARBAZ"), [])
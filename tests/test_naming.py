@@ -71,3 +71,26 @@ def test_basics():
                 "active::json::foo2.json",
             ]
         ))
+
+
+def test_task_result_start_offset():
+    task_names = [
+        naming.TASK.make_string(cache_key="foo", task_num=num)
+        for num in [12, 3, 7]
+    ]
+    start_offset = naming.task_result_start_offset(task_names)
+    testing.assert_equal(start_offset, "result::foo::000003+")
+    result_name = naming.TASK_RESULT.make_string(
+        task_name=task_names[1],
+        attempt_num=0,
+        queue_time=100,
+        result_time=200,
+        result_type="value")
+    assert result_name >= start_offset
+    testing.assert_equal(
+        naming.task_result_task_num("foo", result_name), 3)
+    testing.assert_equal(
+        naming.task_result_task_num("fo", result_name), None)
+    testing.assert_equal(
+        naming.task_result_task_num("foo", "result::foo::bar::000003+"),
+        None)
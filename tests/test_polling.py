@@ -0,0 +1,58 @@
+from numpy import testing
+
+from kubeface.polling import AdaptivePoller
+from kubeface.task_table import TaskTable
+
+from .test_task_table import parsed_result
+
+
+def test_backoff_before_completions():
+    table = TaskTable()
+    table.mark_submitted(0, queue_time=100)
+    poller = AdaptivePoller(min_seconds=1, max_seconds=5)
+    intervals = [poller.next_interval(table, now=101) for _ in range(5)]
+    testing.assert_equal(intervals, [1, 2, 4, 5, 5])
+
+
+def test_expected_completion():
+    table = TaskTable()
+    for task_num in range(4):
+        table.mark_submitted(task_num, queue_time=100)
+    table.mark_completed(0, parsed_result(0, 0, 100, 110))
+    table.mark_completed(1, parsed_result(1, 0, 100, 130))
+
+    poller = AdaptivePoller(min_seconds=0.1, max_seconds=100)
+
+    # Two tasks running for 5 sec, expected to run for (10 + 30) / 2 sec in
+    # total, so one should finish in (20 - 5) / 2 sec.
+    testing.assert_almost_equal(poller.next_interval(table, now=105), 7.5)
+
+    # At 20 sec, only the 30 sec runtime is longer, so each has 10 sec left.
+    testing.assert_almost_equal(poller.next_interval(table, now=120), 5.0)
+
+    # Past every observed runtime: poll at a fraction of the median.
+    testing.assert_almost_equal(poller.next_interval(table, now=140), 2.0)
+
+    # Bounds and list budget.
+    testing.assert_almost_equal(
+        AdaptivePoller(min_seconds=3, max_seconds=100).next_interval(
+            table, now=140),
+        3.0)
+    testing.assert_almost_equal(
+        AdaptivePoller(max_seconds=6).next_interval(table, now=105), 6.0)
+    testing.assert_almost_equal(
+        AdaptivePoller(max_polls_per_hour=360).next_interval(
+            table, now=140),
+        10.0)
+
+
+def test_detection_delays():
+    table = TaskTable()
+    table.mark_submitted(0, queue_time=100)
+    table.mark_submitted(1, queue_time=100)
+    table.mark_completed(0, parsed_result(0, 0, 100, 110), detected_time=112)
+    table.mark_completed(1, parsed_result(1, 0, 100, 120))
+    testing.assert_equal(list(table.detection_delays()), [2])
+    testing.assert_equal(
+        table.summary()['detection_delay_seconds'],
+        {'median': 2.0, 'max': 2.0})
@@ -0,0 +1,79 @@
+import time
+from six import BytesIO
+from numpy import testing
+
+from kubeface import storage, serialization
+from kubeface.result import Result
+from kubeface.result_prefetcher import ResultPrefetcher
+
+from .util import with_local_storage
+
+
+def write_results(bucket, num):
+    paths = []
+    for i in range(num):
+        path = "%s/result-%d" % (bucket, i)
+        result = Result(start_time=0, end_time=1, return_value=[i] * 100)
+        storage.put(path, BytesIO(serialization.dumps(result)))
+        paths.append(path)
+    return paths
+
+
+@with_local_storage
+def test_prefetch_in_order(bucket):
+    paths = write_results(bucket, 20)
+    prefetcher = ResultPrefetcher(
+        max_prefetch_results=5,
+        download_threads=4)
+    results = list(prefetcher.iterate(paths))
+    prefetcher.close()
+    testing.assert_equal(
+        [result.return_value[0] for result in results],
+        list(range(20)))
+    testing.assert_equal(
+        [result.serialization_info["storage_path"] for result in results],
+        paths)
+
+
+@with_local_storage
+def test_prefetch_with_processes(bucket):
+    paths = write_results(bucket, 6)
+    prefetcher = ResultPrefetcher(
+        max_prefetch_results=3,
+        max_prefetch_bytes=1,
+        download_threads=2,
+        deserialize_processes=2)
+    results = list(prefetcher.iterate(paths))
+    prefetcher.close()
+    testing.assert_equal(
+        [result.return_value[0] for result in results],
+        list(range(6)))
+
+
+class CountingPrefetcher(ResultPrefetcher):
+    def __init__(self, *args, **kwargs):
+        ResultPrefetcher.__init__(self, *args, **kwargs)
+        self.num_fetched = 0
+
+    def fetch(self, storage_path):
+        self.num_fetched += 1
+        return ResultPrefetcher.fetch(self, storage_path)
+
+
+@with_local_storage
+def test_prefetch_bytes_include_downloads_in_flight(bucket):
+    paths = write_results(bucket, 8)
+    result_bytes = storage.size(paths[0])
+    prefetcher = CountingPrefetcher(
+        max_prefetch_results=6,
+        max_prefetch_bytes=2 * result_bytes,
+        download_threads=4)
+    results = prefetcher.iterate(paths)
+    testing.assert_equal(next(results).return_value[0], 0)
+    time.sleep(0.5)
+    # The first result, plus two more that fit in max_prefetch_bytes.
+    testing.assert_equal(prefetcher.num_fetched, 3)
+    testing.assert_equal(
+        [result.return_value[0] for result in results],
+        list(range(1, 8)))
+    prefetcher.close()
@@ -0,0 +1,38 @@
+from numpy import testing
+
+from kubeface.scheduler import FairShareScheduler
+
+
+def test_fair_share():
+    scheduler = FairShareScheduler(10)
+    scheduler.register("big")
+    scheduler.register("small")
+
+    # Alone, the big job can use every slot.
+    testing.assert_equal(
+        scheduler.request("big", running=0, demand=float('inf')), 10)
+
+    # The small job gets nothing until the big job's tasks finish, and the
+    # big job can't start new ones while over its share of 7.
+    testing.assert_equal(scheduler.request("small", running=0, demand=3), 0)
+    testing.assert_equal(
+        scheduler.request("big", running=8, demand=float('inf')), 0)
+    testing.assert_equal(scheduler.request("small", running=0, demand=3), 2)
+    testing.assert_equal(
+        scheduler.request("big", running=6, demand=float('inf')), 1)
+
+    scheduler.unregister("small")
+    testing.assert_equal(
+        scheduler.request("big", running=7, demand=float('inf')), 3)
+
+
+def test_weights_and_priorities():
+    scheduler = FairShareScheduler(12)
+    scheduler.register("a", weight=1)
+    scheduler.register("b", weight=2)
+    scheduler.register("c", priority=1)
+    scheduler.update("a", running=0, demand=100)
+    scheduler.update("b", running=0, demand=100)
+    scheduler.update("c", running=0, demand=3)
+    testing.assert_equal(
+        scheduler.allocations(), {"a": 3, "b": 6, "c": 3})
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+from numpy import testing
+
+from kubeface.shuffle import key_bytes, partition_of
+
+
+def test_key_bytes():
+    testing.assert_equal(key_bytes(1), key_bytes(1.0))
+    testing.assert_equal(key_bytes(True), key_bytes(1))
+    assert key_bytes("1") != key_bytes(1)
+    assert key_bytes(("a", "b")) != key_bytes(("ab",))
+    assert key_bytes((1, 2)) != key_bytes(frozenset([1, 2]))
+    testing.assert_equal(
+        key_bytes(frozenset(["x", "y", (1, None)])),
+        key_bytes(frozenset([(1, None), "y", "x"])))
+    testing.assert_raises(TypeError, key_bytes, object())
+
+
+def test_partition_stable_across_hash_seeds():
+    code = (
+        "from kubeface.shuffle import partition_of; "
+        "print(partition_of(("
+        "frozenset(['apple', 'banana', 'cherry', 'date']), 'x'), 1000))")
+    partitions = set()
+    for seed in ["1", "2", "3", "4"]:
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        partitions.add(subprocess.check_output(
+            [sys.executable, "-c", code], env=env).decode().strip())
+    testing.assert_equal(
+        partitions,
+        set([str(partition_of(
+            (frozenset(['apple', 'banana', 'cherry', 'date']), 'x'),
+            1000))]))
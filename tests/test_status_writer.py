@@ -0,0 +1,49 @@
+import json
+
+from numpy import testing
+
+from kubeface import storage
+from kubeface.status_writer import DefaultStatusWriter
+
+from .util import with_local_storage
+
+
+def make_status_dict(num_tasks):
+    return {
+        'job_name': 'job',
+        'cache_key': 'cache-key',
+        'backend': 'backend',
+        'max_simultaneous_tasks': 1,
+        'start_time': 'now',
+        'num_tasks': num_tasks,
+        'num_submitted_tasks': 0,
+        'num_completed_tasks': 0,
+        'num_running_tasks': 0,
+        'num_reused_tasks': 0,
+        'running_tasks': [],
+    }
+
+
+@with_local_storage
+def test_coalesced_updates(bucket):
+    writer = DefaultStatusWriter(bucket, "job", min_interval_seconds=60)
+    written = []
+    original_write = writer.write
+
+    def write(status_dict):
+        written.append(status_dict["num_tasks"])
+        original_write(status_dict)
+
+    writer.write = write
+    for i in range(100):
+        writer.update(make_status_dict(i))
+    writer.close()
+
+    # The first update is written right away, and the last one on close.
+    testing.assert_equal(written[-1], 99)
+    assert len(written) <= 2, written
+    with storage.get(writer.json_path) as fd:
+        testing.assert_equal(json.loads(fd.read().decode())["num_tasks"], 99)
+
+    writer.update(make_status_dict(100))
+    testing.assert_equal(written[-1], 99)
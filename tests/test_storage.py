@@ -1,10 +1,15 @@
+import os
+import tempfile
+import threading
 import time
+from contextlib import contextmanager
 from six import BytesIO
 from numpy import testing
 
-from kubeface import bucket_storage, storage
+from kubeface import bucket_storage, storage, storage_backend
+from kubeface.storage_backend import StorageBackend
 
-from .util import with_local_and_bucket_storage
+from .util import with_local_and_bucket_storage, with_local_storage
 
 
 def test_url_parse():
@@ -56,3 +61,365 @@ def test_move(bucket):
     storage.delete(name2)
     testing.assert_(
         ("moved-%s" % file_name) not in storage.list_contents("%s/" % bucket))
+
+
+@with_local_and_bucket_storage
+def test_incremental_listing(bucket):
+    prefix = "%s/kubeface-test-incremental-" % bucket
+    listing = storage.IncrementalListing()
+    testing.assert_equal(listing.new_contents(prefix), [])
+
+    storage.put(prefix + "a", BytesIO(b"a"))
+    storage.put(prefix + "b", BytesIO(b"b"))
+    testing.assert_equal(
+        sorted(listing.new_contents(prefix)),
+        ["kubeface-test-incremental-a", "kubeface-test-incremental-b"])
+    testing.assert_equal(listing.new_contents(prefix), [])
+
+    storage.put(prefix + "c", BytesIO(b"c"))
+    storage.put(prefix + "0", BytesIO(b"0"))
+    testing.assert_equal(
+        listing.new_contents(prefix, start_offset=prefix + "b"),
+        ["kubeface-test-incremental-c"])
+    testing.assert_equal(
+        listing.new_contents(prefix),
+        ["kubeface-test-incremental-0"])
+
+    forgetful_listing = storage.IncrementalListing(remember_seen=False)
+    for _ in range(2):
+        # Force a re-listing even if the watermark is unchanged.
+        forgetful_listing.watermarks.clear()
+        testing.assert_equal(
+            sorted(forgetful_listing.new_contents(
+                prefix, start_offset=prefix + "b")),
+            ["kubeface-test-incremental-b", "kubeface-test-incremental-c"])
+
+    for name in ["a", "b", "c", "0"]:
+        storage.delete(prefix + name)
+
+
+class DictStorage(StorageBackend):
+    def __init__(self):
+        self.objects = {}
+
+    def list_contents(self, prefix, start_offset=None):
+        return [
+            name.rsplit("/", 1)[-1] for name in sorted(self.objects)
+            if name.startswith(prefix) and (
+                start_offset is None or name >= start_offset)
+        ]
+
+    def put(self, name, input_handle, **kwargs):
+        self.objects[name] = input_handle.read()
+
+    def get(self, name, output_handle=None):
+        if output_handle is None:
+            output_handle = BytesIO()
+        output_handle.write(self.objects[name])
+        output_handle.seek(0)
+        return output_handle
+
+    def delete(self, name):
+        del self.objects[name]
+
+    def copy(self, source, dest):
+        self.objects[dest] = self.objects[source]
+
+
+@with_local_storage
+def test_storage_backend_registry(bucket):
+    backend = DictStorage()
+    storage.register_storage_backend("test-dict", backend)
+    try:
+        storage.put("test-dict://x/a", BytesIO(b"abcdef"))
+        storage.put("test-dict://x/b", BytesIO(b"b"))
+        testing.assert_equal(
+            storage.list_contents("test-dict://x/"), ["a", "b"])
+        testing.assert_equal(
+            storage.list_contents(
+                "test-dict://x/", start_offset="test-dict://x/b"),
+            ["b"])
+        testing.assert_equal(
+            storage.get_range("test-dict://x/a", 1, 3), b"bc")
+        assert storage.exists("test-dict://x/a")
+
+        # Moving and copying between kinds of storage.
+        storage.move("test-dict://x/a", bucket + "/a")
+        testing.assert_equal(sorted(backend.objects), ["test-dict://x/b"])
+        testing.assert_equal(storage.get_range(bucket + "/a", 2, 6), b"cdef")
+        storage.copy(bucket + "/a", "test-dict://x/c")
+        testing.assert_equal(backend.objects["test-dict://x/c"], b"abcdef")
+
+        storage.delete_many(
+            ["test-dict://x/b", "test-dict://x/c", bucket + "/a"])
+        testing.assert_equal(backend.objects, {})
+        testing.assert_equal(storage.list_contents(bucket + "/"), [])
+    finally:
+        del storage.STORAGE_BACKENDS["test-dict"]
+    testing.assert_raises(
+        ValueError, storage.get, "test-dict://x/a")
+
+
+@with_local_storage
+def test_chunked_put(bucket):
+    data = bytes(bytearray(i % 251 for i in range(10500)))
+    original = (storage_backend.CHUNK_BYTES, storage_backend.TRANSFER_THREADS)
+    storage_backend.configure_transfers(chunk_bytes=1000, transfer_threads=4)
+    try:
+        assert storage_backend.is_chunked(len(data))
+        storage.put(bucket + "/big", BytesIO(data))
+        testing.assert_equal(storage.get(bucket + "/big").read(), data)
+        testing.assert_equal(
+            storage.get_range(bucket + "/big", 999, 2001), data[999:2001])
+        storage.delete(bucket + "/big")
+    finally:
+        storage_backend.configure_transfers(*original)
+    testing.assert_equal(storage.list_contents(bucket + "/"), [])
+
+
+@contextmanager
+def fake_bucket(chunk_bytes, transfer_threads):
+    """
+    Stub out the bucket_storage calls used by composite uploads, storing
+    objects in the yielded dict, and record the names of uploaded objects.
+    """
+    objects = {}
+    put_names = []
+
+    def put_object(bucket_name, body, input_handle, mime_type):
+        input_handle.seek(0)
+        put_names.append(body['name'])
+        objects[body['name']] = input_handle.read()
+
+    def compose(bucket_name, source_names, destination):
+        objects[destination['name']] = b"".join(
+            objects[name] for name in source_names)
+
+    def delete(name):
+        del objects[bucket_storage.split_bucket_and_name(name)[1]]
+
+    original_functions = (
+        bucket_storage.put_object,
+        bucket_storage.compose,
+        bucket_storage.delete,
+        bucket_storage.MAX_COMPOSE_SOURCES)
+    original = (storage_backend.CHUNK_BYTES, storage_backend.TRANSFER_THREADS)
+    (bucket_storage.put_object,
+        bucket_storage.compose,
+        bucket_storage.delete,
+        bucket_storage.MAX_COMPOSE_SOURCES) = (put_object, compose, delete, 4)
+    storage_backend.configure_transfers(chunk_bytes, transfer_threads)
+    try:
+        yield (objects, put_names)
+    finally:
+        (bucket_storage.put_object,
+            bucket_storage.compose,
+            bucket_storage.delete,
+            bucket_storage.MAX_COMPOSE_SOURCES) = original_functions
+        storage_backend.configure_transfers(*original)
+
+
+def test_put_composite_part_names():
+    data = bytes(bytearray(i % 251 for i in range(10500)))
+    with fake_bucket(chunk_bytes=1000, transfer_threads=4) as (
+            objects, put_names):
+        bucket_storage.put_composite(
+            "bucket",
+            {'name': "jobs/one/big"},
+            BytesIO(data),
+            len(data),
+            "application/octet-stream")
+
+    # Parts and intermediate composed objects are all deleted.
+    testing.assert_equal(objects, {"jobs/one/big": data})
+    testing.assert_equal(len(put_names), 11)
+    for name in put_names:
+        assert name.startswith("jobs/one/part::"), name
+
+
+def test_bucket_writer():
+    data = bytes(bytearray(i % 251 for i in range(10500)))
+    with fake_bucket(chunk_bytes=1000, transfer_threads=4) as (
+            objects, put_names):
+        with bucket_storage.BucketWriter("gs://bucket/jobs/small") as fd:
+            fd.write(data[:1000])
+        testing.assert_equal(put_names, ["jobs/small"])
+
+        # Larger objects are uploaded as parts while being written.
+        del put_names[:]
+        with bucket_storage.BucketWriter("gs://bucket/jobs/big") as fd:
+            for i in range(0, len(data), 700):
+                fd.write(data[i: i + 700])
+            testing.assert_equal(fd.tell(), len(data))
+            testing.assert_equal(len(fd.parts), 10)
+            assert "jobs/big" not in objects
+        testing.assert_equal(len(put_names), 11)
+        for name in put_names:
+            assert name.startswith("jobs/part::"), name
+
+        with bucket_storage.BucketWriter("gs://bucket/jobs/aborted") as fd:
+            fd.write(data)
+            fd.abort()
+    testing.assert_equal(
+        objects, {"jobs/small": data[:1000], "jobs/big": data})
+
+    with fake_bucket(chunk_bytes=1000, transfer_threads=1) as (
+            objects, put_names):
+        with bucket_storage.BucketWriter("gs://bucket/jobs/big") as fd:
+            fd.write(data[:700])
+            fd.write(data[700:])
+    testing.assert_equal(objects, {"jobs/big": data})
+    testing.assert_equal(put_names, ["jobs/big"])
+
+
+def test_get_chunks():
+    data = bytes(bytearray(i % 251 for i in range(10500)))
+    original = (storage_backend.CHUNK_BYTES, storage_backend.TRANSFER_THREADS)
+    storage_backend.configure_transfers(chunk_bytes=1000, transfer_threads=4)
+    try:
+        with tempfile.TemporaryFile() as fd:
+            fd.write(b"xyz")
+            storage_backend.get_chunks(
+                fd, 500, len(data), lambda start, end: data[start:end])
+            testing.assert_equal(fd.tell(), 3 + len(data) - 500)
+            fd.seek(0)
+            testing.assert_equal(fd.read(), b"xyz" + data[500:])
+
+        handle = BytesIO()
+        storage_backend.get_chunks(
+            handle, 0, len(data), lambda start, end: data[start:end])
+        testing.assert_equal(handle.getvalue(), data)
+    finally:
+        storage_backend.configure_transfers(*original)
+
+
+@with_local_storage
+def test_bulk_operations(bucket):
+    names = ["%s/bulk-%d" % (bucket, i) for i in range(20)]
+    for name in names:
+        storage.put(name, BytesIO(b"x"))
+    failures = storage.move_many(
+        [(name, name + "-moved") for name in names[:10]] +
+        [(bucket + "/missing", bucket + "/missing-moved")])
+    testing.assert_equal(list(failures), [bucket + "/missing"])
+    testing.assert_equal(len(storage.list_contents(bucket + "/bulk-")), 20)
+    testing.assert_equal(
+        len(storage.list_contents(bucket + "/bulk-1-")), 1)
+
+    failures = storage.delete_many(
+        [name + "-moved" for name in names[:10]] +
+        names[10:] +
+        [bucket + "/missing"])
+    testing.assert_equal(list(failures), [bucket + "/missing"])
+    testing.assert_equal(storage.list_contents(bucket + "/"), [])
+
+
+def test_service_pool():
+    class CountingPool(bucket_storage.ServicePool):
+        def create_service(self):
+            return object()
+
+    pool = CountingPool(max_services=2)
+    lock = threading.Lock()
+    state = {"in_use": set(), "max_in_use": 0, "services": set()}
+
+    def use_service():
+        with pool.service() as service:
+            with lock:
+                assert service not in state["in_use"]
+                state["in_use"].add(service)
+                state["services"].add(service)
+                state["max_in_use"] = max(
+                    state["max_in_use"], len(state["in_use"]))
+            time.sleep(0.01)
+            with lock:
+                state["in_use"].remove(service)
+
+    threads = [threading.Thread(target=use_service) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    testing.assert_equal(state["max_in_use"], 2)
+    testing.assert_equal(len(state["services"]), 2)
+    testing.assert_equal(pool.num_services, 2)
+
+
+@with_local_storage
+def test_open_write(bucket):
+    name = bucket + "/written"
+    with storage.open_write(name) as fd:
+        fd.write(b"abc")
+        fd.write(b"def")
+        testing.assert_equal(fd.tell(), 6)
+        testing.assert_equal(storage.list_contents(bucket + "/"), [])
+    testing.assert_equal(storage.get(name).read(), b"abcdef")
+    umask = os.umask(0)
+    os.umask(umask)
+    testing.assert_equal(os.stat(name).st_mode & 0o777, 0o666 & ~umask)
+    storage.delete(name)
+
+    with storage.open_write(name) as fd:
+        fd.write(b"abc")
+        fd.abort()
+    try:
+        with storage.open_write(name) as fd:
+            fd.write(b"abc")
+            1 / 0
+    except ZeroDivisionError:
+        pass
+    testing.assert_equal(storage.list_contents(bucket + "/"), [])
+
+
+@with_local_storage
+def test_local_sharded_layout(bucket):
+    names = [
+        "result::key[1]::000000+x",
+        "result::key[1]::000001+x",
+        "result::key[10]::000000+x",
+        "memo::abc",
+        "plain*",
+    ]
+    for name in names:
+        storage.put(bucket + "/" + name, BytesIO(name.encode()))
+    testing.assert_(os.path.exists(
+        os.path.join(bucket, "result::", "key%5B1%5D", names[0])))
+    testing.assert_(
+        os.path.exists(os.path.join(bucket, "memo::", "memo::abc")))
+    testing.assert_equal(
+        sorted(os.listdir(bucket)), ["memo::", "plain*", "result::"])
+
+    # Written before objects were sharded.
+    with open(os.path.join(bucket, "result::key[1]::000002+x"), "wb") as fd:
+        fd.write(b"flat")
+
+    testing.assert_equal(
+        storage.list_contents(bucket + "/result::key[1]::"),
+        names[:2] + ["result::key[1]::000002+x"])
+    testing.assert_equal(
+        storage.list_contents(bucket + "/result::key[1"),
+        sorted(names[:3] + ["result::key[1]::000002+x"]))
+    testing.assert_equal(
+        storage.list_contents(
+            bucket + "/result::key[1]::",
+            start_offset=bucket + "/result::key[1]::000001"),
+        names[1:2] + ["result::key[1]::000002+x"])
+    testing.assert_equal(storage.list_contents(bucket + "/res*"), [])
+    testing.assert_equal(
+        storage.list_contents(bucket + "/"), sorted(names) + [
+            "result::key[1]::000002+x"])
+
+    testing.assert_equal(
+        storage.get(bucket + "/result::key[1]::000002+x").read(), b"flat")
+    storage.move(
+        bucket + "/result::key[1]::000002+x",
+        bucket + "/result::key[2]::000002+x")
+    testing.assert_equal(
+        storage.list_contents(bucket + "/result::key[2]::"),
+        ["result::key[2]::000002+x"])
+    for name in names:
+        testing.assert_equal(
+            storage.get(bucket + "/" + name).read(), name.encode())
+        storage.delete(bucket + "/" + name)
+    storage.delete(bucket + "/result::key[2]::000002+x")
+    testing.assert_equal(storage.list_contents(bucket + "/result::key"), [])
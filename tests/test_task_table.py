@@ -0,0 +1,84 @@
+from numpy import testing
+
+from kubeface import naming
+from kubeface.task_table import TaskTable
+
+
+def parsed_result(task_num, attempt_num, queue_time, result_time):
+    return naming.TASK_RESULT.make_tuple(
+        naming.TASK_RESULT.make_string(
+            task_name=naming.TASK.make_string(
+                cache_key="foo", task_num=task_num),
+            attempt_num=attempt_num,
+            queue_time=queue_time,
+            result_time=result_time,
+            result_type="value"))
+
+
+def test_task_table():
+    table = TaskTable(capacity=2)
+    for task_num in range(5):
+        table.mark_submitted(task_num, queue_time=100 + task_num)
+    testing.assert_equal(table.capacity >= 5, True)
+    testing.assert_equal(table.num_running, 5)
+    testing.assert_equal(list(table.running_task_nums()), [0, 1, 2, 3, 4])
+
+    assert table.mark_completed(3, parsed_result(3, 0, 103, 110))
+    assert table.mark_completed(1, parsed_result(1, 0, 101, 120))
+    assert not table.mark_completed(1, parsed_result(1, 1, 105, 130))
+    testing.assert_equal(list(table.running_task_nums()), [0, 2, 4])
+    testing.assert_equal(
+        list(table.completion_order[:table.num_in_completion_order]),
+        [3, 1])
+    testing.assert_equal(
+        sorted(table.completed_elapsed_times()), [7, 19])
+    testing.assert_equal(
+        table.result_fields(1),
+        {
+            'attempt_num': 0,
+            'queue_time': 101,
+            'result_time': 120,
+            'result_type': 'value',
+        })
+
+    # Rerun task 2.
+    testing.assert_equal(table.mark_submitted(2, queue_time=150), 1)
+    testing.assert_equal(table.num_submitted, 5)
+    testing.assert_equal(table.num_running_attempts(), 4)
+
+    (candidates, num_over_threshold) = table.speculation_candidates(
+        runtime_threshold=50, max_attempts=2, now=200)
+    testing.assert_equal(num_over_threshold, 2)
+    testing.assert_equal(list(candidates), [0, 4])
+
+    summary = table.summary()
+    testing.assert_equal(summary['num_completed_tasks'], 2)
+    testing.assert_equal(summary['num_running_tasks'], 3)
+    testing.assert_equal(summary['num_task_attempts'], 6)
+
+
+def test_reused():
+    table = TaskTable()
+    table.mark_completed(0, parsed_result(0, 0, 1, 2))
+    assert table.is_completed(0)
+    testing.assert_equal(table.num_in_completion_order, 0)
+    table.mark_reused(0)
+    table.mark_submitted(1, queue_time=5)
+    testing.assert_equal(table.num_submitted, 2)
+    testing.assert_equal(table.num_reused, 1)
+    testing.assert_equal(list(table.completion_order[:1]), [0])
+
+
+def test_completed_before_submitted():
+    table = TaskTable()
+    table.mark_submitted(0, queue_time=1)
+    table.mark_completed(1, parsed_result(1, 0, 1, 2))
+    testing.assert_equal(table.num_in_completion_order, 0)
+    table.mark_submitted(1, queue_time=3)
+    testing.assert_equal(table.num_running, 1)
+    testing.assert_equal(table.num_completed, 1)
+    testing.assert_equal(
+        list(table.completion_order[:table.num_in_completion_order]), [1])
+    table.mark_completed(0, parsed_result(0, 0, 1, 4))
+    testing.assert_equal(
+        list(table.completion_order[:table.num_in_completion_order]), [1, 0])
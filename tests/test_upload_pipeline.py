@@ -0,0 +1,58 @@
+import random
+import time
+
+from numpy import testing
+
+from kubeface.upload_pipeline import UploadPipeline
+
+
+def test_results_in_order():
+    def upload(task_num, task):
+        time.sleep(random.random() * 0.01)
+        return {"task": task, "input_bytes": 1}
+
+    pipeline = UploadPipeline(
+        iter(range(50)),
+        upload,
+        num_threads=4,
+        max_prefetch_tasks=5)
+    results = []
+    while True:
+        try:
+            results.append(pipeline.next_ready()["task"])
+        except StopIteration:
+            break
+    testing.assert_equal(results, list(range(50)))
+
+
+def test_prefetch_bytes_limit():
+    uploaded = []
+
+    def upload(task_num, task):
+        uploaded.append(task)
+        return {"task": task, "input_bytes": 100}
+
+    pipeline = UploadPipeline(
+        range(10),
+        upload,
+        num_threads=1,
+        max_prefetch_tasks=10,
+        max_prefetch_bytes=250)
+    testing.assert_equal(pipeline.next_ready()["task"], 0)
+    time.sleep(0.1)
+    # One consumed plus three waiting (the third starts while only 200 bytes
+    # are waiting).
+    testing.assert_equal(uploaded, [0, 1, 2, 3])
+    pipeline.stop()
+
+
+def test_upload_exception():
+    def upload(task_num, task):
+        if task == 2:
+            raise ValueError("bad task")
+        return {"task": task, "input_bytes": 0}
+
+    pipeline = UploadPipeline(range(5), upload, num_threads=3)
+    testing.assert_equal(pipeline.next_ready()["task"], 0)
+    testing.assert_equal(pipeline.next_ready()["task"], 1)
+    testing.assert_raises(ValueError, pipeline.next_ready)
@@ -41,7 +41,8 @@ def with_local_storage(function):
         tempdir = tempfile.mkdtemp(dir='/tmp')
         function(tempdir)
         if not KEEP_FILES:
-            shutil.rmtree(tempdir)
+            # Workers of abandoned tasks may still be writing here.
+            shutil.rmtree(tempdir, ignore_errors=True)
     return test_function
 
 